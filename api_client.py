@@ -0,0 +1,212 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from pyncm.apis import cloudsearch, track
+
+from metrics import metrics
+
+# 网易云接口表示请求过于频繁的返回码
+THROTTLE_CODES = {405, 429, 503, -460}
+
+
+class ApiError(Exception):
+    """接口多次重试后仍被限流或网络失败"""
+
+    def __init__(self, endpoint, message, code=None):
+        super().__init__(f"{endpoint}: {message}")
+        self.endpoint = endpoint
+        self.code = code
+
+
+class TokenBucket:
+    """令牌桶限速（线程安全），rate 为每秒补充的令牌数，burst 为桶容量"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(burst, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一个令牌，必要时等待"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class EndpointStats:
+    """单个接口的调用统计"""
+
+    def __init__(self):
+        self.calls = 0  # 实际发出的请求数（含重试）
+        self.coalesced = 0  # 合并到进行中请求的调用数
+        self.errors = 0
+        self.throttled = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency):
+        self.calls += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def snapshot(self):
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+            'throttled': self.throttled,
+            'retries': self.retries,
+            'avg_latency': round(self.total_latency / self.calls, 4) if self.calls else 0.0,
+            'max_latency': round(self.max_latency, 4),
+        }
+
+
+def default_backend():
+    """默认后端：直接调用 pyncm 接口"""
+    return {
+        'track_audio': track.GetTrackAudio,
+        'track_detail': track.GetTrackDetail,
+        'track_lyrics': track.GetTrackLyrics,
+        'search': cloudsearch.GetSearchResult,
+    }
+
+
+def _freeze(value):
+    """把参数转换为可哈希的形式，用作合并请求的键"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+class ApiClient:
+    """
+    所有网易云接口调用的统一入口。
+
+    - 令牌桶限制整体请求速率；
+    - 返回限流码或网络错误时按指数退避（带随机抖动）重试；
+    - 参数相同的并发调用只发出一次请求，其余调用等待同一个结果；
+    - 按接口记录延迟、错误、限流和重试次数。
+
+    后端是接口名到函数的映射，默认使用 pyncm，可替换为离线的模拟实现。
+    """
+
+    def __init__(self, rate=10.0, burst=10, retries=4, backoff=0.5, max_backoff=8.0, backend=None):
+        """
+        :param rate: 每秒最多发出的请求数
+        :param burst: 允许的突发请求数
+        :param retries: 被限流或网络错误时的最大重试次数
+        :param backoff: 第一次重试前的等待秒数，之后每次翻倍
+        :param max_backoff: 单次等待的上限（秒）
+        :param backend: 接口名到函数的映射，默认为 default_backend()
+        """
+        self.limiter = TokenBucket(rate, burst)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.backend = backend or default_backend()
+        self._stats = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def set_backend(self, backend):
+        """替换后端，例如在基准测试中使用模拟接口"""
+        self.backend = backend
+
+    def track_audio(self, song_ids, bitrate=320000):
+        return self.call('track_audio', list(song_ids), bitrate=bitrate)
+
+    def track_detail(self, song_ids):
+        return self.call('track_detail', song_ids)
+
+    def track_lyrics(self, song_id):
+        return self.call('track_lyrics', song_id)
+
+    def search(self, keyword, limit=30, offset=0, stype=1):
+        return self.call('search', keyword, limit=limit, offset=offset, stype=stype)
+
+    def call(self, endpoint, *args, **kwargs):
+        """调用接口并返回原始响应；与进行中的相同调用合并"""
+        key = (endpoint, _freeze(args), _freeze(kwargs))
+        with self._lock:
+            stats = self._stats.setdefault(endpoint, EndpointStats())
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                stats.coalesced += 1
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._call_with_retry(endpoint, stats, args, kwargs)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._inflight[key]
+        future.set_result(result)
+        return result
+
+    def stats(self):
+        """返回 {接口名: 统计字典}"""
+        with self._lock:
+            return {endpoint: stats.snapshot() for endpoint, stats in self._stats.items()}
+
+    def _call_with_retry(self, endpoint, stats, args, kwargs):
+        function = self.backend[endpoint]
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            started = time.monotonic()
+            try:
+                result = function(*args, **kwargs)
+                failure = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                result, failure = None, e
+            except Exception:
+                with self._lock:
+                    stats.record(time.monotonic() - started)
+                    stats.errors += 1
+                raise
+            code = result.get('code') if isinstance(result, dict) else None
+            with self._lock:
+                stats.record(time.monotonic() - started)
+                if failure is not None:
+                    stats.errors += 1
+                elif code in THROTTLE_CODES:
+                    stats.throttled += 1
+                else:
+                    if code not in (None, 200):
+                        stats.errors += 1
+                    return result
+                if attempt < self.retries:
+                    stats.retries += 1
+            if attempt < self.retries:
+                delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.0))
+
+        if failure is not None:
+            raise ApiError(endpoint, f"网络错误: {failure}") from failure
+        raise ApiError(endpoint, f"请求过于频繁 (code={code})", code)
+
+
+# 全进程共享的客户端，限速和统计对所有模块生效
+client = ApiClient()
+metrics.add_collector("api", client.stats, "endpoint")
@@ -0,0 +1,158 @@
+import json
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from api_client import TokenBucket, client
+from utils import similarity
+
+# 各项得分的权重；输入缺少专辑或时长时按其余项重新归一化
+WEIGHTS = {"name": 0.5, "artist": 0.3, "album": 0.1, "duration": 0.1}
+
+_DURATION = re.compile(r'^(\d+):(\d{1,2})$')
+_ARTIST_SEPARATORS = re.compile(r'\s*(?:,|/|&|、|，|;| feat\.? | ft\.? )\s*', re.I)
+
+
+def parse_duration(value):
+    """把秒数或 "m:ss" 转换为秒，无法解析时返回 None"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _DURATION.match(str(value).strip())
+    if match:
+        return int(match.group(1)) * 60 + int(match.group(2))
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def parse_query(line):
+    """
+    解析一行输入，返回 {"title", "artist", "album", "duration"}，空行和 # 注释返回 None。
+
+    支持两种格式：
+    - 文本："歌名 - 歌手"，可选追加 " - 专辑" 和 " - m:ss"
+    - JSON：{"title": ..., "artist": ..., "album": ..., "duration": 秒数或 "m:ss"}
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("{"):
+        data = json.loads(line)
+        return {"title": data.get("title", ""), "artist": data.get("artist", ""),
+                "album": data.get("album", ""), "duration": parse_duration(data.get("duration"))}
+    parts = [part.strip() for part in line.split(" - ")]
+    duration = None
+    if len(parts) > 2 and _DURATION.match(parts[-1]):
+        duration = parse_duration(parts.pop())
+    return {"title": parts[0], "artist": parts[1] if len(parts) > 1 else "",
+            "album": " - ".join(parts[2:]), "duration": duration}
+
+
+def score_song(query, song):
+    """按歌名、歌手、专辑和时长计算候选歌曲与查询的匹配度（0~1）"""
+    scores = {"name": similarity(query["title"], song.get("name", ""))}
+    if query["artist"]:
+        wanted = [name for name in _ARTIST_SEPARATORS.split(query["artist"]) if name]
+        found = [artist.get("name", "") for artist in song.get("ar", [])]
+        scores["artist"] = sum(max((similarity(name, artist) for artist in found), default=0.0)
+                               for name in wanted) / len(wanted)
+    if query["album"]:
+        scores["album"] = similarity(query["album"], song.get("al", {}).get("name", ""))
+    if query["duration"] is not None and song.get("dt"):
+        # 相差 3 秒以内满分，30 秒以上为 0
+        difference = abs(song["dt"] / 1000 - query["duration"])
+        scores["duration"] = max(0.0, min(1.0, (30 - difference) / 27))
+    total_weight = sum(WEIGHTS[key] for key in scores)
+    return sum(WEIGHTS[key] * value for key, value in scores.items()) / total_weight
+
+
+class BatchResolver:
+    """
+    把大量 "歌名 - 歌手" 批量解析为网易云歌曲 ID。
+
+    搜索请求在线程池中并发执行并受令牌桶限速，每条结果完成后立即以 JSON Lines 输出。
+    """
+
+    def __init__(self, workers=4, rate=5.0, candidates=10, min_score=0.6):
+        """
+        :param workers: 并发搜索数
+        :param rate: 每秒最多发出的搜索请求数
+        :param candidates: 每次搜索取回的候选数
+        :param min_score: 低于该得分的最佳候选标记为 low_confidence
+        """
+        self.workers = workers
+        self.limiter = TokenBucket(rate, burst=workers)
+        self.candidates = candidates
+        self.min_score = min_score
+
+    def resolve_one(self, query):
+        """搜索并返回最佳匹配的结果字典"""
+        keyword = f"{query['title']} {query['artist']}".strip()
+        self.limiter.acquire()
+        result = client.search(keyword, limit=self.candidates, stype=1)
+        if result.get('code') != 200:
+            raise RuntimeError(f"搜索失败: {result.get('code')}")
+        songs = result.get('result', {}).get('songs', [])
+        if not songs:
+            return {"status": "not_found"}
+        score, song = max(((score_song(query, song), song) for song in songs), key=lambda item: item[0])
+        return {
+            "status": "matched" if score >= self.min_score else "low_confidence",
+            "score": round(score, 3),
+            "id": song["id"],
+            "name": song.get("name", ""),
+            "artists": [artist.get("name", "") for artist in song.get("ar", [])],
+            "album": song.get("al", {}).get("name", ""),
+            "duration": round(song.get("dt", 0) / 1000, 1),
+        }
+
+    def run(self, lines, output, ids_output=None):
+        """
+        解析输入的每一行并把结果逐条写入 output（JSON Lines，按完成顺序）。
+
+        :param lines: 可迭代的输入行
+        :param output: 可写的文本文件对象
+        :param ids_output: 可选，匹配成功的歌曲 ID 逐行写入此文件对象，可直接用于 bulk -f
+        :return: 各状态的数量统计
+        """
+        counts = {"matched": 0, "low_confidence": 0, "not_found": 0, "error": 0}
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="resolve") as executor:
+            futures = {}
+            for number, line in enumerate(lines, start=1):
+                try:
+                    query = parse_query(line)
+                except ValueError as e:
+                    self._write(output, {"line": number, "query": line.strip(), "status": "error", "error": str(e)})
+                    counts["error"] += 1
+                    continue
+                if query is not None:
+                    futures[executor.submit(self.resolve_one, query)] = (number, line.strip())
+
+            for future in as_completed(futures):
+                number, text = futures[future]
+                record = {"line": number, "query": text}
+                try:
+                    record.update(future.result())
+                except Exception as e:
+                    record.update({"status": "error", "error": str(e)})
+                counts[record["status"]] += 1
+                self._write(output, record)
+                if ids_output is not None and record["status"] == "matched":
+                    ids_output.write(f"{record['id']}\n")
+
+        finished = sum(counts.values())
+        elapsed = time.monotonic() - started
+        print(f"共 {finished} 条，匹配 {counts['matched']}，低置信度 {counts['low_confidence']}，"
+              f"未找到 {counts['not_found']}，错误 {counts['error']}，耗时 {elapsed:.1f} 秒",
+              file=sys.stderr)
+        return counts
+
+    @staticmethod
+    def _write(output, record):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
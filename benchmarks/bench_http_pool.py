@@ -0,0 +1,86 @@
+"""
+连接复用基准。
+
+在仓库根目录运行：python -m benchmarks.bench_http_pool --requests 200 --handshake-ms 20
+启动本地 HTTP/1.1 服务器，分别用"每次 requests.get"和共享连接池下载同样数量的小文件，
+统计耗时和服务器实际接受的连接数。本地没有 TLS，--handshake-ms 在每个新连接上模拟握手延迟。
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_pool import HttpPool
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # 响应头和响应体分开写出，避免与延迟 ACK 叠加
+
+    def setup(self):
+        super().setup()
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        time.sleep(server.handshake)  # 模拟 TLS 握手
+
+    def do_GET(self):
+        body = self.server.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(size, handshake):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    server.body = b"\0" * size
+    server.handshake = handshake
+    server.connections = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(server, fetch, count, workers):
+    url = f"http://127.0.0.1:{server.server_address[1]}/cover.jpg"
+    server.connections = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for response in executor.map(lambda _: fetch(url), range(count)):
+            response.raise_for_status()
+    return time.perf_counter() - started, server.connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="连接复用基准")
+    parser.add_argument("--requests", type=int, default=200, help="每种方式的请求数")
+    parser.add_argument("--workers", type=int, default=8, help="并发数")
+    parser.add_argument("--size", type=int, default=16 * 1024, help="响应体字节数")
+    parser.add_argument("--handshake-ms", type=float, default=20.0, help="每个新连接模拟的握手耗时（毫秒）")
+    args = parser.parse_args()
+
+    server = start_server(args.size, args.handshake_ms / 1000)
+    pool = HttpPool(pool_maxsize=args.workers)
+    cases = [
+        ("requests.get（每次新连接）", lambda url: requests.get(url, timeout=10)),
+        ("HttpPool（keep-alive）", lambda url: pool.get(url)),
+    ]
+    print(f"{args.requests} 个请求，并发 {args.workers}，响应 {args.size} 字节，握手 {args.handshake_ms} ms")
+    for name, fetch in cases:
+        elapsed, connections = run(server, fetch, args.requests, args.workers)
+        print(f"{name:<26} {elapsed * 1000:9.1f} ms  {args.requests / elapsed:8.1f} 请求/秒  新建连接 {connections}")
+    print("连接池统计:", pool.stats())
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
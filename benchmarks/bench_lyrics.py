@@ -0,0 +1,81 @@
+"""
+歌词解析微基准。
+
+在仓库根目录运行：python -m benchmarks.bench_lyrics --lines 5000
+生成带元数据、多时间标签、翻译和逐字歌词的合成歌词，对比旧的逐行 split 解析与 parse_lyrics。
+"""
+import argparse
+import random
+import timeit
+
+from lyric_timeline import LyricTimeline, parse_lyrics
+
+
+def format_tag(time_ms):
+    return f"[{time_ms // 60000:02d}:{time_ms // 1000 % 60:02d}.{time_ms % 1000 // 10:02d}]"
+
+
+def make_lyrics(lines, seed=0):
+    """生成 (lrc, tlyric, yrc) 三份合成歌词"""
+    rng = random.Random(seed)
+    lrc = ["[ti:合成歌曲]", "[ar:测试]", "[by:bench]", "[offset:0]"]
+    tlyric = ["[by:bench]"]
+    yrc = ['{"t":0,"c":[{"tx":"作词: "},{"tx":"测试"}]}']
+    time_ms = 0
+    for number in range(lines):
+        time_ms += rng.randint(1500, 5000)
+        words = [f"词{number}_{i}" for i in range(rng.randint(4, 10))]
+        tags = format_tag(time_ms)
+        if number % 10 == 0:
+            # 副歌：一行带多个时间标签
+            tags += format_tag(time_ms + 600000)
+        lrc.append(tags + "".join(words))
+        tlyric.append(format_tag(time_ms) + f"translation {number}")
+        word_time = time_ms
+        body = []
+        for word in words:
+            duration = rng.randint(100, 400)
+            body.append(f"({word_time},{duration},0){word}")
+            word_time += duration
+        yrc.append(f"[{time_ms},{word_time - time_ms}]" + "".join(body))
+    return "\n".join(lrc), "\n".join(tlyric), "\n".join(yrc)
+
+
+def legacy_parse(raw_lyrics):
+    """改写前 SearchAndPlayer.parse_lyrics 的做法，遇到元数据标签时跳过该行"""
+    lyrics = []
+    for line in raw_lyrics.splitlines():
+        if line.startswith("[") and "]" in line:
+            timestamp, text = line.split("]", 1)
+            try:
+                minutes, seconds = map(float, timestamp.strip("[]").split(":"))
+            except ValueError:
+                continue
+            lyrics.append((minutes * 60 + seconds, text.strip()))
+    return LyricTimeline(lyrics)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="歌词解析微基准")
+    parser.add_argument("--lines", type=int, default=5000, help="合成歌词的行数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数，取最短时间")
+    args = parser.parse_args()
+
+    lrc, tlyric, yrc = make_lyrics(args.lines)
+    timeline = parse_lyrics(lrc, tlyric, yrc)
+    print(f"{args.lines} 行，{len(lrc) + len(tlyric) + len(yrc)} 字符，时间轴 {len(timeline)} 行，"
+          f"带翻译 {sum(1 for t in timeline.translations if t)} 行，"
+          f"带逐字时间 {sum(1 for w in timeline.words if w)} 行")
+
+    cases = [
+        ("旧解析（仅原文）", lambda: legacy_parse(lrc)),
+        ("parse_lyrics（仅原文）", lambda: parse_lyrics(lrc)),
+        ("parse_lyrics（原文+翻译+逐字）", lambda: parse_lyrics(lrc, tlyric, yrc)),
+    ]
+    for name, func in cases:
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f"{name:<28} {best * 1000:8.2f} ms  {args.lines / best:12,.0f} 行/秒")
+
+
+if __name__ == "__main__":
+    main()
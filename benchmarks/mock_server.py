@@ -0,0 +1,359 @@
+"""
+本地模拟的网易云接口和 CDN，供离线基准测试使用。
+
+- MockCdn：支持 Range 的 HTTP/1.1 服务器，提供 /audio/<id>.mp3 和 /cover/<id>.jpg，
+  可设置首字节延迟和每个连接的带宽；
+- MockApi：按关键词生成确定的搜索结果，提供与 pyncm 相同返回格式的
+  cloudsearch / GetTrackAudio / GetTrackDetail / GetTrackLyrics，可设置接口延迟；
+- RecordingBackend / ReplayBackend：把真实接口的响应录制为 JSON 夹具，之后离线回放。
+
+接口部分不走 HTTP，而是通过 ApiClient.set_backend 替换后端，
+这样请求仍然经过限速、重试和合并逻辑，只是不再访问网易云。
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+# MPEG-1 Layer III，128 kbps，44.1 kHz，无填充；帧长 417 字节，全零主数据解码为静音
+_FRAME_HEADER = b"\xff\xfb\x90\x64"
+_FRAME_SIZE = 417
+_ID_OFFSET = 40  # 在第一帧的主数据区写入歌曲 ID，使每首歌的内容和 md5 各不相同
+_PATH = re.compile(r"^/(audio|cover)/(\d+)\.(?:mp3|jpg)$")
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+_CHUNK = 16 * 1024
+
+_WORDS = ("晴天", "稻香", "夜曲", "七里香", "青花瓷", "后来", "十年", "光年之外", "平凡之路", "起风了",
+          "Yesterday", "Hello", "Shape", "River", "Moon", "Light", "Dream", "Rain", "Summer", "Home")
+_ARTISTS = ("周杰伦", "陈奕迅", "林俊杰", "邓紫棋", "朴树", "刘若英", "Adele", "Coldplay", "Taylor Swift", "Beyond")
+
+
+def silent_mp3(size):
+    """生成 size 字节左右（按整帧取整）的静音 MP3"""
+    frames = max(1, size // _FRAME_SIZE)
+    frame = _FRAME_HEADER + b"\0" * (_FRAME_SIZE - len(_FRAME_HEADER))
+    return frame * frames
+
+
+def cover_jpeg(size=500):
+    """生成一张渐变色的 JPEG 封面"""
+    from PIL import Image
+
+    image = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+class _CdnHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.cdn.count("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch(True)
+
+    def do_HEAD(self):
+        self._dispatch(False)
+
+    def _dispatch(self, send_body):
+        cdn = self.server.cdn
+        cdn.count("requests")
+        match = _PATH.match(self.path.split("?", 1)[0])
+        if not match:
+            self.send_error(404)
+            return
+        kind, song_id = match.group(1), int(match.group(2))
+        size = cdn.song_size if kind == "audio" else len(cdn.cover)
+        start, end = 0, size - 1
+        ranged = False
+        header = self.headers.get("Range")
+        if header:
+            range_match = _RANGE.fullmatch(header.strip())
+            if range_match and (range_match.group(1) or range_match.group(2)):
+                ranged = True
+                if range_match.group(1):
+                    start = int(range_match.group(1))
+                    end = min(int(range_match.group(2)), size - 1) if range_match.group(2) else size - 1
+                else:
+                    start = max(0, size - int(range_match.group(2)))
+                if start >= size or start > end:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+        if cdn.latency:
+            time.sleep(cdn.latency)
+        self.send_response(206 if ranged else 200)
+        self.send_header("Content-Type", "audio/mpeg" if kind == "audio" else "image/jpeg")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", f'"{kind}-{song_id}"')
+        if ranged:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if not send_body:
+            return
+        try:
+            pos = start
+            while pos <= end:
+                stop = min(pos + _CHUNK, end + 1)
+                if kind == "audio":
+                    data = cdn.audio_bytes(song_id, pos, stop)
+                else:
+                    data = cdn.cover[pos:stop]
+                self.wfile.write(data)
+                cdn.count("bytes", len(data))
+                pos = stop
+                if cdn.bandwidth:
+                    time.sleep(len(data) / cdn.bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class MockCdn:
+    """支持 Range、可限速的本地音频和封面服务器"""
+
+    def __init__(self, song_size=4 * 1024 * 1024, latency=0.0, bandwidth=None):
+        """
+        :param song_size: 每首歌的字节数
+        :param latency: 每个请求的首字节延迟（秒）
+        :param bandwidth: 每个连接的带宽（字节/秒），为 None 时不限速
+        """
+        self.audio = silent_mp3(song_size)
+        self.song_size = len(self.audio)
+        self.cover = cover_jpeg()
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self._stats = {"connections": 0, "requests": 0, "bytes": 0}
+        self._md5 = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        if self._server is None:
+            self._server = ThreadingHTTPServer(("127.0.0.1", 0), _CdnHandler)
+            self._server.daemon_threads = True
+            self._server.cdn = self
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def audio_url(self, song_id):
+        return f"{self.base_url}/audio/{int(song_id)}.mp3"
+
+    def cover_url(self, song_id):
+        return f"{self.base_url}/cover/{int(song_id)}.jpg"
+
+    def audio_bytes(self, song_id, start, stop):
+        """返回歌曲 [start, stop) 区间的内容"""
+        data = self.audio[start:stop]
+        marker = int(song_id).to_bytes(8, "big")
+        low, high = max(start, _ID_OFFSET), min(stop, _ID_OFFSET + len(marker))
+        if low < high:
+            data = bytearray(data)
+            data[low - start:high - start] = marker[low - _ID_OFFSET:high - _ID_OFFSET]
+            data = bytes(data)
+        return data
+
+    def audio_md5(self, song_id):
+        with self._lock:
+            digest = self._md5.get(song_id)
+        if digest is None:
+            digest = hashlib.md5(self.audio_bytes(song_id, 0, self.song_size)).hexdigest()
+            with self._lock:
+                self._md5[song_id] = digest
+        return digest
+
+    def count(self, name, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = dict.fromkeys(self._stats, 0)
+
+
+class MockApi:
+    """
+    模拟的网易云接口。
+
+    搜索结果由关键词的 CRC32 决定，同一个关键词每次返回相同的歌曲；
+    音频地址和封面都指向 MockCdn。
+    """
+
+    def __init__(self, cdn, latency=0.0, results_per_keyword=300, lyric_lines=60):
+        """
+        :param cdn: MockCdn 实例
+        :param latency: 每次接口调用的延迟（秒）
+        :param results_per_keyword: 每个关键词的搜索结果总数
+        :param lyric_lines: 每首歌的歌词行数
+        """
+        self.cdn = cdn
+        self.latency = latency
+        self.results_per_keyword = results_per_keyword
+        self.lyric_lines = lyric_lines
+
+    def backend(self):
+        """返回可交给 ApiClient.set_backend 的接口映射"""
+        return {
+            'track_audio': self.track_audio,
+            'track_detail': self.track_detail,
+            'track_lyrics': self.track_lyrics,
+            'search': self.search,
+        }
+
+    def song(self, song_id):
+        """返回与 cloudsearch 格式相同的歌曲字典"""
+        song_id = int(song_id)
+        artist = _ARTISTS[song_id % len(_ARTISTS)]
+        return {
+            'id': song_id,
+            'name': f"{_WORDS[song_id % len(_WORDS)]} {song_id % 1000}",
+            'ar': [{'id': song_id % len(_ARTISTS), 'name': artist}],
+            'al': {'id': song_id // 10, 'name': f"专辑 {song_id // 10}", 'picUrl': self.cdn.cover_url(song_id)},
+            'dt': 180000 + song_id % 120000,
+        }
+
+    def search(self, keyword, limit=30, offset=0, stype=1):
+        self._wait()
+        first = 1000000 + zlib.crc32(str(keyword).encode("utf-8")) % 1000000 * 1000
+        stop = min(offset + limit, self.results_per_keyword)
+        songs = [self.song(first + index) for index in range(offset, stop)]
+        return {'code': 200, 'result': {'songs': songs, 'songCount': self.results_per_keyword}}
+
+    def track_audio(self, song_ids, bitrate=320000):
+        self._wait()
+        data = [{'id': int(song_id), 'url': self.cdn.audio_url(song_id), 'br': bitrate,
+                 'size': self.cdn.song_size, 'md5': self.cdn.audio_md5(int(song_id)),
+                 'expi': 1200, 'type': 'mp3', 'code': 200} for song_id in song_ids]
+        return {'code': 200, 'data': data}
+
+    def track_detail(self, song_ids):
+        self._wait()
+        if not isinstance(song_ids, (list, tuple)):
+            song_ids = [song_ids]
+        return {'code': 200, 'songs': [self.song(song_id) for song_id in song_ids]}
+
+    def track_lyrics(self, song_id):
+        self._wait()
+        lrc, tlyric = [], []
+        for line in range(self.lyric_lines):
+            tag = f"[{line * 3 // 60:02d}:{line * 3 % 60:02d}.00]"
+            lrc.append(f"{tag}第 {line + 1} 句歌词 {song_id}")
+            tlyric.append(f"{tag}Line {line + 1}")
+        return {'code': 200, 'lrc': {'version': 1, 'lyric': "\n".join(lrc)},
+                'tlyric': {'version': 1, 'lyric': "\n".join(tlyric)}, 'yrc': {'version': 0, 'lyric': ""}}
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+
+def _fixture_key(endpoint, args, kwargs):
+    return json.dumps([endpoint, list(args), kwargs], sort_keys=True, ensure_ascii=False)
+
+
+class RecordingBackend:
+    """包装真实后端，把每次调用的参数和响应录制下来，save() 写成 JSON 夹具"""
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self.records = {}
+        self._lock = threading.Lock()
+
+    def mapping(self):
+        return {endpoint: self._wrap(endpoint) for endpoint in self.backend}
+
+    def save(self):
+        with self._lock:
+            records = list(self.records.values())
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=1)
+
+    def _wrap(self, endpoint):
+        function = self.backend[endpoint]
+
+        def call(*args, **kwargs):
+            response = function(*args, **kwargs)
+            args_list = [list(arg) if isinstance(arg, tuple) else arg for arg in args]
+            with self._lock:
+                self.records[_fixture_key(endpoint, args_list, kwargs)] = {
+                    'endpoint': endpoint, 'args': args_list, 'kwargs': kwargs, 'response': response}
+            return response
+        return call
+
+
+class ReplayBackend:
+    """
+    回放录制的夹具。
+
+    指定 cdn 时把音频地址和封面地址改写到本地 MockCdn，回放时不访问真实 CDN；
+    夹具中没有的调用返回 code 404。
+    """
+
+    def __init__(self, path, cdn=None, latency=0.0):
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        self.cdn = cdn
+        self.latency = latency
+        self.responses = {_fixture_key(record['endpoint'], record['args'], record['kwargs']): record['response']
+                          for record in records}
+        self.misses = 0
+
+    def mapping(self):
+        return {endpoint: self._wrap(endpoint)
+                for endpoint in ('track_audio', 'track_detail', 'track_lyrics', 'search')}
+
+    def _wrap(self, endpoint):
+        def call(*args, **kwargs):
+            if self.latency:
+                time.sleep(self.latency)
+            args_list = [list(arg) if isinstance(arg, tuple) else arg for arg in args]
+            response = self.responses.get(_fixture_key(endpoint, args_list, kwargs))
+            if response is None:
+                self.misses += 1
+                return {'code': 404, 'message': "夹具中没有该调用"}
+            return self._rewrite(json.loads(json.dumps(response)))
+        return call
+
+    def _rewrite(self, response):
+        if self.cdn is None:
+            return response
+        for item in response.get('data') or []:
+            if isinstance(item, dict) and item.get('url'):
+                item['url'] = self.cdn.audio_url(item['id'])
+                item['size'] = self.cdn.song_size
+                item['md5'] = self.cdn.audio_md5(int(item['id']))
+        songs = response.get('songs') or response.get('result', {}).get('songs') or []
+        for song in songs:
+            if song.get('al', {}).get('picUrl'):
+                song['al']['picUrl'] = self.cdn.cover_url(song['id'])
+        return response
@@ -0,0 +1,308 @@
+"""
+离线基准测试。
+
+在仓库根目录运行：python -m benchmarks.run_benchmarks -o results.json
+接口和 CDN 都由 benchmarks.mock_server 在本地模拟，延迟和带宽可调，结果以 JSON 输出便于对比回归。
+所有缓存文件写在临时目录中，不会影响正常使用的 cache/ 和 playlists/。
+
+场景：
+- search：搜索翻页，冷缓存和热缓存各一轮；
+- first_byte：不依赖界面，按播放器的流程解析地址并通过本地代理读取开头的音频；
+- first_audio：启动真正的 SearchAndPlayer，测量 play_song 到 VLC 开始播放的时间（需要图形界面和 libVLC）；
+- playlist：1 万到 10 万首歌的歌单增删、移动、加载和导出；
+- bulk：批量下载吞吐量。
+
+--record 把真实接口的响应录制为夹具（音频仍从真实 CDN 下载），--replay 离线回放夹具。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+import requests
+
+from api_client import TokenBucket, client, default_backend
+from benchmarks.mock_server import MockApi, MockCdn, RecordingBackend, ReplayBackend
+from metrics import percentile
+
+SCENARIOS = ("search", "first_byte", "first_audio", "playlist", "bulk")
+
+
+def summarize(samples):
+    """把以秒为单位的样本汇总为毫秒统计"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {'count': 0}
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': round(percentile(ordered, 0.5) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def search_ids(keyword, count):
+    """用搜索结果作为测试歌曲，录制和回放模式下都能得到真实存在的 ID"""
+    result = client.search(keyword, limit=count, stype=1)
+    return [song['id'] for song in result.get('result', {}).get('songs', [])][:count]
+
+
+def bench_search(args):
+    from search_cache import SearchCache
+
+    cache = SearchCache()
+    rounds = {}
+    for name in ("cold", "warm"):
+        samples = []
+        for keyword in args.keywords:
+            for page in range(1, args.pages + 1):
+                elapsed, _ = timed(cache.get_page, keyword, page, 10)
+                samples.append(elapsed)
+        rounds[name] = summarize(samples)
+    rounds['api_calls'] = client.stats().get('search', {}).get('calls', 0)
+    return rounds
+
+
+def bench_first_byte(args):
+    """复现 SearchAndPlayer.get_media_url 的流程，并像 VLC 一样从代理读取开头的 64 KB"""
+    from stream_proxy import StreamProxy
+    from url_resolver import resolver
+
+    proxy = StreamProxy(cache_dir="cache/audio").start()
+    song_ids = search_ids(args.keywords[0], args.songs)
+    bitrate = 320000
+    rounds = {}
+    try:
+        for name in ("cold", "cached"):
+            samples = []
+            for song_id in song_ids:
+                started = time.perf_counter()
+                if proxy.is_cached(song_id, bitrate):
+                    media_url = proxy.local_url(song_id, bitrate)
+                else:
+                    media_url = proxy.local_url(song_id, bitrate, resolver.resolve(song_id, bitrate))
+                with requests.get(media_url, stream=True, timeout=30) as response:
+                    response.raise_for_status()
+                    received = 0
+                    for chunk in response.iter_content(chunk_size=16 * 1024):
+                        received += len(chunk)
+                        if received >= 64 * 1024:
+                            break
+                    samples.append(time.perf_counter() - started)
+                    if name == "cold":
+                        # 读完整首，使第二轮完全命中磁盘缓存
+                        for _ in response.iter_content(chunk_size=256 * 1024):
+                            pass
+            rounds[name] = summarize(samples)
+    finally:
+        proxy.stop()
+    return rounds
+
+
+def bench_first_audio(args):
+    """在真正的播放器中测量首次出声时间，缺少显示器或 libVLC 时跳过"""
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+
+        from search_and_player import SearchAndPlayer
+        from virtual_table import VirtualTable
+
+        root = tk.Tk()
+    except Exception as e:
+        return {'skipped': f"{type(e).__name__}: {e}"}
+
+    root.withdraw()
+    tree = VirtualTable(root, columns=("song_id", "description"), headings=("歌曲ID", "描述"))
+    player = SearchAndPlayer(root, ttk.Progressbar(root), tk.Text(root), tk.Label(root),
+                             tk.Label(root), tk.Label(root), tree)
+    events = []
+    player.clock.subscribe("playing", events.append)
+    samples, timeouts = [], 0
+    try:
+        for song_id in search_ids(args.keywords[1 % len(args.keywords)], args.songs):
+            events.clear()
+            started = time.monotonic()
+            player.play_song(int(song_id))
+            deadline = started + args.timeout
+            while not events and time.monotonic() < deadline:
+                root.update()
+                time.sleep(0.005)
+            if events:
+                samples.append(events[0] - started)
+            else:
+                timeouts += 1
+            player.list_player.stop()
+            root.update()
+    finally:
+        player.list_player.stop()
+        player.stream_proxy.stop()
+        root.destroy()
+    result = summarize(samples)
+    result['timeouts'] = timeouts
+    return result
+
+
+def bench_playlist(args):
+    from playlist_store import PlaylistCollection, PlaylistStore
+
+    results = {}
+    for size in args.playlist_sizes:
+        path = f"playlist_{size}.db"
+        store = PlaylistStore(path, legacy_json=None)
+        playlists = PlaylistCollection(store)
+        songs = [{'id': 5000000 + index, 'name': f"歌曲 {index}"} for index in range(size)]
+        sample = random.Random(size).sample(range(size), min(1000, size))
+        timings = {}
+        playlists.create("bench")
+        timings['add_bulk'], _ = timed(playlists.add_songs, "bench", songs)
+        timings['add_single_x100'], _ = timed(
+            lambda: [playlists.add_song("bench", {'id': 9000000 + index, 'name': "单曲"}) for index in range(100)])
+        timings['contains_x1000'], _ = timed(lambda: [songs[index]['id'] in playlists["bench"] for index in sample])
+        timings['move_x100'], _ = timed(lambda: [playlists.move_song("bench", songs[index]['id'])
+                                                 for index in sample[:100]])
+        timings['remove_1000'], _ = timed(playlists.remove_songs, "bench", [songs[index]['id'] for index in sample])
+        timings['export_json'], _ = timed(store.export_json, f"playlist_{size}.json")
+        store.close()
+
+        # 重新打开数据库，测量冷启动加载
+        store = PlaylistStore(path, legacy_json=None)
+        timings['open'], playlists = timed(PlaylistCollection, store)
+        timings['load'], song_list = timed(playlists.__getitem__, "bench")
+        timings['ids'], _ = timed(song_list.ids)
+        store.close()
+        results[str(size)] = {name: round(seconds * 1000, 3) for name, seconds in timings.items()}
+        results[str(size)]['unit'] = "ms"
+    return results
+
+
+def bench_bulk(args):
+    """批量下载吞吐量；第二轮重复同一批任务，验证只下载增量"""
+    from bulk_download import BulkDownloader
+    from url_resolver import resolver
+
+    song_ids = search_ids(args.keywords[2 % len(args.keywords)], args.songs)
+    downloader = BulkDownloader(output_dir="downloads", max_workers=args.workers, report_interval=0)
+    resolver.prefetch(song_ids)
+    rounds = {}
+    for name in ("first", "rerun"):
+        started = time.perf_counter()
+        summary = downloader.download(song_ids)
+        elapsed = time.perf_counter() - started
+        rounds[name] = {
+            'songs': summary['total'],
+            'succeeded': summary['succeeded'],
+            'failed': summary['failed'],
+            'reused': summary['reused'],
+            'bytes': summary['bytes'],
+            'seconds': round(elapsed, 3),
+            'throughput_mb_s': round(summary['bytes'] / elapsed / 1024 / 1024, 3) if elapsed > 0 else 0.0,
+        }
+    return rounds
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="离线基准测试")
+    parser.add_argument("scenarios", nargs="*", help=f"要运行的场景：{', '.join(SCENARIOS)}，默认全部")
+    parser.add_argument("-o", "--output", default="-", help="结果 JSON 路径，默认输出到标准输出")
+    parser.add_argument("--api-latency-ms", type=float, default=30.0, help="模拟接口延迟（毫秒）")
+    parser.add_argument("--api-rate", type=float, help="覆盖客户端的每秒请求数上限，默认沿用程序设置")
+    parser.add_argument("--cdn-latency-ms", type=float, default=20.0, help="模拟 CDN 首字节延迟（毫秒）")
+    parser.add_argument("--bandwidth", type=float, default=8.0, help="每个 CDN 连接的带宽（MB/s），0 为不限速")
+    parser.add_argument("--song-size", type=float, default=4.0, help="每首歌的大小（MB）")
+    parser.add_argument("--keywords", nargs="+", default=["晴天", "夜曲", "稻香"], help="搜索关键词")
+    parser.add_argument("--pages", type=int, default=5, help="每个关键词翻页数")
+    parser.add_argument("--songs", type=int, default=10, help="首次出声和批量下载使用的歌曲数")
+    parser.add_argument("--workers", type=int, default=8, help="批量下载并发数")
+    parser.add_argument("--playlist-sizes", nargs="+", type=int, default=[10000, 100000], help="歌单规模")
+    parser.add_argument("--timeout", type=float, default=15.0, help="等待 VLC 开始播放的秒数")
+    parser.add_argument("--record", metavar="PATH", help="使用真实接口并把响应录制到该夹具文件")
+    parser.add_argument("--replay", metavar="PATH", help="回放夹具文件中的接口响应")
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+    return args
+
+
+def main():
+    args = parse_args()
+    scenarios = args.scenarios or list(SCENARIOS)
+    output = os.path.abspath(args.output) if args.output != "-" else None
+    record = os.path.abspath(args.record) if args.record else None
+    replay = os.path.abspath(args.replay) if args.replay else None
+
+    cdn = MockCdn(song_size=int(args.song_size * 1024 * 1024), latency=args.cdn_latency_ms / 1000,
+                  bandwidth=args.bandwidth * 1024 * 1024 or None).start()
+    recorder = None
+    if record:
+        recorder = RecordingBackend(default_backend(), record)
+        client.set_backend(recorder.mapping())
+    elif replay:
+        client.set_backend(ReplayBackend(replay, cdn, latency=args.api_latency_ms / 1000).mapping())
+    else:
+        client.set_backend(MockApi(cdn, latency=args.api_latency_ms / 1000).backend())
+    if args.api_rate:
+        client.limiter = TokenBucket(args.api_rate, burst=max(1, int(args.api_rate)))
+
+    results = {}
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="pyncm-bench-")
+    os.chdir(workdir)
+    os.makedirs("cache", exist_ok=True)
+    try:
+        for name in scenarios:
+            print(f"运行 {name} ...", file=sys.stderr)
+            cdn.reset_stats()
+            started = time.perf_counter()
+            try:
+                # 被测代码的输出转到标准错误，标准输出只保留结果 JSON
+                with redirect_stdout(sys.stderr):
+                    result = globals()[f"bench_{name}"](args)
+            except Exception as e:
+                result = {'error': f"{type(e).__name__}: {e}"}
+            result['wall_seconds'] = round(time.perf_counter() - started, 3)
+            result['cdn'] = cdn.stats()
+            results[name] = result
+            print(json.dumps(result, ensure_ascii=False), file=sys.stderr)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        if recorder:
+            recorder.save()
+        cdn.stop()
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'mode': "record" if record else "replay" if replay else "mock",
+        'config': {key: value for key, value in vars(args).items() if key not in ("output", "record", "replay")},
+        'api': client.stats(),
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + "\n")
+        print(f"结果已保存为: {output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
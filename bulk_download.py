@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+
+from api_client import client
+from download_engine import SegmentedDownloader
+from download_index import IndexedDownloader
+from utils import sanitize_filename
+
+
+def format_size(num_bytes):
+    """将字节数格式化为易读的字符串"""
+    size = float(num_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class BulkProgress:
+    """批量下载的汇总进度（线程安全）"""
+
+    def __init__(self, total):
+        self.total = total
+        self.succeeded = 0
+        self.failed = 0
+        self.bytes_done = 0
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_bytes(self, count):
+        with self._lock:
+            self.bytes_done += count
+
+    def mark(self, ok):
+        with self._lock:
+            if ok:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started_at
+
+    @property
+    def throughput(self):
+        """平均吞吐量，单位：字节/秒"""
+        elapsed = self.elapsed
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    def render(self):
+        finished = self.succeeded + self.failed
+        return (f"[{finished}/{self.total}] 成功 {self.succeeded} 失败 {self.failed} | "
+                f"{format_size(self.bytes_done)} | {format_size(self.throughput)}/s")
+
+
+class BulkDownloader:
+    """
+    通过有界线程池批量下载歌曲，并按主机限制并发连接数。
+
+    本地已有相同内容（按 md5 判断）的歌曲不再下载，重复运行同一批任务只下载新增的部分。
+    """
+
+    def __init__(self, output_dir="downloads", max_workers=8, per_host_limit=4,
+                 segments=2, report_interval=1.0, index=None):
+        """
+        :param output_dir: 下载目录
+        :param max_workers: 线程池大小
+        :param per_host_limit: 每个 CDN 主机同时进行的下载数上限
+        :param segments: 单个文件的并行分段数
+        :param report_interval: 进度输出间隔（秒），为 0 时不输出
+        :param index: DownloadIndex，默认使用 cache/downloads.db
+        """
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.engine = SegmentedDownloader(segments=segments)
+        self.files = IndexedDownloader(index=index, engine=self.engine)
+        self.report_interval = report_interval
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+
+    def _host_slot(self, url):
+        """获取某个主机的并发信号量"""
+        host = urlsplit(url).netloc
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    @staticmethod
+    def fetch_descriptions(song_ids, batch_size=100):
+        """批量获取歌曲描述，用于生成文件名"""
+        descriptions = {}
+        for start in range(0, len(song_ids), batch_size):
+            batch = song_ids[start:start + batch_size]
+            try:
+                detail = client.track_detail(batch)
+            except Exception as e:
+                print(f"获取歌曲详情时发生错误: {e}")
+                continue
+            for song in detail.get('songs', []):
+                artists = ", ".join(a.get('name', '未知艺术家') for a in song.get('ar', [])) or '未知艺术家'
+                descriptions[song['id']] = f"{song.get('name', '未知歌曲')} - {artists}"
+        return descriptions
+
+    def plan_filenames(self, song_ids, descriptions):
+        """
+        在提交任务之前为每首歌分配文件路径。
+
+        歌名和歌手相同的不同歌曲（现场版、重制版、重复上传等）在文件名后加上歌曲 ID，
+        避免并发写入同一个文件；不区分大小写比较，兼容 Windows 和 macOS 的文件系统。
+        """
+        names = {song_id: sanitize_filename(descriptions.get(song_id, str(song_id))) for song_id in song_ids}
+        counts = {}
+        for name in names.values():
+            counts[name.casefold()] = counts.get(name.casefold(), 0) + 1
+        return {song_id: os.path.join(self.output_dir, f"{name} ({song_id}).mp3"
+                                      if counts[name.casefold()] > 1 else f"{name}.mp3")
+                for song_id, name in names.items()}
+
+    def download(self, song_ids, summary_path=None):
+        """
+        批量下载歌曲。
+
+        :param song_ids: 歌曲 ID 列表
+        :param summary_path: 结果摘要 JSON 的保存路径，为 None 时不保存
+        :return: 结果摘要字典
+        """
+        song_ids = list(dict.fromkeys(int(song_id) for song_id in song_ids))
+        os.makedirs(self.output_dir, exist_ok=True)
+        filenames = self.plan_filenames(song_ids, self.fetch_descriptions(song_ids))
+        progress = BulkProgress(len(song_ids))
+        succeeded, failed = [], []
+
+        def job(song_id):
+            started = time.monotonic()
+            filename = filenames[song_id]
+            info, status = self.files.prepare(song_id, filename)
+            if status is None:
+                with self._host_slot(info['url']):
+                    size = self.files.fetch(song_id, info, filename, progress=progress.add_bytes)
+                status = "downloaded"
+            else:
+                size = os.path.getsize(filename)
+            return {'id': song_id, 'file': filename, 'bytes': size, 'status': status,
+                    'seconds': round(time.monotonic() - started, 3)}
+
+        stop_reporting = threading.Event()
+        reporter = None
+        if self.report_interval > 0:
+            def report():
+                while not stop_reporting.wait(self.report_interval):
+                    print(progress.render())
+            reporter = threading.Thread(target=report, daemon=True)
+            reporter.start()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(job, song_id): song_id for song_id in song_ids}
+                for future in as_completed(futures):
+                    song_id = futures[future]
+                    try:
+                        succeeded.append(future.result())
+                        progress.mark(True)
+                    except Exception as e:
+                        failed.append({'id': song_id, 'error': str(e)})
+                        progress.mark(False)
+        finally:
+            stop_reporting.set()
+            if reporter:
+                reporter.join()
+
+        summary = {
+            'total': progress.total,
+            'succeeded': len(succeeded),
+            'failed': len(failed),
+            'reused': sum(1 for item in succeeded if item['status'] != "downloaded"),
+            'bytes': progress.bytes_done,
+            'elapsed': round(progress.elapsed, 3),
+            'throughput': round(progress.throughput, 1),
+            'results': sorted(succeeded, key=lambda item: item['id']),
+            'errors': sorted(failed, key=lambda item: item['id']),
+        }
+        print(progress.render())
+        if summary_path:
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=4)
+            print(f"下载摘要已保存为: {summary_path}")
+        return summary
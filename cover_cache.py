@@ -0,0 +1,168 @@
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from PIL import Image, ImageTk
+
+from api_client import client
+from http_pool import pool
+from metrics import metrics
+
+
+class CoverCache:
+    """
+    专辑封面的两级缓存。
+
+    内存中按 LRU 保存可直接显示的 100×100 图片；磁盘上按封面 ID 保存缩放好的缩略图。
+    下载、解码和缩放都在线程池中完成，结果通过 ``root.after`` 回到 Tk 主线程。
+    """
+
+    def __init__(self, root, cache_dir="cache/covers", size=(100, 100), memory_items=256, workers=4):
+        """
+        :param root: Tk 根窗口，用于把结果投递回主线程
+        :param cache_dir: 磁盘缓存目录
+        :param size: 缩略图尺寸
+        :param memory_items: 内存中最多保存的图片数
+        :param workers: 解码线程数
+        """
+        self.root = root
+        self.cache_dir = cache_dir
+        self.size = size
+        self.memory_items = memory_items
+        self.session = pool.session
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cover")
+        self._images = OrderedDict()  # 封面 ID -> PhotoImage，只在主线程访问
+        self._index_file = os.path.join(cache_dir, "songs.json")
+        self._index_lock = threading.Lock()
+        self._inflight = {}  # 封面 ID -> 正在下载的 Future
+        self._inflight_lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        try:
+            with open(self._index_file, "r", encoding="utf-8") as f:
+                self._song_covers = {int(k): v for k, v in json.load(f).items()}
+        except (FileNotFoundError, ValueError):
+            self._song_covers = {}  # 歌曲 ID -> 封面 ID
+
+    def load(self, song_id, callback):
+        """
+        获取歌曲封面，在主线程中调用 callback(image, error)。
+
+        内存命中时同步回调并返回 None，否则在线程池中加载并返回对应的 Future。
+        """
+        cover_id = self._song_covers.get(song_id)
+        image = self._images.get(cover_id) if cover_id else None
+        if image is not None:
+            metrics.hit("cover_memory", True)
+            self._images.move_to_end(cover_id)
+            callback(image, None)
+            return None
+        metrics.hit("cover_memory", False)
+        future = self.executor.submit(self._load_thumbnail, song_id)
+        future.add_done_callback(
+            lambda f: None if f.cancelled() else self.root.after(0, self._deliver, f, callback))
+        return future
+
+    def _deliver(self, future, callback):
+        """在主线程中把缩略图转换为 PhotoImage 并放入内存缓存"""
+        try:
+            cover_id, thumbnail = future.result()
+        except Exception as e:
+            callback(None, e)
+            return
+        if thumbnail is None:
+            callback(None, None)
+            return
+        image = ImageTk.PhotoImage(thumbnail)
+        self._images[cover_id] = image
+        self._images.move_to_end(cover_id)
+        while len(self._images) > self.memory_items:
+            self._images.popitem(last=False)
+        callback(image, None)
+
+    def _load_thumbnail(self, song_id):
+        """（工作线程）返回 (封面 ID, 缩略图)，优先读取磁盘缓存"""
+        cover_id = self._song_covers.get(song_id)
+        if cover_id:
+            path = self._thumbnail_path(cover_id)
+            if os.path.exists(path):
+                metrics.hit("cover_disk", True)
+                with Image.open(path) as image:
+                    image.load()
+                    return cover_id, image
+
+        cover_url = self._cover_url(song_id)
+        if not cover_url:
+            return None, None
+        cover_id = os.path.splitext(os.path.basename(urlsplit(cover_url).path))[0]
+        self._remember(song_id, cover_id)
+        path = self._thumbnail_path(cover_id)
+        if os.path.exists(path):
+            metrics.hit("cover_disk", True)
+            with Image.open(path) as image:
+                image.load()
+                return cover_id, image
+
+        metrics.hit("cover_disk", False)
+        return cover_id, self._download_thumbnail(cover_id, cover_url, path)
+
+    def _download_thumbnail(self, cover_id, cover_url, path):
+        """下载并缩放封面，写入磁盘缓存；同一封面（如同一专辑的多首歌）的并发请求只下载一次"""
+        with self._inflight_lock:
+            future = self._inflight.get(cover_id)
+            owner = future is None
+            if owner:
+                future = self._inflight[cover_id] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            # 让 CDN 先缩小图片，减少下载和解码量
+            response = self.session.get(cover_url, params={"param": f"{self.size[0]}y{self.size[1]}"}, timeout=15)
+            response.raise_for_status()
+            metrics.incr("cover_download_bytes", len(response.content))
+            with Image.open(BytesIO(response.content)) as image:
+                thumbnail = image.convert("RGB").resize(self.size, Image.Resampling.LANCZOS)
+            # 每次写入使用独立的临时文件，写完后原子替换
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    thumbnail.save(f, format="PNG")
+                os.replace(temp_path, path)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except Exception as e:
+            with self._inflight_lock:
+                del self._inflight[cover_id]
+            future.set_exception(e)
+            raise
+        with self._inflight_lock:
+            del self._inflight[cover_id]
+        future.set_result(thumbnail)
+        return thumbnail
+
+    @staticmethod
+    def _cover_url(song_id):
+        song_detail = client.track_detail(song_id)
+        if 'songs' in song_detail and song_detail['songs']:
+            return song_detail['songs'][0]['al'].get('picUrl')
+        return None
+
+    def _thumbnail_path(self, cover_id):
+        return os.path.join(self.cache_dir, f"{cover_id}_{self.size[0]}x{self.size[1]}.png")
+
+    def _remember(self, song_id, cover_id):
+        """记录歌曲与封面的对应关系，重播时无需再请求歌曲详情"""
+        with self._index_lock:
+            if self._song_covers.get(song_id) == cover_id:
+                return
+            self._song_covers[song_id] = cover_id
+            temp_file = self._index_file + ".tmp"
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(self._song_covers, f)
+            os.replace(temp_file, self._index_file)
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from http_pool import pool
+from metrics import metrics
+
+
+class DownloadError(Exception):
+    """下载失败"""
+
+
+def file_md5(path, block_size=1024 * 1024):
+    """计算文件的 md5（十六进制小写）"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SegmentedDownloader:
+    """
+    分段、可续传的多连接下载引擎。
+
+    文件按 HTTP Range 切分为多个分段并行下载，以大块缓冲写入预分配的 ``.part`` 文件；
+    下载进度记录在 ``.part.json`` 旁路状态文件中，中断后再次下载同一文件会从断点继续。
+    """
+
+    def __init__(self, segments=4, min_segment_size=1024 * 1024, block_size=256 * 1024,
+                 timeout=30, retries=3, session=None):
+        """
+        :param segments: 最大并行分段数
+        :param min_segment_size: 单个分段的最小字节数，小文件会少分段
+        :param block_size: 写盘缓冲块大小
+        :param timeout: 网络超时（秒）
+        :param retries: 每个分段失败后的重试次数
+        :param session: requests 会话，默认使用全进程共享的连接池
+        """
+        self.segments = max(1, segments)
+        self.min_segment_size = min_segment_size
+        self.block_size = block_size
+        self.timeout = timeout
+        self.retries = retries
+        self.session = session or pool.session
+
+    def download(self, url, filename, progress=None, md5=None):
+        """
+        下载文件到 filename。
+
+        :param url: 文件 URL
+        :param filename: 目标文件名
+        :param progress: 进度回调，参数为本次新写入的字节数
+        :param md5: 期望的 md5，给出时在替换目标文件前校验，不一致则删除临时文件并抛出 DownloadError
+        :return: 文件总字节数
+        """
+        started = time.monotonic()
+        written = [0]
+        lock = threading.Lock()
+
+        def count(length):
+            # 分段线程会并发调用
+            with lock:
+                written[0] += length
+            if progress:
+                progress(length)
+
+        try:
+            size = self._download(url, filename, count, md5)
+        except Exception:
+            metrics.incr("download_errors")
+            raise
+        finally:
+            metrics.incr("download_bytes", written[0])
+        elapsed = time.monotonic() - started
+        metrics.observe("download_seconds", elapsed)
+        if elapsed > 0 and written[0]:
+            # 只按本次实际写入的字节计算，续传时不包含已下载的部分
+            metrics.observe("download_throughput_bytes_per_second", written[0] / elapsed)
+        return size
+
+    def _download(self, url, filename, progress, md5):
+        part_file = filename + ".part"
+        state_file = part_file + ".json"
+        size, etag, ranged = self._probe(url)
+
+        if not ranged or size is None:
+            # 服务器不支持 Range，只能整体重新下载
+            size = self._download_whole(url, part_file, progress)
+        else:
+            state = self._load_state(state_file, part_file, size, etag)
+            if state is None:
+                state = self._new_state(size, etag)
+                self._preallocate(part_file, size)
+            self._download_segments(url, part_file, state_file, state, progress)
+
+        if md5 and file_md5(part_file) != md5.lower():
+            # 内容损坏，断点状态也不可信，下次从头下载
+            os.remove(part_file)
+            if os.path.exists(state_file):
+                os.remove(state_file)
+            metrics.incr("download_checksum_errors")
+            raise DownloadError(f"md5 校验失败: {filename}")
+        os.replace(part_file, filename)
+        if os.path.exists(state_file):
+            os.remove(state_file)
+        return size
+
+    def _probe(self, url):
+        """请求首字节，返回 (文件大小, ETag, 是否支持 Range)"""
+        with self.session.get(url, headers={"Range": "bytes=0-0"}, stream=True,
+                              timeout=self.timeout) as response:
+            response.raise_for_status()
+            etag = response.headers.get("ETag")
+            if response.status_code == 206:
+                content_range = response.headers.get("Content-Range", "")
+                total = content_range.rsplit("/", 1)[-1]
+                if total.isdigit():
+                    return int(total), etag, True
+            length = response.headers.get("Content-Length")
+            return (int(length) if length and length.isdigit() else None), etag, False
+
+    def _new_state(self, size, etag):
+        """按文件大小划分分段"""
+        count = max(1, min(self.segments, size // self.min_segment_size))
+        step = size // count
+        segments = []
+        for index in range(count):
+            start = index * step
+            end = size - 1 if index == count - 1 else start + step - 1
+            segments.append({"start": start, "end": end, "done": start})
+        return {"size": size, "etag": etag, "segments": segments}
+
+    @staticmethod
+    def _load_state(state_file, part_file, size, etag):
+        """读取断点状态，若与服务器文件不一致则丢弃"""
+        try:
+            with open(state_file, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if state.get("size") != size or (etag and state.get("etag") not in (None, etag)):
+            return None
+        if not os.path.exists(part_file) or os.path.getsize(part_file) != size:
+            return None
+        return state
+
+    @staticmethod
+    def _save_state(state_file, state):
+        """原子地写入断点状态"""
+        temp_file = state_file + ".tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temp_file, state_file)
+
+    @staticmethod
+    def _preallocate(part_file, size):
+        """预分配目标文件，避免下载过程中反复扩展文件"""
+        with open(part_file, "wb") as f:
+            if hasattr(os, "posix_fallocate") and size > 0:
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                    return
+                except OSError:
+                    pass
+            f.truncate(size)
+
+    def _download_segments(self, url, part_file, state_file, state, progress):
+        """并行下载所有未完成的分段"""
+        lock = threading.Lock()
+        last_saved = [time.monotonic()]
+
+        def checkpoint(force=False):
+            with lock:
+                now = time.monotonic()
+                if force or now - last_saved[0] >= 0.5:
+                    self._save_state(state_file, state)
+                    last_saved[0] = now
+
+        pending = [segment for segment in state["segments"] if segment["done"] <= segment["end"]]
+        checkpoint(force=True)
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+                futures = [executor.submit(self._fetch_segment, url, part_file, segment,
+                                           lock, checkpoint, progress) for segment in pending]
+                for future in futures:
+                    future.result()
+        finally:
+            checkpoint(force=True)
+
+    def _fetch_segment(self, url, part_file, segment, lock, checkpoint, progress):
+        """下载单个分段，失败时从已完成位置重试"""
+        for attempt in range(self.retries + 1):
+            try:
+                self._fetch_range(url, part_file, segment, lock, checkpoint, progress)
+                return
+            except (requests.RequestException, DownloadError):
+                if attempt == self.retries:
+                    raise
+                time.sleep(min(2 ** attempt, 8))
+
+    def _fetch_range(self, url, part_file, segment, lock, checkpoint, progress):
+        if segment["done"] > segment["end"]:
+            return
+        headers = {"Range": f"bytes={segment['done']}-{segment['end']}"}
+        with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise DownloadError(f"服务器未返回分段内容: HTTP {response.status_code}")
+            with open(part_file, "r+b") as f:
+                f.seek(segment["done"])
+                buffer = bytearray()
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    buffer += chunk
+                    if len(buffer) >= self.block_size:
+                        self._flush(f, buffer, segment, lock, progress)
+                        checkpoint()
+                if buffer:
+                    self._flush(f, buffer, segment, lock, progress)
+        if segment["done"] <= segment["end"]:
+            raise DownloadError("分段数据不完整")
+
+    @staticmethod
+    def _flush(f, buffer, segment, lock, progress):
+        """将缓冲块写盘并推进分段进度"""
+        data = buffer[:segment["end"] - segment["done"] + 1]
+        f.write(data)
+        with lock:
+            segment["done"] += len(data)
+        if progress:
+            progress(len(data))
+        buffer.clear()
+
+    def _download_whole(self, url, part_file, progress):
+        """不支持 Range 时整体下载"""
+        written = 0
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            with open(part_file, "wb") as f:
+                for chunk in response.iter_content(chunk_size=self.block_size):
+                    f.write(chunk)
+                    written += len(chunk)
+                    if progress:
+                        progress(len(chunk))
+        return written
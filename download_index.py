@@ -0,0 +1,184 @@
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from download_engine import DownloadError, SegmentedDownloader, file_md5
+from metrics import metrics
+from url_resolver import DEFAULT_BITRATE, resolver
+
+
+class DownloadIndex:
+    """
+    已下载文件的索引（SQLite，WAL 模式）。
+
+    每个文件按 (歌曲 ID, 码率, md5) 登记，同一内容可以有多个路径；
+    同时记录文件大小和修改时间，文件被改动或删除后对应记录自动失效。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            song_id INTEGER NOT NULL,
+            bitrate INTEGER NOT NULL,
+            md5 TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            downloaded_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_song ON files (song_id, bitrate, md5);
+        CREATE INDEX IF NOT EXISTS files_md5 ON files (md5);
+    """
+
+    def __init__(self, path="cache/downloads.db"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def entry(self, path):
+        """返回文件的 (歌曲 ID, 码率, md5)，未登记或文件已变化时返回 None"""
+        path = os.path.abspath(path)
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT song_id, bitrate, md5, size, mtime_ns FROM files WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        if not self._unchanged(path, row[3], row[4]):
+            self.forget(path)
+            return None
+        return row[:3]
+
+    def find(self, song_id, bitrate, md5):
+        """
+        返回一个内容为 md5 的现存文件路径，优先选择同一歌曲和码率的记录；没有时返回 None。
+
+        失效的记录会顺便删除。
+        """
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE md5 = ? "
+                "ORDER BY song_id = ? AND bitrate = ? DESC", (md5, int(song_id), int(bitrate))).fetchall()
+        for path, size, mtime_ns in rows:
+            if self._unchanged(path, size, mtime_ns):
+                return path
+            self.forget(path)
+        return None
+
+    def record(self, path, song_id, bitrate, md5):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (path, song_id, bitrate, md5, size, mtime_ns, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, int(song_id), int(bitrate), md5, stat.st_size, stat.st_mtime_ns, time.time()))
+
+    def forget(self, path):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(path),))
+
+    def close(self):
+        self.conn.close()
+
+    @staticmethod
+    def _unchanged(path, size, mtime_ns):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return stat.st_size == size and stat.st_mtime_ns == mtime_ns
+
+
+class IndexedDownloader:
+    """
+    按内容去重的下载器。
+
+    下载前用 ``GetTrackAudio`` 返回的 md5 查询索引：目标文件已是同一内容时直接跳过，
+    本地其他位置已有同一内容时建立硬链接（跨设备时复制），都没有时才下载。
+    下载写入临时文件，校验 md5 后原子替换目标文件并登记到索引。
+    """
+
+    def __init__(self, index=None, engine=None, get_info=None):
+        """
+        :param index: DownloadIndex，默认使用 cache/downloads.db
+        :param engine: SegmentedDownloader 实例
+        :param get_info: 根据 (歌曲 ID, 码率) 返回音频信息（url、md5、size）的函数，默认使用共享的解析器
+        """
+        self.index = index or DownloadIndex()
+        self.engine = engine or SegmentedDownloader()
+        self.get_info = get_info or resolver.get_info
+
+    def download(self, song_id, filename, bitrate=DEFAULT_BITRATE, progress=None):
+        """
+        确保 filename 是该歌曲的音频。
+
+        :return: (状态, 文件字节数)，状态为 "exists"（已存在，未做任何事）、"linked"（从本地已有文件链接或复制）
+                 或 "downloaded"（联网下载）
+        """
+        info, status = self.prepare(song_id, filename, bitrate)
+        if status:
+            return status, os.path.getsize(filename)
+        return "downloaded", self.fetch(song_id, info, filename, bitrate, progress)
+
+    def prepare(self, song_id, filename, bitrate=DEFAULT_BITRATE):
+        """
+        解析音频信息，并尽量用本地文件满足请求。
+
+        :return: (音频信息, 状态)，状态为 "exists"、"linked"，需要下载时为 None
+        """
+        info = self.get_info(song_id, bitrate)
+        if not info or not info.get('url'):
+            raise DownloadError(f"未能获取音频 URL: {song_id}")
+        md5 = (info.get('md5') or "").lower()
+        if not md5:
+            # 接口没有给出 md5 时无法判断内容，只能重新下载
+            return info, None
+
+        if os.path.exists(filename):
+            if self.index.entry(filename) == (int(song_id), int(bitrate), md5):
+                metrics.hit("download_index", True)
+                return info, "exists"
+            # 索引建立之前下载的文件：大小一致时校验一次内容
+            if os.path.getsize(filename) == info.get('size') and file_md5(filename) == md5:
+                self.index.record(filename, song_id, bitrate, md5)
+                metrics.hit("download_index", True)
+                return info, "exists"
+
+        source = self.index.find(song_id, bitrate, md5)
+        if source:
+            self._link(source, filename)
+            self.index.record(filename, song_id, bitrate, md5)
+            metrics.hit("download_index", True)
+            return info, "linked"
+        metrics.hit("download_index", False)
+        return info, None
+
+    def fetch(self, song_id, info, filename, bitrate=DEFAULT_BITRATE, progress=None):
+        """下载、校验并登记，返回文件字节数"""
+        md5 = (info.get('md5') or "").lower()
+        size = self.engine.download(info['url'], filename, progress=progress, md5=md5 or None)
+        if md5:
+            self.index.record(filename, song_id, bitrate, md5)
+        return size
+
+    @staticmethod
+    def _link(source, filename):
+        """把 source 硬链接到 filename（原子替换已有文件），无法硬链接时复制"""
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(filename) and os.path.samefile(source, filename):
+            return
+        temp_path = filename + ".link"
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, filename)
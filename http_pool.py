@@ -0,0 +1,99 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import metrics
+
+# 默认超时：(建立连接, 读取) 秒
+DEFAULT_TIMEOUT = (5, 30)
+
+
+class TimeoutAdapter(HTTPAdapter):
+    """未指定 timeout 的请求使用默认超时，避免连接永久挂起"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=timeout if timeout is not None else self.timeout, **kwargs)
+
+
+class HttpPool:
+    """
+    全进程共享的 keep-alive 连接池。
+
+    音频下载、本地流代理回源和封面获取都使用同一个 requests 会话，
+    同一主机的请求复用已建立的 TCP/TLS 连接。每个主机的连接池大小可以单独设置，
+    也可以直接挂载 pyncm 会话的 adapter，与接口请求共享连接。
+    """
+
+    def __init__(self, pool_connections=16, pool_maxsize=16, host_limits=None, timeout=DEFAULT_TIMEOUT):
+        """
+        :param pool_connections: 缓存连接池的主机数
+        :param pool_maxsize: 每个主机默认保持的最大连接数
+        :param host_limits: {主机名: 最大连接数}，覆盖默认值
+        :param timeout: 默认超时，(连接, 读取) 秒
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._adapters = []
+        self._mount("http://", pool_maxsize)
+        self._mount("https://", pool_maxsize)
+        for host, size in (host_limits or {}).items():
+            self.set_host_limit(host, size)
+
+    def set_host_limit(self, host, size):
+        """设置某个主机保持的最大连接数"""
+        for scheme in ("http", "https"):
+            self._mount(f"{scheme}://{host}/", size)
+
+    def use_pyncm_adapters(self):
+        """挂载 pyncm 当前会话的 adapter，使媒体请求与接口请求共享连接池"""
+        from pyncm import GetCurrentSession
+
+        with self._lock:
+            for prefix, adapter in GetCurrentSession().adapters.items():
+                self.session.mount(prefix, adapter)
+                self._adapters.append(adapter)
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def stats(self):
+        """返回各主机的 {"connections": 新建连接数, "requests": 请求数}"""
+        result = {}
+        with self._lock:
+            adapters = list(self._adapters)
+        for adapter in adapters:
+            manager = getattr(adapter, "poolmanager", None)
+            if manager is None:
+                continue
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                host = f"{key.key_scheme}://{key.key_host}:{key.key_port}"
+                entry = result.setdefault(host, {"connections": 0, "requests": 0})
+                entry["connections"] += pool.num_connections
+                entry["requests"] += pool.num_requests
+        return result
+
+    def close(self):
+        self.session.close()
+
+    def _mount(self, prefix, size):
+        adapter = TimeoutAdapter(timeout=self.timeout, pool_connections=self.pool_connections,
+                                 pool_maxsize=size)
+        with self._lock:
+            self.session.mount(prefix, adapter)
+            self._adapters.append(adapter)
+
+
+# 全进程共享的连接池
+pool = HttpPool()
+metrics.add_collector("http_pool", pool.stats, "host")
@@ -0,0 +1,273 @@
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import mutagen
+except ImportError:  # 没有 mutagen 时只从文件名解析歌名和歌手
+    mutagen = None
+
+from metrics import metrics
+
+AUDIO_EXTENSIONS = {".mp3", ".flac", ".m4a", ".aac", ".ogg", ".opus", ".wav", ".ape", ".wma"}
+
+# 默认扫描的目录：(目录, 是否包含子目录)；ncm.py 单曲下载保存在当前目录，批量下载保存在 downloads/
+LIBRARY_DIRS = (("downloads", True), (".", False))
+
+# 中日韩文字没有空格分词，按单字和相邻两字切分
+_CJK_CHARS = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TERM = re.compile(f"[{_CJK_CHARS}]+|[^\\W_{_CJK_CHARS}]+")
+_CJK = re.compile(f"[{_CJK_CHARS}]")
+_ALBUM_SUFFIX = re.compile(r"\s*\(专辑:\s*(.*?)\)\s*$")
+
+
+def tokenize(text):
+    """把文本切分为索引词：中日韩文字输出单字和相邻两字，其他文字按单词切分"""
+    terms = []
+    for run in _TERM.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if _CJK.match(run):
+            terms.extend(run)
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return terms
+
+
+def match_expression(query):
+    """
+    把用户输入转换为 FTS5 查询：所有词都要出现。
+
+    中日韩文字用相邻两字匹配（单个字时用单字），其他单词按前缀匹配，便于边输入边搜索。
+    """
+    parts = []
+    for run in _TERM.findall(unicodedata.normalize("NFKC", query or "").lower()):
+        if not _CJK.match(run):
+            parts.append(f'"{run}"*')
+        elif len(run) == 1:
+            parts.append(f'"{run}"')
+        else:
+            parts.extend(f'"{run[i:i + 2]}"' for i in range(len(run) - 1))
+    return " AND ".join(parts)
+
+
+def parse_filename(path):
+    """从 "歌名 - 歌手.mp3" 或 "歌名 - 歌手 (专辑: 专辑名).mp3" 形式的文件名解析标签"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    album = ""
+    match = _ALBUM_SUFFIX.search(name)
+    if match:
+        album = match.group(1)
+        name = name[:match.start()]
+    title, _, artist = name.partition(" - ")
+    return {'title': title.strip(), 'artist': artist.strip(), 'album': album.strip(), 'duration': 0.0}
+
+
+def read_tags(path):
+    """读取音频文件的标签，缺失的字段用文件名补充"""
+    tags = parse_filename(path)
+    if mutagen is None:
+        return tags
+    try:
+        audio = mutagen.File(path, easy=True)
+    except Exception:
+        return tags
+    if audio is None:
+        return tags
+    for field, key in (('title', 'title'), ('artist', 'artist'), ('album', 'album')):
+        values = (audio.tags or {}).get(key) if audio.tags is not None else None
+        if values:
+            tags[field] = ", ".join(str(value) for value in values)
+    if audio.info is not None and getattr(audio.info, 'length', None):
+        tags['duration'] = round(audio.info.length, 3)
+    return tags
+
+
+class LibraryIndex:
+    """
+    本地音乐库索引（SQLite FTS5）。
+
+    增量扫描下载目录：按文件大小和修改时间判断，只重新读取新增或变化的文件，并删除已不存在的记录。
+    歌名、歌手、专辑和文件名切分后写入全文索引，搜索完全在本地完成。
+    从下载索引能查到歌曲 ID 的文件沿用网易云的 ID，其余文件使用负数 ID（本地曲目 ID 取反）。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tracks (
+            id INTEGER PRIMARY KEY,
+            path TEXT NOT NULL UNIQUE,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            song_id INTEGER,
+            title TEXT NOT NULL,
+            artist TEXT NOT NULL,
+            album TEXT NOT NULL,
+            duration REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tracks_song ON tracks (song_id);
+        CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(terms, tokenize='unicode61');
+    """
+
+    def __init__(self, path="cache/library.db", download_index=None, workers=4, batch_size=500):
+        """
+        :param path: 数据库文件路径
+        :param download_index: DownloadIndex，用于查找文件对应的网易云歌曲 ID
+        :param workers: 读取标签的线程数
+        :param batch_size: 扫描时每个事务写入的文件数
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.download_index = download_index
+        self.workers = workers
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def scan(self, roots=LIBRARY_DIRS):
+        """
+        增量扫描目录，返回 {"added", "updated", "removed", "unchanged"} 统计。
+
+        :param roots: (目录, 是否包含子目录) 的序列
+        """
+        with self._lock:
+            known = {path: (track_id, size, mtime_ns) for track_id, path, size, mtime_ns
+                     in self.conn.execute("SELECT id, path, size, mtime_ns FROM tracks")}
+        counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        changed = []
+        seen = set()
+        scanned = []
+        for root, recursive in roots:
+            root = os.path.abspath(root)
+            if not os.path.isdir(root):
+                continue
+            scanned.append((root, recursive))
+            for path, stat in self._walk(root, recursive):
+                if path in seen:
+                    continue
+                seen.add(path)
+                entry = known.get(path)
+                if entry and entry[1] == stat.st_size and entry[2] == stat.st_mtime_ns:
+                    counts["unchanged"] += 1
+                else:
+                    changed.append((path, stat, entry[0] if entry else None))
+
+        # 只有扫描过的目录下消失的文件才删除
+        removed = [entry[0] for path, entry in known.items()
+                   if path not in seen and self._under(path, scanned)]
+
+        # 分批读取标签和写入，首次扫描大量文件时搜索不会被长时间阻塞
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for start in range(0, len(changed), self.batch_size):
+                batch = changed[start:start + self.batch_size]
+                tags = list(executor.map(lambda item: read_tags(item[0]), batch))
+                with self._lock, self.conn:
+                    for (path, stat, track_id), info in zip(batch, tags):
+                        counts["updated" if track_id else "added"] += 1
+                        self._store(path, stat, track_id, info)
+
+        with self._lock, self.conn:
+            for track_id in removed:
+                self.conn.execute("DELETE FROM tracks WHERE id = ?", (track_id,))
+                self.conn.execute("DELETE FROM tracks_fts WHERE rowid = ?", (track_id,))
+        counts["removed"] = len(removed)
+        return counts
+
+    def search(self, query, limit=50):
+        """按相关度返回匹配的曲目字典列表；没有可搜索的词时返回空列表"""
+        expression = match_expression(query)
+        if not expression:
+            return []
+        with metrics.span("library_search_seconds"), self._lock:
+            rows = self.conn.execute(
+                "SELECT t.id, t.song_id, t.path, t.title, t.artist, t.album, t.duration "
+                "FROM tracks_fts JOIN tracks AS t ON t.id = tracks_fts.rowid "
+                "WHERE tracks_fts MATCH ? ORDER BY rank LIMIT ?", (expression, limit)).fetchall()
+        return [self._track(row) for row in rows]
+
+    def path_for(self, song_id):
+        """返回歌曲在本地的文件路径：负数 ID 为本地曲目，正数 ID 查找已下载的文件；没有时返回 None"""
+        song_id = int(song_id)
+        with self._lock:
+            if song_id < 0:
+                rows = self.conn.execute("SELECT path FROM tracks WHERE id = ?", (-song_id,)).fetchall()
+            else:
+                rows = self.conn.execute("SELECT path FROM tracks WHERE song_id = ?", (song_id,)).fetchall()
+        for path, in rows:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+    def _store(self, path, stat, track_id, info):
+        """写入一个曲目及其索引词（调用方持有锁并处于事务中）"""
+        song_id = self._song_id(path)
+        if track_id is None:
+            cursor = self.conn.execute(
+                "INSERT INTO tracks (path, size, mtime_ns, song_id, title, artist, album, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, song_id, info['title'], info['artist'],
+                 info['album'], info['duration']))
+            track_id = cursor.lastrowid
+        else:
+            self.conn.execute(
+                "UPDATE tracks SET size = ?, mtime_ns = ?, song_id = ?, title = ?, artist = ?, "
+                "album = ?, duration = ? WHERE id = ?",
+                (stat.st_size, stat.st_mtime_ns, song_id, info['title'], info['artist'],
+                 info['album'], info['duration'], track_id))
+            self.conn.execute("DELETE FROM tracks_fts WHERE rowid = ?", (track_id,))
+        terms = tokenize(" ".join((info['title'], info['artist'], info['album'],
+                                   os.path.splitext(os.path.basename(path))[0])))
+        self.conn.execute("INSERT INTO tracks_fts (rowid, terms) VALUES (?, ?)",
+                          (track_id, " ".join(dict.fromkeys(terms))))
+
+    def _song_id(self, path):
+        if self.download_index is None:
+            return None
+        entry = self.download_index.entry(path)
+        return entry[0] if entry else None
+
+    @staticmethod
+    def _track(row):
+        track_id, song_id, path, title, artist, album, duration = row
+        return {'id': song_id if song_id else -track_id, 'path': path, 'title': title, 'artist': artist,
+                'album': album, 'duration': duration}
+
+    @staticmethod
+    def _walk(root, recursive):
+        """遍历目录中的音频文件，返回 (绝对路径, stat)"""
+        pending = [root]
+        while pending:
+            directory = pending.pop()
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not entry.name.startswith("."):
+                            pending.append(entry.path)
+                    elif os.path.splitext(entry.name)[1].lower() in AUDIO_EXTENSIONS:
+                        yield entry.path, entry.stat()
+                except OSError:
+                    continue
+
+    @staticmethod
+    def _under(path, roots):
+        for root, recursive in roots:
+            parent = os.path.dirname(path)
+            if parent == root or (recursive and path.startswith(root + os.sep)):
+                return True
+        return False
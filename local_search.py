@@ -0,0 +1,55 @@
+import re
+from difflib import SequenceMatcher
+
+from utils import normalize
+
+# 模糊匹配的最低相似度，低于此值的候选不显示
+FUZZY_THRESHOLD = 0.6
+
+_WORD = re.compile(r"\w+")
+
+
+def match_score(query, text):
+    """
+    计算搜索词与一条候选文本的匹配度（0 表示不匹配，越大越靠前）。
+
+    依次尝试：整体前缀、某个单词的前缀、包含、所有词都出现，最后用歌名部分做模糊比较，
+    容忍输错个别字。
+    """
+    query_key = normalize(query)
+    text_key = normalize(text)
+    if not query_key or not text_key:
+        return 0.0
+    if text_key.startswith(query_key):
+        return 1.0
+    if any(normalize(word).startswith(query_key) for word in _WORD.findall(text)):
+        return 0.9
+    if query_key in text_key:
+        return 0.8
+    terms = [normalize(term) for term in query.split()]
+    if len(terms) > 1 and all(term in text_key for term in terms if term):
+        return 0.7
+
+    # 候选文本一般是 "歌名 - 歌手"，只和歌名比较，避免长文本拉低相似度
+    title_key = normalize(text.partition(" - ")[0]) or text_key
+    matcher = SequenceMatcher(None, query_key, title_key)
+    if matcher.real_quick_ratio() < FUZZY_THRESHOLD or matcher.quick_ratio() < FUZZY_THRESHOLD:
+        return 0.0
+    ratio = matcher.ratio()
+    return ratio * 0.6 if ratio >= FUZZY_THRESHOLD else 0.0
+
+
+def rank(query, candidates, limit=20):
+    """
+    按匹配度排序候选项，相同匹配度时保持原有顺序。
+
+    :param candidates: (对象, 候选文本) 的可迭代对象
+    :return: 匹配的对象列表，最多 limit 个
+    """
+    scored = []
+    for position, (item, text) in enumerate(candidates):
+        score = match_score(query, text)
+        if score > 0:
+            scored.append((-score, position, item))
+    scored.sort(key=lambda entry: entry[:2])
+    return [item for _, _, item in scored[:limit]]
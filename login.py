@@ -1,7 +1,5 @@
 import tkinter as tk
 from tkinter import messagebox
-from pyncm import GetCurrentSession, SetCurrentSession
-from pyncm.apis.login import LoginViaCellphone
 from utils import center_window  # 假设中心窗口逻辑被提取到 utils.py
 
 
@@ -50,6 +48,9 @@ class LoginWindow:
         phone = self.entry_phone.get()
         password = self.entry_password.get()
         try:
+            # pyncm 在用到时才导入，登录窗口不必等它加载
+            from pyncm import GetCurrentSession
+            from pyncm.apis.login import LoginViaCellphone
             response = LoginViaCellphone(phone=phone, password=password)
             if response['code'] == 200:
                 messagebox.showinfo("成功", "登录成功")
@@ -79,7 +80,8 @@ class LoginWindow:
             with open(self.cookie_file, "r") as file:
                 cookie_string = file.read().strip()
                 cookies = {item.split("=")[0]: item.split("=")[1] for item in cookie_string.split("; ")}
-                
+                from pyncm import GetCurrentSession, SetCurrentSession
+
                 # 设置会话的 Cookie
                 session = GetCurrentSession()
                 session.cookies.update(cookies)
@@ -0,0 +1,328 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import compress, islice, repeat
+from operator import add, itemgetter, le, truediv
+
+# 一行可以带多个时间标签：[00:12.34][01:02.50]歌词；第一个标签单独捕获，多数行无需再解析其余标签。
+# 文本用 .* 而不是 [^\r\n]* 匹配，更快，行尾的 \r 随后与空白一起去掉
+_LRC_LINE = re.compile(
+    r'^[ \t]*\[(\d+):(\d+)(?:[.:](\d+))?\]((?:[ \t]*\[\d+:\d+(?:[.:]\d+)?\])*)(.*)', re.M)
+_LRC_TAG = re.compile(r'\[(\d+):(\d+)(?:[.:](\d+))?\]')
+# 不用 ^ 锚定行首：re.M 下的 ^ 要在每一行尝试，整段歌词没有 offset 标签时很慢
+_LRC_OFFSET = re.compile(r'\[offset:[ \t]*([+-]?\d+)\]', re.I)
+# 逐字歌词：[行开始毫秒,行时长](字开始毫秒,字时长,0)字(...)字
+_YRC_LINE = re.compile(r'^\[(\d+),\d+\]([^\r\n]*)', re.M)
+_YRC_WORD = re.compile(r'\((\d+),\d+,\d+\)([^(\r\n]*)')
+
+# 翻译、逐字歌词与原文开始时间相差不超过该值（毫秒）时视为同一行
+MATCH_TOLERANCE = {"translation": 50, "words": 1000}
+
+
+def _digit_table(count, scale):
+    table = {}
+    for value in range(count):
+        table[str(value)] = table[f"{value:02d}"] = value * scale
+    return table
+
+
+# 常见写法的分、秒和小数部分直接查表换算为毫秒，比逐个调用 int() 快得多；查不到时回退到 _to_ms
+_MINUTES_MS = _digit_table(1000, 60000)
+_SECONDS_MS = _digit_table(60, 1000)
+_FRACTION_MS = {"": 0}
+_FRACTION_MS.update((str(value), value * 100) for value in range(10))
+_FRACTION_MS.update((f"{value:02d}", value * 10) for value in range(100))
+_FRACTION_MS.update((f"{value:03d}", value) for value in range(1000))
+
+
+def _to_ms(minutes, seconds, fraction):
+    if not fraction:
+        millis = 0
+    elif len(fraction) == 2:
+        millis = int(fraction) * 10
+    elif len(fraction) == 3:
+        millis = int(fraction)
+    else:
+        millis = int(fraction.ljust(3, '0')[:3])
+    return int(minutes) * 60000 + int(seconds) * 1000 + millis
+
+
+def lrc_offset(raw_lyrics):
+    """返回 [offset:] 标签的毫秒数，正数表示歌词整体提前；没有时为 0"""
+    for offset_match in _LRC_OFFSET.finditer(raw_lyrics or ""):
+        # 只认行首（前面只有空白）的标签
+        start = offset_match.start()
+        if not raw_lyrics[raw_lyrics.rfind("\n", 0, start) + 1:start].strip(" \t"):
+            return int(offset_match.group(1))
+    return 0
+
+
+def _columns_ms(minutes, seconds, fractions):
+    """把分、秒、小数三列换算为毫秒列表"""
+    try:
+        return list(map(add, map(add, map(_MINUTES_MS.__getitem__, minutes), map(_SECONDS_MS.__getitem__, seconds)),
+                        map(_FRACTION_MS.__getitem__, fractions)))
+    except KeyError:
+        return list(map(_to_ms, minutes, seconds, fractions))
+
+
+def _lrc_columns(raw_lyrics):
+    """
+    解析 LRC 文本，忽略元数据标签。
+
+    :return: (各行标签上的毫秒数, 各行文本) 两个按时间排序的列表
+    """
+    found = _LRC_LINE.findall(raw_lyrics) if raw_lyrics else None
+    if not found:
+        return [], []
+    # 按列整体换算，避免逐行执行 Python 代码
+    minutes, seconds, fractions, more_tags, texts = zip(*found)
+    times = _columns_ms(minutes, seconds, fractions)
+    texts = list(map(str.strip, texts))
+    if any(more_tags):
+        # 其余标签拼在一起一次解析，每行的标签数就是其中 "[" 的个数
+        tag_groups = list(compress(more_tags, more_tags))
+        times += _columns_ms(*zip(*_LRC_TAG.findall("".join(tag_groups))))
+        extra_texts = []
+        for text, count in zip(compress(texts, more_tags), map(str.count, tag_groups, repeat("["))):
+            extra_texts += [text] * count
+        texts += extra_texts
+    if not all(map(le, times, islice(times, 1, None))):
+        order = sorted(range(len(times)), key=times.__getitem__)
+        times = [times[index] for index in order]
+        texts = [texts[index] for index in order]
+    return times, texts
+
+
+def _shift(times, offset):
+    """按 [offset:] 调整时间，早于 0 的按 0 处理"""
+    if not offset:
+        return times
+    return [time_ms - offset if time_ms > offset else 0 for time_ms in times]
+
+
+def parse_lrc(raw_lyrics, apply_offset=True):
+    """
+    解析 LRC 文本，返回按时间排序的 [(毫秒, 文本)]，忽略 [ti:] [by:] 等元数据标签。
+
+    :param apply_offset: 是否按 [offset:] 标签调整时间，为 False 时返回标签上的原始时间
+    """
+    times, texts = _lrc_columns(raw_lyrics)
+    if apply_offset:
+        times = _shift(times, lrc_offset(raw_lyrics))
+    return list(zip(times, texts))
+
+
+def parse_yrc(raw_yrc):
+    """
+    解析逐字歌词，忽略 JSON 格式的作词作曲信息行。
+
+    :return: [(行开始毫秒, 文本, (各字开始秒数, 各字结束时的字符偏移))]
+    """
+    if not raw_yrc:
+        return []
+    lines = []
+    for start, body in _YRC_LINE.findall(raw_yrc):
+        words = _YRC_WORD.findall(body)
+        if not words:
+            continue
+        starts = array('d')
+        ends = array('l')
+        offset = 0
+        for word_start, word in words:
+            starts.append(int(word_start) / 1000)
+            offset += len(word)
+            ends.append(offset)
+        lines.append((int(start), "".join([word for _, word in words]), (starts, ends)))
+    return lines
+
+
+def _nearest(starts, time_ms, tolerance):
+    """在升序的 starts 中找与 time_ms 最接近且相差不超过 tolerance 的下标"""
+    position = bisect_left(starts, time_ms)
+    best = None
+    if position < len(starts) and starts[position] - time_ms <= tolerance:
+        best = position
+    if position > 0 and time_ms - starts[position - 1] <= tolerance:
+        if best is None or time_ms - starts[position - 1] < starts[best] - time_ms:
+            best = position - 1
+    return best
+
+
+def _pair_nearest(times, texts, starts, tolerance):
+    """
+    把原文各行与升序的 starts 一一配对：时间差越小越先配对，两边每行最多用一次，
+    空行（间奏停顿）不参与配对。
+
+    :return: {原文下标: starts 下标}
+    """
+    candidates = []
+    for index, time_ms in enumerate(times):
+        if not texts[index]:
+            continue
+        for other in range(bisect_left(starts, time_ms - tolerance), bisect_right(starts, time_ms + tolerance)):
+            candidates.append((abs(starts[other] - time_ms), index, other))
+    candidates.sort()
+    pairs = {}
+    used = set()
+    for _, index, other in candidates:
+        if index not in pairs and other not in used:
+            pairs[index] = other
+            used.add(other)
+    return pairs
+
+
+def parse_lyrics(lrc="", tlyric="", yrc=""):
+    """
+    解析 GetTrackLyrics 返回的歌词并合并为一个时间轴。
+
+    :param lrc: 原文 LRC
+    :param tlyric: 翻译 LRC，按开始时间就近合并到原文
+    :param yrc: 逐字歌词，按开始时间与原文一一配对，配上的行改用逐字歌词的文本；没有原文时直接作为时间轴
+    """
+    # 翻译按标签上的原始时间与原文对应，原文的 offset 只在生成时间轴时应用；
+    # 逐字歌词本身就是播放时间，与调整后的原文时间比较
+    tag_times, texts = _lrc_columns(lrc)
+    times = _shift(tag_times, lrc_offset(lrc))
+    word_lines = parse_yrc(yrc)
+    word_lines.sort(key=itemgetter(0))
+    if texts:
+        words = [None] * len(texts)
+        if word_lines:
+            word_starts = [start for start, _, _ in word_lines]
+            for index, other in _pair_nearest(times, texts, word_starts, MATCH_TOLERANCE["words"]).items():
+                _, texts[index], words[index] = word_lines[other]
+    else:
+        tag_times = times = [start for start, _, _ in word_lines]
+        texts = [text for _, text, _ in word_lines]
+        words = [line_words for _, _, line_words in word_lines]
+
+    translations = [""] * len(texts)
+    if tlyric and texts:
+        translation_times, translation_texts = _lrc_columns(tlyric)
+        translation_starts = [start for start, text in zip(translation_times, translation_texts) if text]
+        translation_texts = [text for text in translation_texts if text]
+        for index, tag_ms in enumerate(tag_times):
+            if texts[index]:
+                match = _nearest(translation_starts, tag_ms, MATCH_TOLERANCE["translation"])
+                if match is not None:
+                    translations[index] = translation_texts[match]
+    return LyricTimeline.from_columns(array('d', map(truediv, times, repeat(1000))), texts, translations, words)
+
+
+class LyricTimeline:
+    """
+    按时间排序的歌词时间轴。
+
+    时间戳（秒）存放在 array 中，文本、翻译和逐字时间分别存放在平行的列表里；
+    逐字时间以 (各字开始秒数, 各字结束时的字符偏移) 两个 array 表示，没有时为 None。
+    """
+
+    def __init__(self, lyrics=()):
+        """
+        :param lyrics: (时间秒数, 歌词文本) 序列，无需预先排序
+        """
+        self.times = array('d')
+        self.texts = []
+        self.translations = []
+        self.words = []
+        for time, text in sorted(lyrics, key=lambda item: item[0]):
+            self.append(time, text)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        return zip(self.times, self.texts)
+
+    def append(self, time, text, translation="", words=None):
+        """
+        在末尾追加一行，调用方需保证时间不早于上一行。
+
+        :param words: (各字开始秒数, 各字结束时的字符偏移)，见 parse_yrc
+        """
+        self.times.append(time)
+        self.texts.append(text)
+        self.translations.append(translation)
+        self.words.append(words)
+
+    def to_dict(self):
+        """转换为可写入 JSON 的字典"""
+        return {
+            "times": self.times.tolist(),
+            "texts": self.texts,
+            "translations": self.translations,
+            "words": [None if words is None else [words[0].tolist(), words[1].tolist()] for words in self.words],
+        }
+
+    @classmethod
+    def from_columns(cls, times, texts, translations, words):
+        """直接用已排序的各列构造时间轴，times 为秒数 array('d')"""
+        timeline = cls()
+        timeline.times = times
+        timeline.texts = texts
+        timeline.translations = translations
+        timeline.words = words
+        return timeline
+
+    @classmethod
+    def from_dict(cls, data):
+        """从 to_dict() 的结果恢复时间轴"""
+        timeline = cls()
+        timeline.times = array('d', data["times"])
+        timeline.texts = data["texts"]
+        timeline.translations = data["translations"]
+        timeline.words = [None if words is None else (array('d', words[0]), array('l', words[1]))
+                          for words in data["words"]]
+        return timeline
+
+    def index_at(self, current_time):
+        """返回 current_time 时应显示的歌词下标，早于第一句时返回 0，无歌词时返回 None"""
+        if not self.times:
+            return None
+        return max(bisect_right(self.times, current_time) - 1, 0)
+
+    def sung_chars(self, index, current_time):
+        """返回第 index 行在 current_time 时已唱到的字符数，该行没有逐字时间时返回 None"""
+        words = self.words[index]
+        if words is None:
+            return None
+        starts, ends = words
+        sung = bisect_right(starts, current_time)
+        return ends[sung - 1] if sung else 0
+
+
+class LyricCursor:
+    """
+    歌词游标。
+
+    正常播放时时间单调递增，游标只需向后检查相邻的时间戳，均摊 O(1)；
+    拖动进度等导致时间回退或大幅跳跃时才用二分查找重新定位，O(log n)。
+    """
+
+    # 向后逐行推进的最大行数，超过后改用二分查找
+    MAX_STEPS = 8
+
+    def __init__(self, timeline):
+        self.timeline = timeline
+        self.index = None
+
+    def advance(self, current_time):
+        """返回 current_time 对应的歌词下标"""
+        times = self.timeline.times
+        if not times:
+            return None
+        index = self.index
+        if index is None or current_time < times[index]:
+            # 首次定位或时间回退
+            self.index = self.timeline.index_at(current_time)
+            return self.index
+        steps = 0
+        while index + 1 < len(times) and times[index + 1] <= current_time:
+            index += 1
+            steps += 1
+            if steps > self.MAX_STEPS:
+                index = self.timeline.index_at(current_time)
+                break
+        self.index = index
+        return index
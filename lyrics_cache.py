@@ -0,0 +1,155 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api_client import client
+from lyric_timeline import LyricTimeline, parse_lyrics
+from metrics import metrics
+
+# 解析器输出格式变化时递增，旧格式的缓存会从原始歌词重新解析，无需联网
+PARSER_VERSION = 3
+
+# GetTrackLyrics 返回的歌词字段：原文、翻译、逐字
+LYRIC_FIELDS = ("lrc", "tlyric", "yrc")
+
+
+class LyricsCache:
+    """
+    歌词的磁盘缓存（SQLite）。
+
+    以歌曲 ID 为键，保存接口返回的原始歌词、各字段的版本号和解析好的时间轴，
+    重播时直接读取，断网时同样可用。超过 max_age 的条目照常返回，
+    同时在后台重新请求，只有歌词版本号变化时才重新解析和写入。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS lyrics (
+            song_id INTEGER PRIMARY KEY,
+            versions TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            parser_version INTEGER NOT NULL,
+            timeline TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path="cache/lyrics.db", max_age=7 * 24 * 3600, workers=4):
+        """
+        :param path: 数据库文件路径
+        :param max_age: 超过该秒数的歌词在使用时后台刷新
+        :param workers: 后台预取的并发数
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_age = max_age
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lyrics")
+        self._lock = threading.Lock()
+        self._pending = set()  # 已排队等待后台获取的歌曲 ID
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def cached(self, song_id):
+        """只读缓存，返回时间轴；未缓存时返回 None，不会联网"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT payload, parser_version, timeline, fetched_at FROM lyrics WHERE song_id = ?",
+                (int(song_id),)).fetchone()
+        if row is None:
+            return None
+        metrics.hit("lyrics_cache", True)
+        payload, parser_version, timeline, fetched_at = row
+        if parser_version != PARSER_VERSION:
+            payload = json.loads(payload)
+            timeline = self._parse(payload)
+            self._store(song_id, payload, timeline, fetched_at)
+        else:
+            timeline = LyricTimeline.from_dict(json.loads(timeline))
+        if time.time() - fetched_at > self.max_age:
+            self._submit(song_id)
+        return timeline
+
+    def get(self, song_id):
+        """返回歌曲的时间轴，优先读缓存，未缓存时联网获取并写入缓存"""
+        timeline = self.cached(song_id)
+        if timeline is not None:
+            return timeline
+        metrics.hit("lyrics_cache", False)
+        return self.fetch(song_id)
+
+    def fetch(self, song_id):
+        """联网获取歌词；版本号与缓存一致时直接使用缓存中的时间轴"""
+        response = client.track_lyrics(song_id)
+        if response.get('code') != 200:
+            raise RuntimeError(f"获取歌词失败: {response.get('code')}")
+        payload = {field: {'version': response.get(field, {}).get('version', 0),
+                           'lyric': response.get(field, {}).get('lyric', '')}
+                   for field in LYRIC_FIELDS}
+        versions = json.dumps([payload[field]['version'] for field in LYRIC_FIELDS])
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT versions, parser_version, timeline FROM lyrics WHERE song_id = ?",
+                (int(song_id),)).fetchone()
+        if row is not None and row[0] == versions and row[1] == PARSER_VERSION:
+            # 歌词没有变化，只更新获取时间
+            with self._lock, self.conn:
+                self.conn.execute("UPDATE lyrics SET fetched_at = ? WHERE song_id = ?", (time.time(), int(song_id)))
+            return LyricTimeline.from_dict(json.loads(row[2]))
+        timeline = self._parse(payload)
+        self._store(song_id, payload, timeline, time.time())
+        return timeline
+
+    def prefetch(self, song_ids):
+        """在后台获取所有未缓存的歌词，并发数受 workers 限制，返回排队的数量"""
+        song_ids = [int(song_id) for song_id in song_ids]
+        with self._lock:
+            cached = set()
+            # 分批查询，避免超出 SQLite 的参数个数上限
+            for start in range(0, len(song_ids), 500):
+                batch = song_ids[start:start + 500]
+                cached.update(song_id for song_id, in self.conn.execute(
+                    f"SELECT song_id FROM lyrics WHERE song_id IN ({','.join('?' * len(batch))})", batch))
+        queued = 0
+        for song_id in song_ids:
+            if song_id not in cached and self._submit(song_id):
+                queued += 1
+        return queued
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.conn.close()
+
+    def _submit(self, song_id):
+        song_id = int(song_id)
+        with self._lock:
+            if song_id in self._pending:
+                return False
+            self._pending.add(song_id)
+        self.executor.submit(self._background_fetch, song_id)
+        return True
+
+    def _background_fetch(self, song_id):
+        try:
+            self.fetch(song_id)
+        except Exception:
+            # 预取失败不影响播放，真正需要时会再次获取
+            metrics.incr("lyrics_prefetch_errors")
+        finally:
+            with self._lock:
+                self._pending.discard(song_id)
+
+    @staticmethod
+    def _parse(payload):
+        return parse_lyrics(*(payload.get(field, {}).get('lyric', '') for field in LYRIC_FIELDS))
+
+    def _store(self, song_id, payload, timeline, fetched_at):
+        versions = json.dumps([payload.get(field, {}).get('version', 0) for field in LYRIC_FIELDS])
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO lyrics (song_id, versions, payload, parser_version, timeline, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (int(song_id), versions, json.dumps(payload, ensure_ascii=False), PARSER_VERSION,
+                 json.dumps(timeline.to_dict(), ensure_ascii=False), fetched_at))
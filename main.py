@@ -1,14 +1,26 @@
+import argparse
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, messagebox
 from login import LoginWindow
-from search_and_player import SearchAndPlayer
+from metrics import metrics
+from startup import Warmup, profiler
 from utils import center_window
-from play_list import PlayList
+from play_queue import PlayQueue
+from stats_panel import StatsPanel
+from virtual_table import VirtualTable
+
+# 播放器模块（连带 pyncm、requests、Pillow、vlc）在登录后才导入，登录窗口显示后在后台预热
 
 
 class MusicDownloaderApp:
-    def __init__(self, root):
+    def __init__(self, root, profile_startup=False):
+        """
+        :param root: 主 Tkinter 窗口
+        :param profile_startup: 为 True 时在播放器就绪后输出启动耗时报告
+        """
         self.root = root
+        self.profile_startup = profile_startup
+
         self.root.title("网易云音乐播放器")
         # 设置窗口最小尺寸
         self.root.minsize(1026, 731)
@@ -23,28 +35,56 @@ class MusicDownloaderApp:
         # 初始化播放器和其他控件
         self.player_instance = None
         self.playlist_instance = None
-        self.create_widgets()
+        self.stats_panel = None
+        with profiler.phase("widgets"):
+            self.create_widgets()
+
+        # 定期把性能指标写到 cache/metrics.json 和 cache/metrics.prom
+        metrics.start_exporter()
+
+        # 播放引擎在登录窗口显示之后才开始在后台预热
+        self.warmup = Warmup(profiler)
 
         # 打开登录窗口
         self.open_login_window()
 
     def open_login_window(self):
         """打开登录窗口"""
-        LoginWindow(self.root, self.login_success)
+        self.root.after_idle(self.login_window_shown)
+        with profiler.phase("login_window"):
+            LoginWindow(self.root, self.login_success)
+
+    def login_window_shown(self):
+        profiler.checkpoint("login_window_shown")
+        self.warmup.start()
 
     def login_success(self):
         """登录成功后回调函数"""
         self.root.deiconify()  # 显示主窗口
-        self.player_instance = SearchAndPlayer(
-            self.root,
-            self.progress_bar,
-            self.lyrics_text,
-            self.album_cover_label,
-            self.label_current_length,
-            self.label_total_length,
-            self.tree_results
-        )
-        self.playlist_instance = PlayList(self.root, self.tree_results, self.player_instance)
+        with profiler.phase("player"):
+            from play_list import PlayList
+            from search_and_player import SearchAndPlayer
+            self.player_instance = SearchAndPlayer(
+                self.root,
+                self.progress_bar,
+                self.lyrics_text,
+                self.album_cover_label,
+                self.label_current_length,
+                self.label_total_length,
+                self.tree_results,
+                vlc_instance=self.warmup.vlc_instance()
+            )
+            self.playlist_instance = PlayList(self.root, self.tree_results, self.player_instance)
+            # 搜索时同时列出歌单中匹配的歌曲
+            self.player_instance.add_search_source(self.playlist_instance.search_songs)
+        self.root.after_idle(self.startup_finished)
+
+    def startup_finished(self):
+        """主窗口和播放器就绪"""
+        profiler.checkpoint("main_window_ready")
+        if self.profile_startup:
+            profiler.report("cache/startup_profile.json")
+            profiler.disable()
 
     def create_widgets(self):
         """创建主窗口的控件"""
@@ -82,11 +122,10 @@ class MusicDownloaderApp:
         style.configure("Treeview", rowheight=25, font=('Arial', 10))
         style.configure("Treeview.Heading", font=('Arial', 10, 'bold'))
         
-        self.tree_results = ttk.Treeview(frame_results, columns=("song_id", "description"), show="headings")
-        self.tree_results.heading("song_id", text="歌曲ID")
-        self.tree_results.heading("description", text="描述")
-        self.tree_results.column("song_id", width=100)
-        self.tree_results.column("description", width=350)
+        # 搜索结果和播放队列共用一个虚拟化表格，只为可见的行创建控件
+        # 来源列标出本地音乐库和歌单中的匹配，不混进歌曲描述
+        self.tree_results = VirtualTable(frame_results, columns=("song_id", "description", "source"),
+                                         headings=("歌曲ID", "描述", "来源"), widths=(100, 290, 60))
         self.tree_results.pack(fill="both", expand=True)
 
         # 分页按钮
@@ -135,6 +174,28 @@ class MusicDownloaderApp:
         )
         self.btn_add_to_playlist.grid(row=0, column=3, padx=12)
 
+        # 播放队列控制
+        frame_queue = tk.Frame(frame_left, bg='#f0f0f0')
+        frame_queue.pack()
+
+        ttk.Button(frame_queue, text="上一首", command=self.play_previous_song).grid(row=0, column=0, padx=6)
+        ttk.Button(frame_queue, text="下一首", command=self.play_next_song).grid(row=0, column=1, padx=6)
+        ttk.Button(frame_queue, text="下一首播放", command=self.queue_selected_next).grid(row=0, column=2, padx=6)
+        ttk.Button(frame_queue, text="播放队列", command=self.show_queue).grid(row=0, column=3, padx=6)
+        ttk.Button(frame_queue, text="统计", command=self.show_stats).grid(row=0, column=6, padx=6)
+
+        self.shuffle_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            frame_queue, text="随机", variable=self.shuffle_var, bg='#f0f0f0', command=self.set_shuffle
+        ).grid(row=0, column=4, padx=6)
+
+        self.repeat_modes = {"不循环": PlayQueue.REPEAT_OFF, "列表循环": PlayQueue.REPEAT_ALL,
+                             "单曲循环": PlayQueue.REPEAT_ONE}
+        self.repeat_box = ttk.Combobox(frame_queue, values=list(self.repeat_modes), state="readonly", width=8)
+        self.repeat_box.current(0)
+        self.repeat_box.bind("<<ComboboxSelected>>", self.set_repeat)
+        self.repeat_box.grid(row=0, column=5, padx=6)
+
         # 进度条
         self.progress_bar = ttk.Progressbar(frame_left, orient="horizontal", length=400, mode="determinate")
         self.progress_bar.pack(pady=20)
@@ -180,18 +241,51 @@ class MusicDownloaderApp:
         if self.player_instance:
             self.player_instance.toggle_pause()
 
+    def play_previous_song(self):
+        if self.player_instance:
+            self.player_instance.play_previous_song()
+
+    def play_next_song(self):
+        if self.player_instance:
+            self.player_instance.play_next_song()
+
+    def queue_selected_next(self):
+        """把选中的歌曲插到当前歌曲之后播放"""
+        if self.player_instance:
+            self.player_instance.queue_selected_next(self.tree_results)
+
+    def show_queue(self):
+        """在结果列表中显示播放队列"""
+        if self.player_instance:
+            self.player_instance.show_queue()
+
+    def set_shuffle(self):
+        if self.player_instance:
+            self.player_instance.set_shuffle(self.shuffle_var.get())
+
+    def set_repeat(self, event=None):
+        if self.player_instance:
+            self.player_instance.set_repeat(self.repeat_modes[self.repeat_box.get()])
+
     def seek_song(self, event):
         """调整播放进度"""
         if self.player_instance:
             self.player_instance.seek_song(event)
 
+    def show_stats(self):
+        """显示性能统计窗口，已打开时置于前台"""
+        if self.stats_panel and self.stats_panel.window.winfo_exists():
+            self.stats_panel.window.lift()
+            return
+        self.stats_panel = StatsPanel(self.root)
+
     def show_playlist(self):
         """显示歌单窗口"""
         if self.playlist_instance:
             self.playlist_instance.show_playlist_window()
 
     def add_to_playlist(self):
-        """添加当前选中的歌曲到歌单"""
+        """添加当前选中的歌曲（可多选）到歌单"""
         if not self.playlist_instance:
             return
         
@@ -217,12 +311,21 @@ class MusicDownloaderApp:
             selected_playlist = playlist_list.selection()
             if selected_playlist:
                 playlist_name = playlist_list.item(selected_playlist[0])['values'][0]
-                song_item = self.tree_results.item(selected[0])
-                song_info = {
-                    'id': song_item['values'][0],
-                    'name': song_item['values'][1]
-                }
-                if self.playlist_instance.add_to_playlist(playlist_name, song_info):
+                songs = []
+                skipped = 0
+                for index in selected:
+                    song_id, song_name = self.tree_results.row(index)[:2]
+                    if int(song_id) < 0:
+                        # 本地独有的曲目没有网易云 ID，重新扫描后 ID 也会变化
+                        skipped += 1
+                        continue
+                    songs.append({
+                        'id': song_id,
+                        'name': song_name
+                    })
+                if skipped:
+                    messagebox.showinfo("提示", f"{skipped} 首本地独有的歌曲没有网易云 ID，不能加入歌单。")
+                if self.playlist_instance.add_many_to_playlist(playlist_name, songs) or not songs:
                     add_window.destroy()
         
         ttk.Button(
@@ -233,6 +336,14 @@ class MusicDownloaderApp:
 
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = MusicDownloaderApp(root)
+    parser = argparse.ArgumentParser(description="网易云音乐播放器")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="统计启动各阶段和各模块的导入耗时，播放器就绪后输出到标准错误和 cache/startup_profile.json")
+    args = parser.parse_args()
+    profiler.checkpoint("main_imports")
+    if args.profile_startup:
+        profiler.enable()
+    with profiler.phase("tk"):
+        root = tk.Tk()
+    app = MusicDownloaderApp(root, profile_startup=args.profile_startup)
     root.mainloop()
\ No newline at end of file
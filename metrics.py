@@ -0,0 +1,241 @@
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Prometheus 指标名只允许字母、数字和下划线
+_INVALID_NAME = re.compile(r'[^a-zA-Z0-9_]')
+
+
+def percentile(ordered, q):
+    """返回已排序序列的 q 分位数（线性插值），序列为空时返回 0"""
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class Summary:
+    """一个指标的观测值：累计次数和总和，以及最近 window 个样本用于计算分位数"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def snapshot(self, quantiles):
+        ordered = sorted(self.samples)
+        result = {'count': self.count, 'sum': round(self.total, 6), 'max': round(self.max, 6)}
+        for q in quantiles:
+            result[f"p{round(q * 100):g}"] = round(percentile(ordered, q), 6)
+        return result
+
+
+class Metrics:
+    """
+    进程内的性能指标（线程安全）。
+
+    - 计数器：调用次数、缓存命中/未命中、字节数等；
+    - 摘要：用单调时钟记录的耗时等观测值，保留滑动窗口内的样本计算 p50/p90/p99；
+    - 采集器：其他模块已有的统计（如接口客户端、连接池），导出时一并读取。
+
+    可以定期把快照原子地写成 JSON 和 Prometheus 文本格式文件，供外部采集。
+    """
+
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, window=1024, prefix="pyncm"):
+        """
+        :param window: 每个摘要保留的最近样本数
+        :param prefix: 导出 Prometheus 指标时的名称前缀
+        """
+        self.window = window
+        self.prefix = prefix
+        self.started_at = time.time()
+        self._counters = {}
+        self._summaries = {}
+        self._collectors = {}
+        self._marks = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+        self._stop = threading.Event()
+
+    def incr(self, name, value=1):
+        """计数器加 value"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def hit(self, name, hit):
+        """记录一次缓存访问，分别计入 name_hits 或 name_misses"""
+        self.incr(f"{name}_hits" if hit else f"{name}_misses")
+
+    def observe(self, name, value):
+        """向摘要 name 中加入一个观测值"""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = Summary(self.window)
+            summary.observe(value)
+
+    @contextmanager
+    def span(self, name):
+        """记录 with 代码块的耗时（秒），异常退出时同样记录"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started)
+
+    def timed(self, name):
+        """装饰器：记录每次调用的耗时（秒）"""
+        def decorator(function):
+            @wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def mark(self, key, at=None):
+        """记录一个跨线程或跨回调区间的起点，同一个 key 的旧起点会被覆盖"""
+        with self._lock:
+            self._marks[key] = time.monotonic() if at is None else at
+
+    def finish(self, key, name, at=None):
+        """结束 key 对应的区间并把耗时计入摘要 name，返回耗时；没有起点时返回 None"""
+        with self._lock:
+            started = self._marks.pop(key, None)
+        if started is None:
+            return None
+        elapsed = (time.monotonic() if at is None else at) - started
+        self.observe(name, elapsed)
+        return elapsed
+
+    def add_collector(self, name, function, label):
+        """
+        注册外部统计。
+
+        :param name: 统计名称，导出时作为指标名的一部分
+        :param function: 返回 {标签值: {字段: 数值}} 的函数，例如 client.stats
+        :param label: Prometheus 导出时标签值使用的标签名
+        """
+        with self._lock:
+            self._collectors[name] = (function, label)
+
+    def snapshot(self):
+        """返回当前全部指标的字典"""
+        with self._lock:
+            counters = dict(self._counters)
+            summaries = {name: summary.snapshot(self.QUANTILES) for name, summary in self._summaries.items()}
+            collectors = dict(self._collectors)
+        collected = {}
+        for name, (function, label) in collectors.items():
+            try:
+                collected[name] = function()
+            except Exception:
+                collected[name] = {}
+                self.incr(f"{name}_collect_errors")
+        return {
+            'timestamp': round(time.time(), 3),
+            'uptime': round(time.time() - self.started_at, 3),
+            'counters': dict(sorted(counters.items())),
+            'summaries': dict(sorted(summaries.items())),
+            'collectors': collected,
+        }
+
+    def to_prometheus(self, snapshot=None):
+        """把快照转换为 Prometheus 文本格式"""
+        snapshot = snapshot or self.snapshot()
+        lines = []
+        for name, value in snapshot['counters'].items():
+            metric = self._metric_name(name) + "_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+        for name, summary in snapshot['summaries'].items():
+            metric = self._metric_name(name)
+            lines.append(f"# TYPE {metric} summary")
+            for q in self.QUANTILES:
+                lines.append(f'{metric}{{quantile="{q:g}"}} {summary[f"p{round(q * 100):g}"]}')
+            lines.append(f"{metric}_sum {summary['sum']}")
+            lines.append(f"{metric}_count {summary['count']}")
+        with self._lock:
+            labels = {name: label for name, (_, label) in self._collectors.items()}
+        for name, groups in snapshot['collectors'].items():
+            fields = {}
+            for group, values in groups.items():
+                for field, value in values.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        fields.setdefault(field, []).append((group, value))
+            for field, samples in sorted(fields.items()):
+                metric = self._metric_name(f"{name}_{field}")
+                lines.append(f"# TYPE {metric} gauge")
+                for group, value in samples:
+                    group = str(group).replace("\\", "\\\\").replace('"', '\\"')
+                    lines.append(f'{metric}{{{labels.get(name, "name")}="{group}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def export(self, json_path=None, prom_path=None):
+        """把当前快照写入 JSON 和/或 Prometheus 文本文件，先写临时文件再原子替换"""
+        snapshot = self.snapshot()
+        if json_path:
+            self._write(json_path, json.dumps(snapshot, ensure_ascii=False, indent=4))
+        if prom_path:
+            self._write(prom_path, self.to_prometheus(snapshot))
+        return snapshot
+
+    def start_exporter(self, directory="cache", interval=15.0):
+        """
+        在后台线程中每隔 interval 秒导出一次指标，进程退出时再导出最后一次。
+
+        文件为 directory 下的 metrics.json 和 metrics.prom，每次导出覆盖上一次的内容。
+        """
+        if self._exporter is not None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, "metrics.json")
+        prom_path = os.path.join(directory, "metrics.prom")
+
+        def export():
+            try:
+                self.export(json_path, prom_path)
+            except Exception:
+                self.incr("metrics_export_errors")
+
+        def run():
+            while not self._stop.wait(interval):
+                export()
+
+        self._exporter = threading.Thread(target=run, name="metrics-exporter", daemon=True)
+        self._exporter.start()
+        atexit.register(export)
+
+    def stop_exporter(self):
+        self._stop.set()
+
+    def _metric_name(self, name):
+        return _INVALID_NAME.sub("_", f"{self.prefix}_{name}")
+
+    @staticmethod
+    def _write(path, text):
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+
+# 全进程共享的指标，各模块直接导入使用
+metrics = Metrics()
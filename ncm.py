@@ -1,6 +1,9 @@
-import requests
-from pyncm.apis import track, cloudsearch
 from pyncm.apis.login import LoginViaCellphone
+from api_client import client
+from download_index import IndexedDownloader
+from metrics import metrics
+from url_resolver import resolver
+from utils import sanitize_filename
 
 
 def login():
@@ -29,7 +32,7 @@ def get_search_result(keyword: str, page: int = 1, limit: int = 10, search_type:
     """通过关键词搜索结果"""
     try:
         offset = get_offset_by_page_num(page, limit)
-        result = cloudsearch.GetSearchResult(keyword, limit=limit, offset=offset, stype=search_type)
+        result = client.search(keyword, limit=limit, offset=offset, stype=search_type)
         if result.get('code') != 200:
             raise RuntimeError(f"搜索失败，错误信息: {result}")
         return result
@@ -73,9 +76,9 @@ def get_song_choices(song_name: str):
 def get_audio_url(song_id: int):
     """通过歌曲 ID 获取音频 URL"""
     try:
-        audio_info = track.GetTrackAudio(song_id)
-        if 'data' in audio_info and audio_info['data']:
-            return audio_info['data'][0].get('url')
+        audio_url = resolver.resolve(song_id)
+        if audio_url:
+            return audio_url
         else:
             print(f"未能获取音频 URL: {song_id}")
             return None
@@ -84,15 +87,16 @@ def get_audio_url(song_id: int):
         return None
 
 
-def download_audio(url: str, filename: str):
-    """下载音频文件"""
+def download_audio(song_id: int, filename: str):
+    """下载音频文件（分段并行，支持断点续传，校验 md5），本地已有相同内容时不再下载"""
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        with open(filename, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=1024):
-                file.write(chunk)
-        print(f"音频已保存为: {filename}")
+        status, _ = IndexedDownloader().download(song_id, filename)
+        if status == "exists":
+            print(f"文件已存在，跳过下载: {filename}")
+        elif status == "linked":
+            print(f"已从本地已有文件链接: {filename}")
+        else:
+            print(f"音频已保存为: {filename}")
     except Exception as e:
         print(f"下载音频时发生错误: {e}")
 
@@ -114,12 +118,8 @@ def download_song_by_name(song_name: str):
         if 0 <= choice < len(choices):
             song_id, song_description = choices[choice]
             print(f"已选择: {song_description}")
-            audio_url = get_audio_url(song_id)
-            if audio_url:
-                safe_filename = sanitize_filename(f"{song_description}.mp3")
-                download_audio(audio_url, safe_filename)
-            else:
-                print("音频 URL 获取失败。")
+            safe_filename = sanitize_filename(f"{song_description}.mp3")
+            download_audio(song_id, safe_filename)
         else:
             print("无效选择。")
     except ValueError:
@@ -128,18 +128,107 @@ def download_song_by_name(song_name: str):
         print(f"处理选择时发生错误: {e}")
 
 
-def sanitize_filename(filename: str) -> str:
-    """移除文件名中的非法字符"""
-    import re
-    return re.sub(r'[<>:"/\\|?*]', '', filename)
+def read_song_ids(path: str) -> list:
+    """从文件读取歌曲 ID，每行一个，忽略空行和 # 注释"""
+    song_ids = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                song_ids.append(int(line))
+    return song_ids
+
+
+def bulk_download(song_ids: list, output_dir: str = "downloads", workers: int = 8,
+                  per_host: int = 4, summary_path: str = "download_summary.json") -> dict:
+    """批量下载多首歌曲"""
+    from bulk_download import BulkDownloader
+
+    downloader = BulkDownloader(output_dir=output_dir, max_workers=workers, per_host_limit=per_host)
+    # 批量解析音频 URL，数百首歌只需少量接口调用
+    resolver.prefetch(song_ids)
+    return downloader.download(song_ids, summary_path=summary_path)
+
+
+def resolve_keywords(input_path: str = "-", output_path: str = "-", ids_path: str = None,
+                     workers: int = 4, rate: float = 5.0, min_score: float = 0.6) -> dict:
+    """批量把 "歌名 - 歌手" 解析为歌曲 ID，结果以 JSON Lines 输出，"-" 表示标准输入/输出"""
+    import sys
+    from batch_resolver import BatchResolver
+
+    batch = BatchResolver(workers=workers, rate=rate, min_score=min_score)
+    source = sys.stdin if input_path == "-" else open(input_path, 'r', encoding='utf-8')
+    output = sys.stdout if output_path == "-" else open(output_path, 'w', encoding='utf-8')
+    ids_output = open(ids_path, 'w', encoding='utf-8') if ids_path else None
+    try:
+        return batch.run(source, output, ids_output)
+    finally:
+        for f in (source, output, ids_output):
+            if f not in (None, sys.stdin, sys.stdout):
+                f.close()
+
+
+def print_api_stats():
+    """输出各接口的调用次数、延迟、限流和错误统计"""
+    for endpoint, stats in sorted(client.stats().items()):
+        print(f"{endpoint}: 请求 {stats['calls']} 次 (合并 {stats['coalesced']}, 重试 {stats['retries']}), "
+              f"限流 {stats['throttled']}, 错误 {stats['errors']}, "
+              f"平均 {stats['avg_latency'] * 1000:.0f} ms, 最长 {stats['max_latency'] * 1000:.0f} ms")
+
+
+def parse_args():
+    """解析命令行参数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="网易云音乐下载工具")
+    parser.add_argument("--metrics", metavar="DIR", help="定期把性能指标导出到该目录（metrics.json、metrics.prom）")
+    subparsers = parser.add_subparsers(dest="command")
+
+    bulk = subparsers.add_parser("bulk", help="按歌曲 ID 批量下载")
+    bulk.add_argument("ids", nargs="*", type=int, help="歌曲 ID")
+    bulk.add_argument("-f", "--file", help="歌曲 ID 列表文件，每行一个")
+    bulk.add_argument("-o", "--output", default="downloads", help="下载目录")
+    bulk.add_argument("-w", "--workers", type=int, default=8, help="并发下载数")
+    bulk.add_argument("--per-host", type=int, default=4, help="每个主机的并发下载数上限")
+    bulk.add_argument("--summary", default="download_summary.json", help="下载摘要 JSON 路径")
+
+    resolve = subparsers.add_parser("resolve", help="把 \"歌名 - 歌手\" 列表批量解析为歌曲 ID")
+    resolve.add_argument("-f", "--file", default="-", help="输入文件，每行一首，默认读取标准输入")
+    resolve.add_argument("-o", "--output", default="-", help="JSON Lines 结果文件，默认输出到标准输出")
+    resolve.add_argument("--ids", help="把匹配成功的歌曲 ID 逐行写入此文件，可用于 bulk -f")
+    resolve.add_argument("-w", "--workers", type=int, default=4, help="并发搜索数")
+    resolve.add_argument("--rate", type=float, default=5.0, help="每秒最多发出的搜索请求数")
+    resolve.add_argument("--min-score", type=float, default=0.6, help="低于该得分的结果标记为低置信度")
+    return parser.parse_args()
 
 
 def main():
     """主函数"""
+    args = parse_args()
+    if args.metrics:
+        metrics.start_exporter(args.metrics)
     if not login():
         print("登录失败，程序退出。")
         return
 
+    if args.command == "bulk":
+        song_ids = list(args.ids)
+        if args.file:
+            song_ids.extend(read_song_ids(args.file))
+        if not song_ids:
+            print("没有需要下载的歌曲 ID。")
+            return
+        bulk_download(song_ids, output_dir=args.output, workers=args.workers,
+                      per_host=args.per_host, summary_path=args.summary)
+        print_api_stats()
+        return
+
+    if args.command == "resolve":
+        resolve_keywords(args.file, args.output, args.ids, workers=args.workers,
+                         rate=args.rate, min_score=args.min_score)
+        print_api_stats()
+        return
+
     while True:
         print("\n菜单：\n1. 点歌\n0. 退出")
         try:
@@ -1,9 +1,9 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from pyncm.apis import track, cloudsearch
 from pyncm.apis.login import LoginViaCellphone
-import requests
 import re
+from api_client import client
+from download_index import IndexedDownloader
 
 
 class MusicDownloaderApp:
@@ -14,6 +14,8 @@ class MusicDownloaderApp:
 
         # 登录状态
         self.is_logged_in = False
+        # 下载索引：已下载过的歌曲不再重复下载
+        self.downloader = IndexedDownloader()
 
         # 创建 UI
         self.create_widgets()
@@ -111,7 +113,7 @@ class MusicDownloaderApp:
     def get_search_result(self, keyword, page=1, limit=10, search_type=1):
         try:
             offset = (page - 1) * limit
-            result = cloudsearch.GetSearchResult(keyword, limit=limit, offset=offset, stype=search_type)
+            result = client.search(keyword, limit=limit, offset=offset, stype=search_type)
             if result.get('code') != 200:
                 raise RuntimeError(f"搜索失败，错误信息: {result}")
             return result
@@ -126,34 +128,19 @@ class MusicDownloaderApp:
             return
 
         song_id, description = self.tree_results.item(selected_item[0], "values")
-        audio_url = self.get_audio_url(int(song_id))
-        if audio_url:
-            safe_filename = self.sanitize_filename(f"{description}.mp3")
-            self.download_audio(audio_url, safe_filename)
-        else:
-            messagebox.showerror("错误", "未能获取音频 URL。")
-
-    def get_audio_url(self, song_id):
-        try:
-            audio_info = track.GetTrackAudio(song_id)
-            if 'data' in audio_info and audio_info['data']:
-                return audio_info['data'][0].get('url')
-            return None
-        except Exception as e:
-            messagebox.showerror("错误", f"获取音频 URL 时发生错误: {e}")
-            return None
+        safe_filename = self.sanitize_filename(f"{description}.mp3")
+        self.download_audio(int(song_id), safe_filename)
 
     def sanitize_filename(self, filename):
         return re.sub(r'[<>:"/\\|?*]', '', filename)
 
-    def download_audio(self, url, filename):
+    def download_audio(self, song_id, filename):
         try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            with open(filename, 'wb') as file:
-                for chunk in response.iter_content(chunk_size=1024):
-                    file.write(chunk)
-            messagebox.showinfo("成功", f"音频已保存为: {filename}")
+            status, _ = self.downloader.download(song_id, filename)
+            if status == "exists":
+                messagebox.showinfo("成功", f"文件已存在: {filename}")
+            else:
+                messagebox.showinfo("成功", f"音频已保存为: {filename}")
         except Exception as e:
             messagebox.showerror("错误", f"下载音频时发生错误: {e}")
 
@@ -1,13 +1,15 @@
 import tkinter as tk
-from tkinter import ttk
-import json
+from tkinter import ttk, filedialog, messagebox
 import os
+from playlist_store import PlaylistCollection, PlaylistStore
+from virtual_table import VirtualTable
 
 class PlayList:
     def __init__(self, root, tree_results, player_instance):
         self.root = root
         self.tree_results = tree_results
         self.player_instance = player_instance
+        self.store = None
         self.playlists = {}
         self.current_playlist = None
         
@@ -18,50 +20,66 @@ class PlayList:
         self.load_playlists()
         
     def load_playlists(self):
-        """加载所有歌单"""
-        try:
-            with open('playlists/playlists.json', 'r', encoding='utf-8') as f:
-                self.playlists = json.load(f)
-        except FileNotFoundError:
-            self.save_playlists()
-            
-    def save_playlists(self):
-        """保存歌单"""
-        with open('playlists/playlists.json', 'w', encoding='utf-8') as f:
-            json.dump(self.playlists, f, ensure_ascii=False, indent=4)
-            
+        """打开歌单数据库，歌单内容在首次查看时才加载"""
+        self.store = PlaylistStore('playlists/playlists.db', legacy_json='playlists/playlists.json')
+        self.playlists = PlaylistCollection(self.store)
+
+    def import_playlists(self, path):
+        """从 JSON 文件导入歌单"""
+        self.store.import_json(path)
+        self.playlists.reload()
+
+    def export_playlists(self, path='playlists/playlists.json'):
+        """把歌单导出为 JSON 文件"""
+        self.store.export_json(path)
+
     def create_playlist(self, name):
         """创建新歌单"""
-        if name not in self.playlists:
-            self.playlists[name] = []
-            self.save_playlists()
-            return True
-        return False
-        
+        return self.playlists.create(name)
+
     def add_to_playlist(self, playlist_name, song_info):
-        """添加歌曲到歌单"""
-        if playlist_name in self.playlists:
-            # 检查歌曲是否已经在歌单中
-            if not any(song['id'] == song_info['id'] for song in self.playlists[playlist_name]):
-                self.playlists[playlist_name].append(song_info)
-                self.save_playlists()
-                return True
+        """添加歌曲到歌单，本地独有的曲目（负数 ID）不能加入"""
+        if playlist_name in self.playlists and int(song_info['id']) > 0:
+            added = self.playlists.add_song(playlist_name, song_info)
+            if added:
+                self.prefetch_lyrics([song_info['id']])
+            return added
         return False
-        
+
+    def add_many_to_playlist(self, playlist_name, songs):
+        """批量添加歌曲到歌单，只写入一次，返回新增数量；本地独有的曲目（负数 ID）会被跳过"""
+        songs = [song for song in songs if int(song['id']) > 0]
+        if playlist_name in self.playlists:
+            added = self.playlists.add_songs(playlist_name, songs)
+            if added:
+                self.prefetch_lyrics([song['id'] for song in songs])
+            return added
+        return 0
+
+    def prefetch_lyrics(self, song_ids):
+        """在后台把歌词缓存到本地，离线时歌单中的歌曲也能显示歌词"""
+        song_ids = [song_id for song_id in song_ids if int(song_id) > 0]
+        if self.player_instance and song_ids:
+            self.player_instance.lyrics_cache.prefetch(song_ids)
+
     def remove_from_playlist(self, playlist_name, song_id):
         """从歌单中移除歌曲"""
         if playlist_name in self.playlists:
-            self.playlists[playlist_name] = [
-                song for song in self.playlists[playlist_name] 
-                if song['id'] != song_id
-            ]
-            self.save_playlists()
-            
+            self.playlists.remove_song(playlist_name, song_id)
+
+    def remove_many_from_playlist(self, playlist_name, song_ids):
+        """批量从歌单中移除歌曲，只写入一次，返回移除数量"""
+        if playlist_name in self.playlists:
+            return self.playlists.remove_songs(playlist_name, song_ids)
+        return 0
+
+    def search_songs(self, query, limit=20):
+        """在所有歌单中搜索歌曲，返回 (歌曲 ID, 描述, 来源) 列表，供合并搜索使用"""
+        return [(song['id'], song['name'], "歌单") for song in self.store.search(query, limit)]
+
     def delete_playlist(self, name):
         """删除歌单"""
-        if name in self.playlists:
-            del self.playlists[name]
-            self.save_playlists()
+        self.playlists.delete(name)
             
     def show_playlist_window(self):
         """显示歌单窗口"""
@@ -80,6 +98,12 @@ class PlayList:
             text="创建歌单",
             command=lambda: self.handle_create_playlist(name_var.get())
         ).pack(side="left", padx=5, pady=5)
+
+        # 导入/导出 JSON
+        io_frame = ttk.LabelFrame(playlist_window, text="导入/导出")
+        io_frame.pack(fill="x", padx=5, pady=5)
+        ttk.Button(io_frame, text="导入 JSON", command=self.handle_import_playlists).pack(side="left", padx=5, pady=5)
+        ttk.Button(io_frame, text="导出 JSON", command=self.handle_export_playlists).pack(side="left", padx=5, pady=5)
         
         # 歌单列表
         list_frame = ttk.LabelFrame(playlist_window, text="我的歌单")
@@ -123,6 +147,26 @@ class PlayList:
             if self.create_playlist(name):
                 self.update_playlist_tree()
                 
+    def handle_import_playlists(self):
+        """处理导入歌单"""
+        path = filedialog.askopenfilename(filetypes=[("JSON", "*.json")])
+        if path:
+            try:
+                self.import_playlists(path)
+                self.update_playlist_tree()
+            except (OSError, ValueError) as e:
+                messagebox.showerror("错误", f"导入歌单失败: {e}")
+
+    def handle_export_playlists(self):
+        """处理导出歌单"""
+        path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if path:
+            try:
+                self.export_playlists(path)
+                messagebox.showinfo("成功", f"歌单已导出为: {path}")
+            except OSError as e:
+                messagebox.showerror("错误", f"导出歌单失败: {e}")
+
     def handle_delete_playlist(self):
         """处理删除歌单"""
         selected = self.playlist_tree.selection()
@@ -166,68 +210,34 @@ class PlayList:
         ttk.Button(
             button_frame,
             text="下一首",
-            command=lambda: self.play_next_song(songs_tree)
+            command=self.play_next_song
         ).pack(side=tk.LEFT, padx=5)
         
-        # 创建树形视图显示歌曲
-        songs_tree = ttk.Treeview(view_window, columns=("id", "name"), show="headings")
-        songs_tree.heading("id", text="歌曲ID")
-        songs_tree.heading("name", text="歌曲名称")
+        # 创建虚拟化表格显示歌曲，只为可见的行创建控件
+        songs_tree = VirtualTable(view_window, columns=("id", "name"), headings=("歌曲ID", "歌曲名称"))
         songs_tree.pack(fill="both", expand=True)
         
-        # 添加歌曲到树形视图
-        for song in self.playlists[playlist_name]:
-            songs_tree.insert("", "end", values=(song['id'], song['name']))
+        # 添加歌曲到表格，大歌单分批追加
+        songs_tree.load((song['id'], song['name']) for song in self.playlists[playlist_name])
+        self.prefetch_lyrics(self.playlists[playlist_name].ids())
             
     def play_song_from_playlist(self, songs_tree):
         """从歌单播放选中的歌曲"""
-        selected = songs_tree.selection()
-        if selected and self.player_instance:
-            song_id = songs_tree.item(selected[0])['values'][0]
-            # 更新搜索结果树形视图
-            self.tree_results.delete(*self.tree_results.get_children())
-            song_name = songs_tree.item(selected[0])['values'][1]
-            self.tree_results.insert("", "end", values=(song_id, song_name))
-            # 选中新插入的项目
-            new_item = self.tree_results.get_children()[0]
-            self.tree_results.selection_set(new_item)
-            # 使用现有的播放方法
-            self.player_instance.play_selected_song(self.tree_results)
+        selected_row = songs_tree.selected_row()
+        if selected_row is not None and self.player_instance:
+            # 插到播放队列当前位置之后立即播放，不打断正在播放的歌单
+            song_id, song_name = selected_row
+            self.player_instance.play_now(song_id, song_name)
             
     def play_all_songs(self, songs_tree, playlist_name):
         """播放歌单中的所有歌曲"""
         if not self.playlists[playlist_name]:
             return
         
-        # 清空搜索结果树形视图
-        self.tree_results.delete(*self.tree_results.get_children())
-        
-        # 添加歌单中的所有歌曲到搜索结果
-        for song in self.playlists[playlist_name]:
-            self.tree_results.insert("", "end", values=(song['id'], song['name']))
-        
-        # 选中第一首歌并开始播放
-        first_item = self.tree_results.get_children()[0]
-        self.tree_results.selection_set(first_item)
-        self.player_instance.play_selected_song(self.tree_results)
-        
-        # 设置播放完当前歌曲后自动播放下一首
-        self.player_instance.set_playlist_mode(True)
-        
-    def play_next_song(self, songs_tree):
-        """播放下一首歌曲"""
-        current_selection = songs_tree.selection()
-        if not current_selection:
-            return
+        # 用整个歌单替换播放队列并从第一首开始播放，播放完当前歌曲后自动播放下一首
+        self.player_instance.play_queue((song['id'], song['name']) for song in self.playlists[playlist_name])
         
-        current_item = current_selection[0]
-        all_items = songs_tree.get_children()
-        current_index = all_items.index(current_item)
-        
-        # 检查是否有下一首
-        if current_index + 1 < len(all_items):
-            next_item = all_items[current_index + 1]
-            songs_tree.selection_set(next_item)
-            self.play_song_from_playlist(songs_tree)
-        else:
-            tk.messagebox.showinfo("提示", "已经是最后一首歌了")
+    def play_next_song(self):
+        """播放队列中的下一首歌曲"""
+        if self.player_instance:
+            self.player_instance.play_next_song()
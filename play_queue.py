@@ -0,0 +1,160 @@
+import random
+from array import array
+
+
+class PlayQueue:
+    """
+    与界面无关的播放队列。
+
+    歌曲 ID 存放在紧凑的 array 中，描述文本按 ID 存放在字典里；
+    当前位置用游标表示，上一首/下一首都是 O(1)。
+    随机播放采用惰性 Fisher-Yates：只在需要下一首时从未播放的部分随机挑一首换到前面，
+    开启随机或插入歌曲都不会重新打乱整个队列。
+    """
+
+    REPEAT_OFF = "off"
+    REPEAT_ALL = "all"
+    REPEAT_ONE = "one"
+
+    def __init__(self, songs=()):
+        """
+        :param songs: (song_id, description) 序列
+        """
+        self.ids = array('q')
+        self.info = {}
+        self.shuffle = False
+        self.repeat = self.REPEAT_OFF
+        self._order = None  # 随机播放时的播放顺序（ids 的下标）
+        self._cursor = -1  # 当前歌曲在播放顺序中的位置
+        self._decided = -1  # 随机播放时，播放顺序中此位置及之前的歌曲已确定
+        self.load(songs)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self, songs):
+        """替换整个队列，游标回到开头之前"""
+        self.ids = array('q')
+        self.info = {}
+        for song_id, description in songs:
+            self.ids.append(int(song_id))
+            self.info[int(song_id)] = description
+        self._order = array('l', range(len(self.ids))) if self.shuffle else None
+        self._cursor = -1
+        self._decided = -1
+
+    def clear(self):
+        self.load(())
+
+    def song(self, index):
+        """返回队列第 index 首的 (song_id, description)"""
+        song_id = self.ids[index]
+        return song_id, self.info.get(song_id, "")
+
+    def current_index(self):
+        """当前歌曲在队列中的下标，尚未开始时返回 None"""
+        if self._cursor < 0:
+            return None
+        return self._order[self._cursor] if self._order is not None else self._cursor
+
+    def current(self):
+        """返回 (下标, song_id, description)，尚未开始时返回 None"""
+        index = self.current_index()
+        if index is None:
+            return None
+        return (index,) + self.song(index)
+
+    def jump(self, index):
+        """从队列第 index 首开始播放"""
+        if self._order is not None:
+            # 从这首开始新一轮随机播放
+            self._order = array('l', range(len(self.ids)))
+            self._order[0], self._order[index] = index, 0
+            self._cursor = 0
+            self._decided = 0
+        else:
+            self._cursor = index
+        return self.current()
+
+    def peek_next(self, manual=False):
+        """
+        返回下一首的 (下标, song_id, description)，不移动游标；没有下一首时返回 None。
+
+        :param manual: 用户手动切歌时为 True，此时单曲循环也会切到下一首
+        """
+        position = self._next_position(manual)
+        if position is None:
+            return None
+        index = self._order[position] if self._order is not None else position
+        return (index,) + self.song(index)
+
+    def advance(self, manual=False):
+        """移到下一首并返回它，没有下一首时返回 None"""
+        position = self._next_position(manual)
+        if position is None:
+            return None
+        self._cursor = position
+        return self.current()
+
+    def previous(self):
+        """回到上一首；随机播放时按已播放的顺序回退"""
+        if self._cursor > 0:
+            self._cursor -= 1
+        elif self._order is None and self.repeat == self.REPEAT_ALL and self.ids:
+            self._cursor = len(self.ids) - 1
+        return self.current()
+
+    def play_next(self, song_id, description):
+        """把歌曲插入到当前歌曲之后"""
+        song_id = int(song_id)
+        self.info[song_id] = description
+        if self._order is not None:
+            # 追加到末尾，只在播放顺序里插到游标之后，已有下标都不用调整
+            self.ids.append(song_id)
+            self._order.insert(self._cursor + 1, len(self.ids) - 1)
+            # 插入的歌曲已确定为下一首，不再参与随机抽取
+            self._decided = max(self._decided + 1, self._cursor + 1)
+        else:
+            self.ids.insert(self._cursor + 1, song_id)
+
+    def set_shuffle(self, enabled):
+        """开启或关闭随机播放，当前歌曲保持不变"""
+        if enabled == self.shuffle:
+            return
+        self.shuffle = enabled
+        index = self.current_index()
+        if enabled:
+            self._order = array('l', range(len(self.ids)))
+            if index is not None:
+                self._order[0], self._order[index] = index, 0
+                self._cursor = 0
+            self._decided = self._cursor
+        else:
+            self._order = None
+            self._cursor = -1 if index is None else index
+
+    def set_repeat(self, mode):
+        """设置循环模式：REPEAT_OFF、REPEAT_ALL 或 REPEAT_ONE"""
+        if mode not in (self.REPEAT_OFF, self.REPEAT_ALL, self.REPEAT_ONE):
+            raise ValueError(f"未知的循环模式: {mode}")
+        self.repeat = mode
+
+    def _next_position(self, manual):
+        """计算下一首在播放顺序中的位置；随机播放时在此刻才抽取下一首"""
+        total = len(self.ids)
+        if not total:
+            return None
+        if self.repeat == self.REPEAT_ONE and not manual and self._cursor >= 0:
+            return self._cursor
+        position = self._cursor + 1
+        if position >= total:
+            if self.repeat == self.REPEAT_OFF:
+                return None
+            position = 0  # 整个队列循环，随机播放时开始新的一轮
+            if self._decided >= self._cursor:
+                self._decided = -1
+        if self._order is not None and position > self._decided:
+            swap = random.randint(position, total - 1)
+            self._order[position], self._order[swap] = self._order[swap], self._order[position]
+            self._decided = position
+        return position
@@ -0,0 +1,153 @@
+import queue
+import time
+
+import vlc
+
+
+class PlaybackClock:
+    """
+    基于 libVLC 事件的播放时钟。
+
+    VLC 在自己的线程中触发事件，这里只把事件放进线程安全的队列；
+    Tk 主循环上唯一的 ``root.after`` 定时器负责取出事件并通知订阅者，
+    因此所有界面更新都发生在主线程，整个进程也只有这一个计时器。
+    两次 TimeChanged 事件之间按单调时钟推算播放位置，使歌词高亮更平滑。
+    """
+
+    EVENTS = {
+        "time": vlc.EventType.MediaPlayerTimeChanged,
+        "length": vlc.EventType.MediaPlayerLengthChanged,
+        "playing": vlc.EventType.MediaPlayerPlaying,
+        "paused": vlc.EventType.MediaPlayerPaused,
+        "stopped": vlc.EventType.MediaPlayerStopped,
+        "end": vlc.EventType.MediaPlayerEndReached,
+        "media": vlc.EventType.MediaPlayerMediaChanged,
+    }
+
+    def __init__(self, root, player, interval=100):
+        """
+        :param root: Tk 根窗口
+        :param player: vlc.MediaPlayer 实例
+        :param interval: 主线程定时器间隔（毫秒）
+        """
+        self.root = root
+        self.player = player
+        self.interval = interval
+        self.length = 0
+        self.playing = False
+        self._events = queue.SimpleQueue()
+        self._listeners = {"time": [], "length": [], "end": [], "media": [], "playing": []}
+        self._generation = 0
+        self._base_time = None  # (播放位置毫秒, 收到事件时的单调时钟)
+        self._timer = None
+
+        manager = player.event_manager()
+        for kind, event_type in self.EVENTS.items():
+            manager.event_attach(event_type, self._on_vlc_event, kind)
+
+    def subscribe(self, kind, callback):
+        """
+        订阅时钟事件，回调均在主线程执行。
+
+        :param kind: "time"（参数为当前秒数）、"length"（参数为总时长秒数）、
+                     "end"（歌曲结束，无参数）、"media"（播放器切换到新媒体，无参数）
+                     或 "playing"（开始或恢复播放，参数为 VLC 触发事件时的单调时钟）
+        """
+        self._listeners[kind].append(callback)
+
+    def start(self):
+        if self._timer is None:
+            self._timer = self.root.after(self.interval, self._tick)
+
+    def stop(self):
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._timer = None
+
+    def reset(self):
+        """切换媒体前调用，丢弃上一首歌尚未处理的事件"""
+        self._generation += 1
+        self._base_time = None
+        self.length = 0
+        self.playing = False
+
+    def position(self):
+        """当前播放位置（秒），未开始播放时返回 None"""
+        if self._base_time is None:
+            return None
+        time_ms, received_at = self._base_time
+        if self.playing:
+            time_ms += (time.monotonic() - received_at) * 1000
+        if self.length > 0:
+            time_ms = min(time_ms, self.length)
+        return time_ms / 1000
+
+    def _on_vlc_event(self, event, kind):
+        """（VLC 线程）只记录事件，不做任何界面或 libVLC 调用"""
+        if kind == "time":
+            value = event.u.new_time
+        elif kind == "length":
+            value = event.u.new_length
+        else:
+            value = None
+        self._events.put((self._generation, kind, value, time.monotonic()))
+
+    def _tick(self):
+        """（主线程）处理积压的事件并通知订阅者"""
+        # "end" 和 "media" 按到达顺序分发：无缝切歌时 EndReached 与 MediaChanged 常在同一次 tick 中到达，
+        # 必须先让旧歌曲的结束回调看到已排队的下一首，再切换到新媒体
+        transitions = []
+        length_changed = False
+        time_changed = False
+        started_at = None
+        while True:
+            try:
+                generation, kind, value, received_at = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self._generation:
+                continue
+            if kind == "time":
+                self._base_time = (value, received_at)
+                time_changed = True
+            elif kind == "length":
+                self.length = value
+                length_changed = True
+            elif kind == "playing":
+                self.playing = True
+                started_at = received_at
+                if self._base_time is not None:
+                    self._base_time = (self._base_time[0], received_at)
+            elif kind in ("paused", "stopped"):
+                if self._base_time is not None and self.playing:
+                    time_ms, base_at = self._base_time
+                    self._base_time = (time_ms + (received_at - base_at) * 1000, received_at)
+                self.playing = False
+            elif kind == "end":
+                self.playing = False
+                transitions.append(kind)
+            elif kind == "media":
+                # 播放列表自动切到下一首，之后的时间事件属于新媒体
+                self._base_time = None
+                self.length = 0
+                transitions.append(kind)
+
+        # 最后一次切换媒体及之前的事件先分发，之后的结束事件（属于新媒体）留到时间更新之后
+        split = len(transitions) - transitions[::-1].index("media") if "media" in transitions else 0
+        for kind in transitions[:split]:
+            for callback in self._listeners[kind]:
+                callback()
+        if started_at is not None:
+            for callback in self._listeners["playing"]:
+                callback(started_at)
+        if length_changed and self.length > 0:
+            for callback in self._listeners["length"]:
+                callback(self.length / 1000)
+        current_time = self.position()
+        if current_time is not None and self.length > 0 and (self.playing or time_changed):
+            for callback in self._listeners["time"]:
+                callback(current_time)
+        for kind in transitions[split:]:
+            for callback in self._listeners[kind]:
+                callback()
+        self._timer = self.root.after(self.interval, self._tick)
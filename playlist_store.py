@@ -0,0 +1,287 @@
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from local_search import rank
+from metrics import metrics
+
+
+class PlaylistStore:
+    """
+    基于 SQLite（WAL 模式）的歌单存储。
+
+    每次增删只写入对应的一行，不再整体重写 JSON 文件；
+    JSON 仍作为导入/导出格式保留，首次启动时自动导入旧的 playlists.json。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS playlists (
+            name TEXT PRIMARY KEY,
+            position INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS songs (
+            playlist TEXT NOT NULL REFERENCES playlists(name) ON DELETE CASCADE,
+            id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (playlist, id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS songs_order ON songs (playlist, position);
+    """
+
+    # 歌曲总数不超过此值时，搜索没有直接匹配的结果会再做模糊匹配
+    FUZZY_LIMIT = 5000
+
+    # 记录在 PRAGMA user_version 中：达到此版本表示已处理过旧版 JSON 的导入
+    MIGRATED_VERSION = 1
+
+    def __init__(self, path="playlists/playlists.db", legacy_json="playlists/playlists.json"):
+        """
+        :param path: 数据库文件路径
+        :param legacy_json: 旧版 JSON 歌单文件，只在第一次打开数据库时导入，之后删除的歌单不会再被导入
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(self.SCHEMA)
+        if legacy_json:
+            self._migrate(legacy_json)
+
+    def _migrate(self, legacy_json):
+        """导入旧版 JSON 歌单并记下已导入；早于此版本、已有歌单的数据库直接记为已导入"""
+        version, = self.conn.execute("PRAGMA user_version").fetchone()
+        if version >= self.MIGRATED_VERSION:
+            return
+        if not self.names() and os.path.exists(legacy_json):
+            self.import_json(legacy_json)
+        self.conn.execute(f"PRAGMA user_version = {self.MIGRATED_VERSION}")
+
+    @metrics.timed("playlist_names_seconds")
+    def names(self):
+        """按创建顺序返回所有歌单名称"""
+        with self._lock:
+            rows = self.conn.execute("SELECT name FROM playlists ORDER BY position").fetchall()
+        return [name for name, in rows]
+
+    @metrics.timed("playlist_load_seconds")
+    def load(self, name):
+        """读取一个歌单中的全部歌曲"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, name FROM songs WHERE playlist = ? ORDER BY position", (name,)).fetchall()
+        return [{'id': song_id, 'name': song_name} for song_id, song_name in rows]
+
+    @metrics.timed("playlist_search_seconds")
+    def search(self, query, limit=20):
+        """
+        在所有歌单中搜索歌曲，返回按匹配度排序的歌曲字典（同一首歌只返回一次）。
+
+        先用 LIKE 找出包含每个搜索词的歌曲；没有结果且歌曲总数不超过 FUZZY_LIMIT 时，
+        对全部歌曲做模糊匹配。
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        patterns = ["%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                    for term in terms]
+        where = " AND ".join("name LIKE ? ESCAPE '\\'" for _ in terms)
+        with self._lock:
+            rows = self.conn.execute(f"SELECT id, name FROM songs WHERE {where} GROUP BY id LIMIT ?",
+                                     (*patterns, limit * 10)).fetchall()
+            if not rows and self.conn.execute("SELECT COUNT(*) FROM songs").fetchone()[0] <= self.FUZZY_LIMIT:
+                rows = self.conn.execute("SELECT id, name FROM songs GROUP BY id").fetchall()
+        return rank(query, (({'id': song_id, 'name': name}, name) for song_id, name in rows), limit)
+
+    @metrics.timed("playlist_create_seconds")
+    def create(self, name):
+        """创建歌单，已存在时返回 False"""
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT OR IGNORE INTO playlists (name, position) "
+                "SELECT ?, COALESCE(MAX(position), 0) + 1 FROM playlists", (name,))
+            return cursor.rowcount > 0
+
+    @metrics.timed("playlist_delete_seconds")
+    def delete(self, name):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM playlists WHERE name = ?", (name,))
+
+    def add_song(self, name, song_info):
+        """追加歌曲到歌单末尾，已存在时返回 False"""
+        return self.add_songs(name, [song_info]) > 0
+
+    @metrics.timed("playlist_add_songs_seconds")
+    def add_songs(self, name, songs):
+        """在一个事务中把多首歌曲追加到歌单末尾，返回实际新增的数量"""
+        with self._lock, self.conn:
+            start = self.conn.execute(
+                "SELECT COALESCE(MAX(position), 0) FROM songs WHERE playlist = ?", (name,)).fetchone()[0]
+            cursor = self.conn.executemany(
+                "INSERT OR IGNORE INTO songs (playlist, id, name, position) VALUES (?, ?, ?, ?)",
+                ((name, int(song['id']), song['name'], start + offset)
+                 for offset, song in enumerate(songs, start=1)))
+            return cursor.rowcount
+
+    def remove_song(self, name, song_id):
+        self.remove_songs(name, [song_id])
+
+    @metrics.timed("playlist_remove_songs_seconds")
+    def remove_songs(self, name, song_ids):
+        """在一个事务中移除多首歌曲"""
+        with self._lock, self.conn:
+            self.conn.executemany("DELETE FROM songs WHERE playlist = ? AND id = ?",
+                                  ((name, int(song_id)) for song_id in song_ids))
+
+    @metrics.timed("playlist_move_song_seconds")
+    def move_song(self, name, song_id, last=True):
+        """把歌曲移到歌单末尾（last=True）或开头"""
+        edge = "MAX(position) + 1" if last else "MIN(position) - 1"
+        with self._lock, self.conn:
+            self.conn.execute(
+                f"UPDATE songs SET position = (SELECT {edge} FROM songs WHERE playlist = ?) "
+                "WHERE playlist = ? AND id = ?", (name, name, int(song_id)))
+
+    def import_json(self, path):
+        """从 JSON 文件导入歌单（格式同旧版 playlists.json），已有歌曲会被跳过"""
+        with open(path, 'r', encoding='utf-8') as f:
+            playlists = json.load(f)
+        for name, songs in playlists.items():
+            self.create(name)
+            self.add_songs(name, songs)
+
+    @metrics.timed("playlist_export_json_seconds")
+    def export_json(self, path):
+        """把所有歌单导出为 JSON 文件，先写临时文件再原子替换"""
+        playlists = {name: self.load(name) for name in self.names()}
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(playlists, f, ensure_ascii=False, indent=4)
+        os.replace(temp_path, path)
+
+    def close(self):
+        self.conn.close()
+
+
+class SongList:
+    """
+    歌单中的歌曲：保持添加顺序，同时以歌曲 ID 为索引。
+
+    判断是否存在、移除以及移到开头/末尾都是 O(1)。
+    """
+
+    def __init__(self, songs=()):
+        self._songs = OrderedDict((int(song['id']), song) for song in songs)
+
+    def __len__(self):
+        return len(self._songs)
+
+    def __iter__(self):
+        return iter(list(self._songs.values()))
+
+    def __contains__(self, song_id):
+        return int(song_id) in self._songs
+
+    def get(self, song_id):
+        return self._songs.get(int(song_id))
+
+    def ids(self):
+        return list(self._songs)
+
+    def add(self, song_info):
+        """追加歌曲，已存在时返回 False"""
+        song_id = int(song_info['id'])
+        if song_id in self._songs:
+            return False
+        self._songs[song_id] = song_info
+        return True
+
+    def remove(self, song_id):
+        """移除歌曲，不存在时返回 False"""
+        return self._songs.pop(int(song_id), None) is not None
+
+    def move(self, song_id, last=True):
+        """把歌曲移到末尾（last=True）或开头"""
+        self._songs.move_to_end(int(song_id), last=last)
+
+
+class PlaylistCollection(Mapping):
+    """
+    歌单名称到歌曲列表的映射。
+
+    歌单名称在创建时读取，歌曲列表在第一次访问某个歌单时才从数据库加载；
+    所有修改都通过本类的方法写入数据库，同时更新已加载的内容。
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._names = store.names()
+        self._loaded = {}
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        if name not in self._loaded:
+            self._loaded[name] = SongList(self.store.load(name))
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def create(self, name):
+        if name in self._names or not self.store.create(name):
+            return False
+        self._names.append(name)
+        self._loaded[name] = SongList()
+        return True
+
+    def delete(self, name):
+        if name in self._names:
+            self.store.delete(name)
+            self._names.remove(name)
+            self._loaded.pop(name, None)
+
+    def add_song(self, name, song_info):
+        return self.add_songs(name, [song_info]) > 0
+
+    def add_songs(self, name, songs):
+        """批量添加歌曲并一次性写入数据库，返回新增数量"""
+        song_list = self[name]
+        added = [song for song in songs if song_list.add(song)]
+        if added:
+            self.store.add_songs(name, added)
+        return len(added)
+
+    def remove_song(self, name, song_id):
+        self.remove_songs(name, [song_id])
+
+    def remove_songs(self, name, song_ids):
+        """批量移除歌曲并一次性写入数据库，返回移除数量"""
+        song_list = self[name]
+        removed = [song_id for song_id in song_ids if song_list.remove(song_id)]
+        if removed:
+            self.store.remove_songs(name, removed)
+        return len(removed)
+
+    def move_song(self, name, song_id, last=True):
+        """把歌曲移到歌单末尾或开头"""
+        song_list = self[name]
+        if song_id in song_list:
+            song_list.move(song_id, last)
+            self.store.move_song(name, song_id, last)
+
+    def reload(self):
+        """重新读取歌单名称，例如导入 JSON 之后"""
+        self._names = self.store.names()
+        self._loaded.clear()
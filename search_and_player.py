@@ -1,17 +1,27 @@
 import threading
 import time
 import tkinter as tk
-from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
-from io import BytesIO
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from tkinter import messagebox
+from tkinter import font as tkfont
 import vlc
-from pyncm.apis import track, cloudsearch
-from pyncm.apis.track import GetTrackLyrics
+from cover_cache import CoverCache
+from download_index import DownloadIndex
+from library_index import LibraryIndex
+from lyric_timeline import LyricCursor, LyricTimeline
+from lyrics_cache import LyricsCache
+from metrics import metrics
+from playback_clock import PlaybackClock
+from play_queue import PlayQueue
+from search_cache import SearchCache
+from stream_proxy import StreamProxy
+from url_resolver import resolver
 
 
 class SearchAndPlayer:
-    def __init__(self, root, progress_bar, lyrics_text, album_cover_label, label_current_length, label_total_length, tree_results):
+    def __init__(self, root, progress_bar, lyrics_text, album_cover_label, label_current_length, label_total_length, tree_results,
+                 vlc_instance=None):
         self.root = root
         self.progress_bar = progress_bar
         self.lyrics_text = lyrics_text
@@ -20,17 +30,73 @@ class SearchAndPlayer:
         self.label_total_length = label_total_length
         self.tree_results = tree_results
 
-        self.player = vlc.MediaPlayer()
+        # 通过 MediaListPlayer 播放，播放列表模式下预取的下一首直接排进 VLC 队列，无缝切歌
+        # 启动时已在后台预热的 libVLC 实例直接复用
+        self.vlc_instance = vlc_instance or vlc.Instance()
+        self.player = self.vlc_instance.media_player_new()
+        self.list_player = self.vlc_instance.media_list_player_new()
+        self.list_player.set_media_player(self.player)
+        self.media_list = self.vlc_instance.media_list_new()
+        self.list_player.set_media_list(self.media_list)
+        # 已播放的条目替换为同一个占位媒体，released_slots 为队列开头已替换的条目数
+        self.placeholder_media = None
+        self.released_slots = 0
+        # 距离歌曲结束多少秒时开始预取下一首
+        self.prefetch_seconds = 20
+        self.prefetch_started = False
+        self.prefetched = None
+        self.bitrate = 320000
+        # VLC 通过本地缓存代理播放，重播和拖动进度时优先读取磁盘缓存
+        self.url_resolver = resolver
+        self.stream_proxy = StreamProxy(url_refresher=self.url_resolver.refresh).start()
+        self.cover_cache = CoverCache(root)
+        self.cover_song_id = None
+        # 歌词缓存在磁盘上，重播和断网时直接读取
+        self.lyrics_cache = LyricsCache()
+        # 本地音乐库：搜索时优先列出，已下载的歌曲直接播放本地文件
+        self.library = LibraryIndex(download_index=DownloadIndex())
+        threading.Thread(target=self.scan_library, name="library-scan", daemon=True).start()
+        # 播放流水线：每次播放递增代号，旧代号的后台结果直接丢弃
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="play")
+        self.play_generation = 0
+        self.pending_tasks = []
         self.current_audio_url = None
         self.is_paused = False
         self.total_length = 0
+        self.displayed_second = None
         self.current_page = 1
         self.song_name = ""
-        self.lyrics = []
-        self.current_lyric_index = 0
+        self.lyrics = LyricTimeline()
+        self.lyric_cursor = LyricCursor(self.lyrics)
+        self.current_lyric_index = None
+        self.current_sung_chars = None
+        # 歌词布局缓存：行高、可见行数、总行数
+        self.lyric_line_height = None
+        self.lyric_visible_lines = None
+        self.lyric_total_lines = 1
+        self.lyrics_text.tag_config("highlight", background="yellow")
+        self.lyrics_text.tag_config("sung", foreground="red")
+        self.lyrics_text.tag_config("translation", foreground="gray")
+        self.lyrics_text.tag_raise("sung")
+        self.lyrics_text.bind("<Configure>", self.update_lyric_layout, add="+")
         self.songs_per_page = 10
+        self.search_cache = SearchCache()
+        # 合并搜索：额外的本地来源（如歌单），以及用于丢弃过期在线结果的搜索代号
+        self.search_sources = []
+        self.search_generation = 0
         self.playlist_mode = False
-        self.current_playing_index = None
+        # 播放队列独立于结果表格，表格只在 queue_view 为 True 时显示队列
+        self.queue = PlayQueue()
+        self.queue_view = False
+
+        # 整个进程只有一个播放时钟，由 libVLC 事件驱动，回调都在 Tk 主线程执行
+        self.clock = PlaybackClock(root, self.player)
+        self.clock.subscribe("length", self.on_length_changed)
+        self.clock.subscribe("time", self.on_time_changed)
+        self.clock.subscribe("end", self.on_end_reached)
+        self.clock.subscribe("media", self.on_media_changed)
+        self.clock.subscribe("playing", self.on_playing)
+        self.clock.start()
 
     def search_songs(self, tree_results, entry_search):
         """搜索歌曲"""
@@ -38,26 +104,124 @@ class SearchAndPlayer:
         if not self.song_name:
             messagebox.showwarning("输入错误", "请输入歌曲名称！")
             return
+        self.current_page = 1
         self.load_search_results(tree_results)
 
     def load_search_results(self, tree_results):
-        """加载搜索结果到树视图中"""
-        tree_results.delete(*tree_results.get_children())
-        choices = self.get_song_choices(self.song_name, self.current_page)
-        if choices:
-            for song_id, description in choices:
-                tree_results.insert("", "end", values=(song_id, description))
-        else:
+        """
+        合并搜索：先立即显示本地来源的匹配，再把在线结果按歌曲 ID 去重后追加到表格。
+
+        第一页先列出本地音乐库、歌单和搜索缓存中的匹配；这一页的在线结果已缓存时同步显示，
+        否则在后台请求，返回后只追加尚未显示的歌曲。每次搜索递增代号，过期的在线结果直接丢弃。
+        """
+        self.search_generation += 1
+        generation = self.search_generation
+        song_name, page = self.song_name, self.current_page
+        self.queue_view = False
+
+        rows, errors = self.get_offline_choices(song_name) if page == 1 else ([], [])
+        songs = self.search_cache.cached_page(song_name, page, self.songs_per_page)
+        if songs is not None:
+            rows = self.merge_choices(rows, songs)
+        tree_results.set_rows(rows)
+        if errors:
+            # 等表格显示、在线请求发出之后再弹出提示
+            self.root.after_idle(messagebox.showwarning, "提示", "搜索本地歌曲时发生错误: " + "; ".join(errors))
+        if songs is not None:
+            self.finish_search(tree_results, song_name, page, songs)
+            return
+
+        future = self.executor.submit(self.fetch_search_page, song_name, page)
+
+        def deliver(done_future):
+            self.root.after(0, self.on_search_page_ready, generation, tree_results, song_name, page, done_future)
+
+        future.add_done_callback(deliver)
+
+    def fetch_search_page(self, song_name, page):
+        """（工作线程）请求一页在线搜索结果"""
+        with metrics.span("search_seconds"):
+            return self.search_cache.get_page(song_name, page, self.songs_per_page)
+
+    def on_search_page_ready(self, generation, tree_results, song_name, page, future):
+        """在线结果返回（主线程）：已开始新的搜索或切换到播放队列时丢弃"""
+        if generation != self.search_generation or self.queue_view:
+            return
+        try:
+            songs = future.result()
+        except Exception as e:
+            if len(tree_results):
+                messagebox.showwarning("提示", f"在线搜索失败，只显示本地结果: {e}")
+            else:
+                messagebox.showerror("错误", f"搜索时发生错误: {e}")
+            return
+        shown = {row[0] for row in tree_results.rows}
+        tree_results.append_rows(row for row in self.merge_choices([], songs) if row[0] not in shown)
+        self.finish_search(tree_results, song_name, page, songs)
+
+    def finish_search(self, tree_results, song_name, page, songs):
+        if songs:
+            # 展示当前页的同时在后台预取下一页
+            self.search_cache.prefetch(song_name, page + 1, self.songs_per_page)
+        if not len(tree_results):
             messagebox.showinfo("结果", "未找到相关歌曲。")
 
-    def get_song_choices(self, song_name, page):
-        """获取歌曲的搜索结果"""
-        offset = (page - 1) * self.songs_per_page
-        result = cloudsearch.GetSearchResult(song_name, limit=self.songs_per_page, offset=offset, stype=1)
-        if 'result' in result and 'songs' in result['result']:
-            songs = result['result']['songs']
-            return [(song['id'], f"{song['name']} - {', '.join(a['name'] for a in song['ar'])}") for song in songs]
-        return []
+    @staticmethod
+    def merge_choices(rows, songs):
+        """把接口返回的歌曲转换为表格行追加到 rows 后面，跳过已有的歌曲 ID"""
+        merged = list(rows)
+        seen = {row[0] for row in merged}
+        for song in songs:
+            if song['id'] not in seen:
+                seen.add(song['id'])
+                merged.append((song['id'], f"{song['name']} - {', '.join(a['name'] for a in song['ar'])}"))
+        return merged
+
+    def add_search_source(self, source):
+        """
+        注册一个本地搜索来源。
+
+        :param source: 函数 (搜索词, 条数) -> [(歌曲 ID, 描述, 来源)]，在主线程中同步调用，应当足够快
+        """
+        self.search_sources.append(source)
+
+    def get_offline_choices(self, song_name, limit=20):
+        """
+        依次从本地音乐库、已注册的来源（如歌单）和搜索缓存中查找，按歌曲 ID 去重。
+
+        :return: (表格行列表, 出错来源的错误信息列表)，某个来源出错不影响其他来源
+        """
+        rows = []
+        errors = []
+        seen = set()
+        with metrics.span("search_local_seconds"):
+            for source in (self.get_local_choices, *self.search_sources, self.get_cached_choices):
+                try:
+                    choices = source(song_name, limit)
+                except Exception as e:
+                    errors.append(str(e))
+                    continue
+                for row in choices:
+                    if row[0] not in seen:
+                        seen.add(row[0])
+                        rows.append(row)
+        return rows, errors
+
+    def get_local_choices(self, song_name, limit=20):
+        """在本地音乐库中搜索，本地独有的曲目使用负数 ID"""
+        tracks = self.library.search(song_name, limit)
+        return [(track['id'], f"{track['title']} - {track['artist'] or '未知艺术家'}", "本地") for track in tracks]
+
+    def get_cached_choices(self, song_name, limit=20):
+        """在之前搜索过的结果中模糊匹配"""
+        return self.merge_choices([], self.search_cache.search_local(song_name, limit))
+
+    def scan_library(self):
+        """（后台线程）增量扫描下载目录，更新本地音乐库"""
+        try:
+            self.library.scan()
+        except Exception as e:
+            self.root.after(0, lambda: messagebox.showerror("错误", f"扫描本地音乐库时发生错误: {e}"))
 
     def prev_page(self, tree_results):
         """上一页搜索结果"""
@@ -71,98 +235,211 @@ class SearchAndPlayer:
         self.load_search_results(tree_results)
 
     def get_audio_url(self, song_id):
-        """获取歌曲的音频 URL"""
-        try:
-            audio_info = track.GetTrackAudio(song_id, bitrate=320000)
-            if 'data' in audio_info and audio_info['data']:
-                return audio_info['data'][0].get('url')
-            return None
-        except Exception as e:
-            messagebox.showerror("错误", f"获取音频 URL 时发生错误: {e}")
+        """获取歌曲的音频 URL（在工作线程中调用，异常由调用方处理）"""
+        with metrics.span("audio_url_seconds"):
+            return self.url_resolver.resolve(song_id, self.bitrate)
+
+    def get_media_url(self, song_id):
+        """获取交给 VLC 的 URL：本地音乐库中的文件直接播放，其余通过本地代理，已完整缓存的歌曲无需再请求音频地址"""
+        path = self.library.path_for(song_id)
+        if path:
+            return Path(path).as_uri()
+        if int(song_id) < 0:
             return None
+        if self.stream_proxy.is_cached(song_id, self.bitrate):
+            return self.stream_proxy.local_url(song_id, self.bitrate)
+        audio_url = self.get_audio_url(song_id)
+        if audio_url:
+            return self.stream_proxy.local_url(song_id, self.bitrate, audio_url)
+        return None
 
     def fetch_lyrics(self, song_id):
-        """获取歌曲歌词"""
-        try:
-            response = GetTrackLyrics(song_id)
-            if response['code'] == 200:
-                raw_lyrics = response.get('lrc', {}).get('lyric', '未找到歌词')
-                return self.parse_lyrics(raw_lyrics)
-            else:
-                return []
-        except Exception as e:
-            messagebox.showerror("错误", f"获取歌词时发生错误: {e}")
-            return []
-
-    def parse_lyrics(self, raw_lyrics):
-        """解析歌词"""
-        lyrics = []
-        for line in raw_lyrics.splitlines():
-            if line.startswith("[") and "]" in line:
-                timestamp, text = line.split("]", 1)
-                timestamp = timestamp.strip("[]")
-                minutes, seconds = map(float, timestamp.split(":"))
-                time_in_seconds = minutes * 60 + seconds
-                lyrics.append((time_in_seconds, text.strip()))
-        return lyrics
+        """获取歌曲歌词（在工作线程中调用，异常由调用方处理），优先读取磁盘缓存"""
+        if int(song_id) < 0:
+            return LyricTimeline()  # 本地独有的曲目没有在线歌词
+        with metrics.span("lyrics_seconds"):
+            return self.lyrics_cache.get(song_id)
 
     def display_lyrics(self):
         """显示歌词"""
         self.lyrics_text.config(state=tk.NORMAL)
         self.lyrics_text.delete(1.0, tk.END)
-        for _, text in self.lyrics:
-            self.lyrics_text.insert(tk.END, text + "\n")
+        # 每句歌词占一行，翻译跟在原文后面，行号与歌词下标一一对应
+        # 所有文本和标签拼成一次 insert 调用
+        chunks = []
+        for text, translation in zip(self.lyrics.texts, self.lyrics.translations):
+            if translation:
+                chunks.extend((text, (), "　" + translation, "translation", "\n", ()))
+            else:
+                chunks.extend((text + "\n", ()))
+        if chunks:
+            self.lyrics_text.insert(tk.END, *chunks)
         self.lyrics_text.config(state=tk.DISABLED)
+        self.lyric_cursor = LyricCursor(self.lyrics)
+        self.current_lyric_index = None
+        self.current_sung_chars = None
+        self.lyric_total_lines = len(self.lyrics) + 1
 
     def display_album_cover(self, song_id):
-        """显示专辑封面"""
-        try:
-            song_detail = track.GetTrackDetail(song_id)
-            if 'songs' in song_detail and song_detail['songs']:
-                album_cover_url = song_detail['songs'][0]['al']['picUrl']
-                if album_cover_url:
-                    response = requests.get(album_cover_url)
-                    image_data = Image.open(BytesIO(response.content))
-                    image_data = image_data.resize((100, 100), Image.Resampling.LANCZOS)
-                    album_cover = ImageTk.PhotoImage(image_data)
-                    self.album_cover_label.config(image=album_cover)
-                    self.album_cover_label.image = album_cover
-                    return
-        except Exception as e:
-            messagebox.showerror("错误", f"加载专辑封面失败: {e}")
-        
+        """显示专辑封面（后台加载，命中缓存时立即显示）"""
+        self.cover_song_id = song_id
+        if int(song_id) < 0:
+            self.show_album_cover(song_id, None)
+            return None
+        started = time.monotonic()
+
+        def show(image, error):
+            metrics.observe("album_cover_seconds", time.monotonic() - started)
+            self.show_album_cover(song_id, image, error)
+
+        return self.cover_cache.load(song_id, show)
+
+    def show_album_cover(self, song_id, album_cover, error=None):
+        """在主线程中更新封面，忽略已切走歌曲的结果"""
+        if song_id != self.cover_song_id:
+            return
+        if error is not None:
+            messagebox.showerror("错误", f"加载专辑封面失败: {error}")
+
         # 如果获取失败，显示默认图片
-        self.album_cover_label.config(image='')
-        self.album_cover_label.image = None
+        self.album_cover_label.config(image=album_cover or '')
+        self.album_cover_label.image = album_cover
 
+    @metrics.timed("play_selected_seconds")
     def play_selected_song(self, tree_results):
         """播放选中的歌曲"""
-        selected_item = tree_results.selection()
-        if not selected_item:
+        selected_row = tree_results.selected_row()
+        if selected_row is None:
             messagebox.showwarning("未选择", "请选择一首歌曲！")
             return
 
-        song_id, song_description = tree_results.item(selected_item[0], "values")
+        if tree_results is self.tree_results and self.queue_view:
+            # 表格显示的是播放队列，直接跳到该位置
+            self.start_track(self.queue.jump(tree_results.selected_index()))
+        else:
+            song_id, song_description = selected_row[:2]
+            self.play_now(song_id, song_description)
+
+    def play_now(self, song_id, description):
+        """把歌曲插到队列当前位置之后并立即播放，原有队列保持不变"""
+        self.cancel_prefetch()
+        self.queue.play_next(song_id, description)
+        self.start_track(self.queue.advance(manual=True))
+        if self.queue_view:
+            self.show_queue()
+
+    def play_queue(self, songs, start=0):
+        """用 songs（(song_id, description) 序列）替换播放队列并从第 start 首开始播放"""
+        self.queue.load(songs)
+        if not len(self.queue):
+            return
+        # 一次性批量解析整个队列的音频 URL，后续切歌直接命中缓存
+        self.url_resolver.prefetch([song_id for song_id in self.queue.ids if song_id > 0], self.bitrate)
+        self.playlist_mode = True
+        self.show_queue()
+        self.start_track(self.queue.jump(start))
+
+    def show_queue(self):
+        """在结果表格中显示播放队列，并选中当前歌曲"""
+        self.queue_view = True
+        self.tree_results.set_rows([self.queue.song(index) for index in range(len(self.queue))])
+        self.select_queue_row()
+
+    def select_queue_row(self):
+        """表格显示队列时，让选中行跟随当前歌曲"""
+        index = self.queue.current_index()
+        if self.queue_view and index is not None:
+            self.tree_results.select(index)
+
+    def start_track(self, track):
+        """播放队列中的一项 (下标, song_id, description)"""
+        if track is None:
+            return
+        index, song_id, description = track
         # 保存当前播放的歌曲名称
-        self.song_name = song_description
-        
-        audio_url = self.get_audio_url(int(song_id))
-        if audio_url:
-            self.current_audio_url = audio_url
-            self.player.set_media(vlc.Media(audio_url))
-            self.player.play()
-            self.is_paused = False
+        self.song_name = description
+        self.select_queue_row()
+        self.play_song(int(song_id))
 
-            # 获取专辑封面并显示
-            self.display_album_cover(int(song_id))
+    def play_song(self, song_id):
+        """
+        异步播放歌曲。
 
-            # 获取歌词并显示
-            self.lyrics = self.fetch_lyrics(int(song_id))
-            self.display_lyrics()
+        音频地址在后台解析，得到后立即开始播放；封面和歌词同时并行加载。
+        结果通过 root.after 回到主线程，已被新歌曲取代的请求会被取消或丢弃。
+        """
+        for future in self.pending_tasks:
+            future.cancel()
+        # 从这里到 VLC 开始播放的耗时计为"首次出声时间"
+        metrics.incr("play_requests")
+        metrics.mark("first_audio")
+        self.play_generation += 1
+        generation = self.play_generation
+        self.prefetched = None
+        self.prefetch_started = False
 
-            threading.Thread(target=self.update_progress_bar, daemon=True).start()
-        else:
+        # 已缓存的歌词直接显示，否则在后台获取
+        cached_lyrics = self.lyrics_cache.cached(song_id)
+        self.lyrics = cached_lyrics or LyricTimeline()
+        self.display_lyrics()
+        self.pending_tasks = [
+            self.run_async(generation, self.get_media_url, song_id, self.on_media_url_ready),
+        ]
+        if cached_lyrics is None:
+            self.pending_tasks.append(self.run_async(generation, self.fetch_lyrics, song_id, self.on_lyrics_ready))
+        cover_task = self.display_album_cover(song_id)
+        if cover_task is not None:
+            self.pending_tasks.append(cover_task)
+
+    def run_async(self, generation, func, song_id, on_done):
+        """在线程池中执行 func(song_id)，完成后在主线程调用 on_done(result, error)"""
+        future = self.executor.submit(func, song_id)
+
+        def deliver(done_future):
+            if not done_future.cancelled():
+                self.root.after(0, self.deliver_async_result, generation, done_future, on_done)
+
+        future.add_done_callback(deliver)
+        return future
+
+    def deliver_async_result(self, generation, future, on_done):
+        """丢弃过期歌曲的结果，其余交给回调处理"""
+        if generation != self.play_generation:
+            return
+        try:
+            result, error = future.result(), None
+        except Exception as e:
+            result, error = None, e
+        on_done(result, error)
+
+    def on_media_url_ready(self, media_url, error):
+        """音频地址就绪后立即开始播放"""
+        if error is not None:
+            messagebox.showerror("错误", f"获取音频 URL 时发生错误: {error}")
+            return
+        if not media_url:
             messagebox.showerror("错误", "未能获取音频 URL。")
+            return
+        self.current_audio_url = media_url
+        self.clock.reset()
+        self.total_length = 0
+        self.displayed_second = None
+        self.media_list = self.vlc_instance.media_list_new([media_url])
+        self.list_player.set_media_list(self.media_list)
+        self.released_slots = 0
+        self.list_player.play()
+        self.is_paused = False
+
+    def on_playing(self, started_at):
+        """（时钟回调）VLC 开始播放，记录首次出声时间；暂停后恢复没有起点，不会计入"""
+        metrics.finish("first_audio", "time_to_first_audio_seconds", started_at)
+
+    def on_lyrics_ready(self, lyrics, error):
+        """显示后台获取的歌词"""
+        if error is not None:
+            messagebox.showerror("错误", f"获取歌词时发生错误: {error}")
+        self.lyrics = lyrics or LyricTimeline()
+        self.display_lyrics()
 
     def toggle_pause(self):
         """切换播放和暂停"""
@@ -173,86 +450,189 @@ class SearchAndPlayer:
             self.player.pause()
             self.is_paused = True
 
-    def update_progress_bar(self):
-        """更新进度条和播放时间"""
-        while True:
-            time.sleep(0.1)  # 更频繁地检查以提高响应性
-            if self.player.is_playing():
-                self.total_length = self.player.get_length() / 1000
-                current_time = self.player.get_time() / 1000
-                if self.total_length > 0:
-                    progress = (current_time / self.total_length) * 100
-                    self.progress_bar["value"] = progress
-                    self.label_current_length.config(text=f"当前时间: {self.format_time(current_time)}")
-                    self.label_total_length.config(text=f"总时长: {self.format_time(self.total_length)}")
-                    self.highlight_current_lyric(current_time)
-                    
-                    # 在歌曲结束前1秒预加载并播放下一首
-                    if self.playlist_mode and (self.total_length - current_time) <= 1:
-                        self.prepare_and_play_next()
-                        break  # 退出当前歌曲的进度条更新���环
+    def on_length_changed(self, total_length):
+        """（时钟回调）更新总时长"""
+        self.total_length = total_length
+        self.label_total_length.config(text=f"总时长: {self.format_time(total_length)}")
+
+    def on_time_changed(self, current_time):
+        """（时钟回调）更新进度条、当前时间和歌词高亮"""
+        if self.total_length <= 0:
+            return
+        self.progress_bar["value"] = (current_time / self.total_length) * 100
+        second = int(current_time)
+        if second != self.displayed_second:
+            self.displayed_second = second
+            self.label_current_length.config(text=f"当前时间: {self.format_time(current_time)}")
+        self.highlight_current_lyric(current_time)
+
+        if (self.playlist_mode and not self.prefetch_started
+                and self.total_length - current_time <= self.prefetch_seconds):
+            self.prefetch_next()
+
+    def on_end_reached(self):
+        """（时钟回调）歌曲播放结束，播放列表模式下自动播放下一首"""
+        if self.prefetched and self.prefetched['queued']:
+            # 下一首已排进 VLC 队列，由 MediaListPlayer 无缝切换
+            return
+        if self.playlist_mode:
+            self.prepare_and_play_next()
+
+    def prefetch_media(self, song_id):
+        """（工作线程）解析下一首的地址并预热开头几秒的音频"""
+        media_url = self.get_media_url(song_id)
+        if media_url and not media_url.startswith("file:") and not self.stream_proxy.is_cached(song_id, self.bitrate):
+            try:
+                self.stream_proxy.warm(song_id, self.bitrate)
+            except Exception:
+                pass  # 预热失败不影响播放，VLC 会直接从网络读取
+        return media_url
+
+    def prefetch_next(self):
+        """预取下一首的地址、音频开头、歌词和封面，就绪后排进 VLC 播放队列"""
+        self.prefetch_started = True
+        next_track = self.queue.peek_next()
+        if next_track is None:
+            return
+        item, song_id, description = next_track
+        entry = {'item': item, 'song_id': song_id, 'description': description,
+                 'url': None, 'lyrics': None, 'queued': False, 'promoted': False}
+        self.prefetched = entry
+        generation = self.play_generation
+        self.run_async(generation, self.prefetch_media, song_id,
+                       lambda url, error: self.on_prefetched_media(entry, url, error))
+        self.run_async(generation, self.fetch_lyrics, song_id,
+                       lambda lyrics, error: self.on_prefetched_lyrics(entry, lyrics, error))
+        # 只为把封面放进缓存，显示留到真正切歌时
+        if int(song_id) > 0:
+            self.cover_cache.load(song_id, lambda image, error: None)
+
+    def on_prefetched_media(self, entry, media_url, error):
+        """下一首地址就绪，加入 VLC 播放队列；失败时由 on_end_reached 按原方式切歌"""
+        if entry is not self.prefetched or error is not None or not media_url:
+            return
+        entry['url'] = media_url
+        self.media_list.add_media(media_url)
+        entry['queued'] = True
+
+    def cancel_prefetch(self):
+        """队列顺序改变时丢弃已预取的下一首，并把它从 VLC 队列中移除"""
+        entry = self.prefetched
+        self.prefetched = None
+        self.prefetch_started = False
+        if entry and entry['queued'] and not entry['promoted']:
+            self.media_list.lock()
+            try:
+                if self.media_list.count() > 1:
+                    self.media_list.remove_index(self.media_list.count() - 1)
+            finally:
+                self.media_list.unlock()
+
+    def on_prefetched_lyrics(self, entry, lyrics, error):
+        entry['lyrics'] = lyrics or LyricTimeline()
+        if entry['promoted']:
+            # 歌词晚于切歌到达
+            self.on_lyrics_ready(lyrics, error)
+
+    def on_media_changed(self):
+        """（时钟回调）MediaListPlayer 切到了预取的下一首，更新界面"""
+        entry = self.prefetched
+        if not entry or not entry['queued']:
+            return
+        media = self.player.get_media()
+        if media is None or media.get_mrl() != entry['url']:
+            return
+        self.prefetched = None
+        self.prefetch_started = False
+        entry['promoted'] = True
+
+        self.queue.advance()
+        self.select_queue_row()
+        self.song_name = entry['description']
+        self.current_audio_url = entry['url']
+        self.total_length = 0
+        self.displayed_second = None
+        self.lyrics = entry['lyrics'] or LyricTimeline()
+        self.display_lyrics()
+        self.display_album_cover(entry['song_id'])
+        self.release_played_media()
+
+    def release_played_media(self):
+        """
+        释放 VLC 队列中已播放歌曲的 Media。
+
+        MediaListPlayer 按下标记录当前条目，删除前面的条目时不会调整下标，直接删除会让下一首错位；
+        因此把已播放的条目原地替换为同一个占位媒体，队列长度不变，每首歌只剩一个指针。
+        """
+        if self.placeholder_media is None:
+            self.placeholder_media = self.vlc_instance.media_new("vlc://nop")
+        self.media_list.lock()
+        try:
+            # 当前歌曲是队列的最后一项，之前的都已播放
+            played = self.media_list.count() - 1
+            for index in range(self.released_slots, played):
+                self.media_list.remove_index(index)
+                self.media_list.insert_media(self.placeholder_media, index)
+            self.released_slots = max(self.released_slots, played)
+        finally:
+            self.media_list.unlock()
 
     def prepare_and_play_next(self):
         """准备并播放下一首歌曲"""
-        current_items = self.tree_results.get_children()
-        current_selection = self.tree_results.selection()
-        
-        if not current_selection:
-            return
-        
-        current_index = current_items.index(current_selection[0])
-        if current_index + 1 < len(current_items):
-            next_item = current_items[current_index + 1]
-            next_song_id = self.tree_results.item(next_item)['values'][0]
-            next_song_description = self.tree_results.item(next_item)['values'][1]
-            
-            # 预加载下一首歌曲的URL
-            next_audio_url = self.get_audio_url(int(next_song_id))
-            if next_audio_url:
-                # 更新选中状态
-                self.tree_results.selection_set(next_item)
-                self.song_name = next_song_description
-                
-                # 创建并播放新的Media
-                next_media = vlc.Media(next_audio_url)
-                self.player.set_media(next_media)
-                self.player.play()
-                
-                # 更新界面显示
-                self.display_album_cover(int(next_song_id))
-                self.lyrics = self.fetch_lyrics(int(next_song_id))
-                self.display_lyrics()
-                
-                # 启动新的进度条更新线程
-                threading.Thread(target=self.update_progress_bar, daemon=True).start()
+        next_track = self.queue.advance()
+        if next_track is not None:
+            self.start_track(next_track)
         else:
             self.playlist_mode = False
             self.root.after(0, lambda: tk.messagebox.showinfo("提示", "播放列表已播放完毕"))
 
     def highlight_current_lyric(self, current_time):
-        """高亮当前歌词并将其居中"""
-        # 找到当前播放时间对应的歌词索引
-        for i, (start_time, text) in enumerate(self.lyrics):
-            if start_time > current_time:
-                self.current_lyric_index = max(i - 1, 0)
-                break
-        else:
-            self.current_lyric_index = len(self.lyrics) - 1
+        """高亮当前歌词并将其居中，只在当前行或已唱字数变化时才操作文本框"""
+        index = self.lyric_cursor.advance(current_time)
+        if index is None:
+            return
+        if index != self.current_lyric_index:
+            self.move_lyric_highlight(index)
+        self.highlight_sung_words(index, current_time)
 
-         # 清除以前的高亮
-        self.lyrics_text.tag_remove("highlight", 1.0, tk.END)
+    def highlight_sung_words(self, index, current_time):
+        """有逐字时间时，把当前行已唱的部分标红（卡拉 OK 效果）"""
+        sung_chars = self.lyrics.sung_chars(index, current_time)
+        if sung_chars == self.current_sung_chars:
+            return
+        self.current_sung_chars = sung_chars
+        line = index + 1
+        self.lyrics_text.tag_remove("sung", f"{line}.0", f"{line}.end")
+        if sung_chars:
+            self.lyrics_text.tag_add("sung", f"{line}.0", f"{line}.{sung_chars}")
 
-    # 设置新的高亮
-        start_index = f"{self.current_lyric_index + 1}.0"
-        end_index = f"{self.current_lyric_index + 1}.end"
-        self.lyrics_text.tag_add("highlight", start_index, end_index)
-        self.lyrics_text.tag_config("highlight", background="yellow")
+    def move_lyric_highlight(self, index):
+        """把高亮移到第 index 行"""
+
+        # 只清除上一行的高亮
+        if self.current_lyric_index is not None:
+            self.lyrics_text.tag_remove("highlight", f"{self.current_lyric_index + 1}.0",
+                                        f"{self.current_lyric_index + 1}.end")
+            self.lyrics_text.tag_remove("sung", f"{self.current_lyric_index + 1}.0",
+                                        f"{self.current_lyric_index + 1}.end")
+        self.current_lyric_index = index
+        self.current_sung_chars = None
+
+        # 设置新的高亮
+        self.lyrics_text.tag_add("highlight", f"{index + 1}.0", f"{index + 1}.end")
+
+        # 自动滚动，使高亮的歌词居中
+        if self.lyric_visible_lines is None:
+            self.update_lyric_layout()
+        center_line = max(0, index - self.lyric_visible_lines // 2)
+        self.lyrics_text.yview_moveto(center_line / self.lyric_total_lines)
 
-    # 自动滚动，使高亮的歌词居中
-        total_lines = int(self.lyrics_text.index("end-1c").split(".")[0])
-        visible_lines = int(self.lyrics_text.winfo_height() / self.lyrics_text.dlineinfo("@0,0")[3])
-        center_line = max(0, self.current_lyric_index - visible_lines // 2)
-        self.lyrics_text.yview_moveto(center_line / total_lines)
+    def update_lyric_layout(self, event=None):
+        """缓存歌词文本框的行高和可见行数，仅在首次使用或窗口尺寸变化时计算"""
+        if self.lyric_line_height is None:
+            self.lyric_line_height = tkfont.Font(font=self.lyrics_text.cget("font")).metrics("linespace")
+        height = event.height if event is not None else self.lyrics_text.winfo_height()
+        self.lyric_visible_lines = max(1, height // self.lyric_line_height)
 
     def seek_song(self, event):
         """调整播放进度"""
@@ -270,28 +650,44 @@ class SearchAndPlayer:
     def set_playlist_mode(self, enabled):
         """设置是否启用播放列表模式"""
         self.playlist_mode = enabled
-        
+
+    def set_shuffle(self, enabled):
+        """开启或关闭随机播放"""
+        self.cancel_prefetch()
+        self.queue.set_shuffle(enabled)
+
+    def set_repeat(self, mode):
+        """设置循环模式（PlayQueue.REPEAT_OFF / REPEAT_ALL / REPEAT_ONE）"""
+        self.cancel_prefetch()
+        self.queue.set_repeat(mode)
+
+    def queue_selected_next(self, tree_results):
+        """把表格中选中的歌曲（可多选）插到当前歌曲之后"""
+        rows = [tree_results.row(index) for index in tree_results.selection()]
+        if not rows:
+            messagebox.showwarning("未选择", "请选择一首歌曲！")
+            return
+        self.cancel_prefetch()
+        # 逆序插入，使播放顺序与选中顺序一致
+        for song_id, description in (row[:2] for row in reversed(rows)):
+            self.queue.play_next(song_id, description)
+        if self.queue_view:
+            self.show_queue()
+
     def play_next_song(self):
-        """播放下一首歌曲"""
-        if not self.playlist_mode:
+        """手动切到下一首（单曲循环时也会切歌）"""
+        self.cancel_prefetch()
+        next_track = self.queue.advance(manual=True)
+        if next_track is None:
+            self.root.after(0, lambda: tk.messagebox.showinfo("提示", "已经是最后一首歌了"))
             return
-        
-        current_items = self.tree_results.get_children()
-        if not current_items:
+        self.start_track(next_track)
+
+    def play_previous_song(self):
+        """回到上一首"""
+        self.cancel_prefetch()
+        current = self.queue.current()
+        previous = self.queue.previous()
+        if previous is None or previous == current:
             return
-        
-        current_selection = self.tree_results.selection()
-        if not current_selection:
-            next_index = 0
-        else:
-            current_index = current_items.index(current_selection[0])
-            if current_index + 1 < len(current_items):
-                next_index = current_index + 1
-            else:
-                self.root.after(0, lambda: tk.messagebox.showinfo("提示", "已经是最后一首歌了"))
-                self.playlist_mode = False
-                return
-        
-        next_item = current_items[next_index]
-        self.tree_results.selection_set(next_item)
-        self.play_selected_song(self.tree_results)
+        self.start_track(previous)
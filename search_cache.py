@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from api_client import client
+from local_search import rank
+from metrics import metrics
+
+
+class SearchCache:
+    """
+    搜索结果缓存。
+
+    每次向接口请求一个较大的结果窗口（默认 50 条），按 (关键词, 类型, 偏移, 条数) 缓存，
+    翻页时在本地切片；缓存按 LRU 淘汰并带有过期时间。同一窗口的并发请求只发出一次。
+    """
+
+    def __init__(self, window=50, ttl=600, max_entries=128, workers=2):
+        """
+        :param window: 单次请求的结果条数
+        :param ttl: 缓存有效期（秒）
+        :param max_entries: 最多缓存的窗口数
+        :param workers: 后台预取线程数
+        """
+        self.window = window
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="search")
+        self._entries = OrderedDict()  # key -> (过期时间, 歌曲列表)
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+
+    def get_page(self, keyword, page, per_page, stype=1):
+        """返回第 page 页的歌曲列表（接口原始字典）"""
+        return self._page(keyword, page, per_page, stype,
+                          lambda window_offset: self._fetch_window(keyword, stype, window_offset))
+
+    def cached_page(self, keyword, page, per_page, stype=1):
+        """只读缓存：第 page 页所需的窗口都已缓存时返回歌曲列表，否则返回 None，不发出请求"""
+        def lookup(window_offset):
+            songs = self._lookup((keyword, stype, window_offset, self.window))
+            if songs is None:
+                raise LookupError(window_offset)
+            return songs
+
+        try:
+            songs = self._page(keyword, page, per_page, stype, lookup)
+        except LookupError:
+            return None
+        metrics.hit("search_cache", True)
+        return songs
+
+    def search_local(self, query, limit=20, stype=1):
+        """在所有未过期的缓存结果中按歌名、歌手和专辑模糊匹配，返回去重后的歌曲列表"""
+        now = time.monotonic()
+        with self._lock:
+            windows = [songs for (_, key_stype, _, _), (expires, songs) in self._entries.items()
+                       if key_stype == stype and expires > now]
+        candidates = {}
+        for songs in reversed(windows):  # 最近使用的窗口排在前面
+            for song in songs:
+                if song['id'] not in candidates:
+                    candidates[song['id']] = song
+        return rank(query, ((song, self._song_text(song)) for song in candidates.values()), limit)
+
+    def _page(self, keyword, page, per_page, stype, fetch_window):
+        offset = (page - 1) * per_page
+        songs = []
+        for window_offset in self._window_offsets(offset, per_page):
+            window_songs = fetch_window(window_offset)
+            start = max(offset - window_offset, 0)
+            songs.extend(window_songs[start:start + per_page - len(songs)])
+            if len(window_songs) < self.window:
+                break  # 已到最后一页
+        return songs
+
+    @staticmethod
+    def _song_text(song):
+        artists = ", ".join(artist.get('name') or "" for artist in song.get('ar') or ())
+        album = (song.get('al') or {}).get('name') or ""
+        return f"{song.get('name') or ''} - {artists} {album}"
+
+    def prefetch(self, keyword, page, per_page, stype=1):
+        """在后台预取第 page 页所在的结果窗口"""
+        offset = (page - 1) * per_page
+        for window_offset in self._window_offsets(offset, per_page):
+            key = (keyword, stype, window_offset, self.window)
+            if self._lookup(key) is None:
+                self.executor.submit(self._fetch_window, keyword, stype, window_offset)
+
+    def _window_offsets(self, offset, per_page):
+        first = offset // self.window * self.window
+        last = (offset + per_page - 1) // self.window * self.window
+        return range(first, last + 1, self.window)
+
+    def _lookup(self, key):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+            if cached[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return cached[1]
+
+    def _fetch_window(self, keyword, stype, window_offset):
+        """取得一个结果窗口，优先使用缓存，并与正在进行的相同请求合并"""
+        key = (keyword, stype, window_offset, self.window)
+        songs = self._lookup(key)
+        metrics.hit("search_cache", songs is not None)
+        if songs is not None:
+            return songs
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            result = client.search(keyword, limit=self.window, offset=window_offset, stype=stype)
+            songs = result.get('result', {}).get('songs', []) if result.get('code') == 200 else []
+            with self._lock:
+                if result.get('code') == 200:
+                    self._entries[key] = (time.monotonic() + self.ttl, songs)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                del self._inflight[key]
+            future.set_result(songs)
+            return songs
+        except Exception as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
@@ -0,0 +1,181 @@
+import builtins
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import metrics
+
+
+class StartupProfiler:
+    """
+    启动耗时统计。
+
+    始终记录各阶段耗时（同时写入 metrics 的 startup_<阶段>_seconds）和关键时间点；
+    调用 enable() 后还会替换 ``__import__``，统计之后每个模块首次导入的自身耗时和累计耗时。
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.enabled = False
+        self.phases = []  # (阶段, 耗时)
+        self.checkpoints = []  # (时间点, 距启动的秒数)
+        self.imports = {}  # 模块 -> [自身耗时, 累计耗时, 线程名]
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._original_import = None
+
+    def enable(self):
+        """开始统计模块导入耗时"""
+        if self.enabled:
+            return
+        self.enabled = True
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def disable(self):
+        if self.enabled:
+            builtins.__import__ = self._original_import
+            self.enabled = False
+
+    @contextmanager
+    def phase(self, name):
+        """统计一个启动阶段的耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phases.append((name, elapsed))
+            metrics.observe(f"startup_{name}_seconds", elapsed)
+
+    def checkpoint(self, name):
+        """记录一个时间点（距进程导入本模块的秒数）"""
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            self.checkpoints.append((name, elapsed))
+        metrics.observe(f"startup_{name}_seconds", elapsed)
+
+    def snapshot(self, limit=30, min_seconds=0.001):
+        """返回统计结果，导入耗时按累计耗时从大到小取前 limit 个"""
+        with self._lock:
+            imports = sorted(((module, *record) for module, record in self.imports.items()
+                              if record[1] >= min_seconds), key=lambda item: item[2], reverse=True)
+            return {
+                "checkpoints": [{"name": name, "seconds": round(seconds, 4)} for name, seconds in self.checkpoints],
+                "phases": [{"name": name, "seconds": round(seconds, 4)} for name, seconds in self.phases],
+                "imports": [{"module": module, "self_seconds": round(own, 4), "cumulative_seconds": round(total, 4),
+                             "thread": thread} for module, own, total, thread in imports[:limit]],
+            }
+
+    def report(self, path=None, file=None, limit=30):
+        """
+        输出启动耗时报告。
+
+        :param path: 同时写入的 JSON 文件路径（先写临时文件再原子替换）
+        :param file: 文本报告的输出位置，默认标准错误
+        """
+        snapshot = self.snapshot(limit)
+        file = file or sys.stderr
+        print("启动时间点:", file=file)
+        for item in snapshot["checkpoints"]:
+            print(f"  {item['seconds'] * 1000:9.1f} ms  {item['name']}", file=file)
+        print("启动阶段:", file=file)
+        for item in snapshot["phases"]:
+            print(f"  {item['seconds'] * 1000:9.1f} ms  {item['name']}", file=file)
+        if snapshot["imports"]:
+            print("模块导入（累计 / 自身）:", file=file)
+            for item in snapshot["imports"]:
+                print(f"  {item['cumulative_seconds'] * 1000:9.1f} ms {item['self_seconds'] * 1000:9.1f} ms  "
+                      f"{item['module']}  [{item['thread']}]", file=file)
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, path)
+        return snapshot
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # 已导入的模块直接返回，不计时；from 包 import 子模块时子模块可能尚未导入
+        if not level and name in sys.modules and not any(
+                isinstance(item, str) and f"{name}.{item}" not in sys.modules
+                and not hasattr(sys.modules[name], item) for item in fromlist or ()):
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            module = self._module_name(name, globals, level)
+            with self._lock:
+                record = self.imports.setdefault(module, [0.0, 0.0, threading.current_thread().name])
+                record[0] += elapsed - children
+                record[1] += elapsed
+
+    @staticmethod
+    def _module_name(name, globals, level):
+        """把相对导入解析为完整模块名"""
+        if not level:
+            return name
+        try:
+            return importlib.util.resolve_name("." * level + name, (globals or {}).get("__package__"))
+        except (ImportError, ValueError):
+            return "." * level + name
+
+
+class Warmup:
+    """
+    后台预热播放引擎：导入播放器模块（连带 pyncm、requests、Pillow、vlc），并创建 libVLC 实例。
+
+    登录窗口先显示，预热在后台线程进行；登录后 vlc_instance() 等待预热完成并取得实例。
+    """
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self._instance = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="startup-warmup", daemon=True)
+
+    def start(self):
+        """开始预热，已开始时不做任何事"""
+        if self._thread.ident is None:
+            self._thread.start()
+        return self
+
+    def vlc_instance(self):
+        """等待预热结束，返回 libVLC 实例；预热失败时打印错误并返回 None，由调用方自行创建"""
+        # 通过 Cookie 登录时可能在预热开始之前就被调用
+        self.start()
+        with self.profiler.phase("warmup_wait"):
+            self._thread.join()
+        if self._error is not None:
+            print(f"预热播放引擎时发生错误: {self._error}")
+        return self._instance
+
+    def _run(self):
+        try:
+            with self.profiler.phase("warmup_imports"):
+                import search_and_player  # noqa: F401
+                import play_list  # noqa: F401
+                from PIL import Image, ImageTk  # noqa: F401
+            with self.profiler.phase("warmup_vlc"):
+                import vlc
+                self._instance = vlc.Instance()
+        except Exception as e:
+            self._error = e
+
+
+profiler = StartupProfiler()
@@ -0,0 +1,66 @@
+import tkinter as tk
+from tkinter import ttk
+
+from metrics import metrics
+
+
+class StatsPanel:
+    """性能统计窗口：定时刷新耗时分位数和各项计数"""
+
+    def __init__(self, root, interval=1000):
+        """
+        :param root: 父窗口
+        :param interval: 刷新间隔（毫秒）
+        """
+        self.interval = interval
+        self.window = tk.Toplevel(root)
+        self.window.title("性能统计")
+        self.window.geometry("640x480")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        columns = ("name", "count", "p50", "p90", "p99", "max")
+        headings = ("耗时指标", "次数", "p50", "p90", "p99", "最大")
+        self.summary_tree = ttk.Treeview(self.window, columns=columns, show="headings", height=12)
+        for column, heading in zip(columns, headings):
+            self.summary_tree.heading(column, text=heading)
+            self.summary_tree.column(column, width=200 if column == "name" else 80,
+                                     anchor="w" if column == "name" else "e")
+        self.summary_tree.pack(fill="both", expand=True, padx=5, pady=5)
+
+        self.counter_tree = ttk.Treeview(self.window, columns=("name", "value"), show="headings", height=8)
+        self.counter_tree.heading("name", text="计数")
+        self.counter_tree.heading("value", text="数值")
+        self.counter_tree.column("name", width=300)
+        self.counter_tree.column("value", width=120, anchor="e")
+        self.counter_tree.pack(fill="both", expand=True, padx=5, pady=5)
+
+        self._timer = None
+        self.refresh()
+
+    def refresh(self):
+        """重新读取快照并更新表格"""
+        snapshot = metrics.snapshot()
+        self.summary_tree.delete(*self.summary_tree.get_children())
+        for name, summary in snapshot['summaries'].items():
+            if name.endswith("_seconds"):
+                # 耗时以毫秒显示
+                values = [f"{summary[key] * 1000:.1f} ms" for key in ("p50", "p90", "p99", "max")]
+            else:
+                values = [f"{summary[key]:.1f}" for key in ("p50", "p90", "p99", "max")]
+            self.summary_tree.insert("", "end", values=(name, summary['count'], *values))
+
+        self.counter_tree.delete(*self.counter_tree.get_children())
+        for name, value in snapshot['counters'].items():
+            self.counter_tree.insert("", "end", values=(name, value))
+        for name, groups in snapshot['collectors'].items():
+            for group, values in groups.items():
+                for field, value in values.items():
+                    self.counter_tree.insert("", "end", values=(f"{name}.{group}.{field}", value))
+
+        self._timer = self.window.after(self.interval, self.refresh)
+
+    def close(self):
+        if self._timer is not None:
+            self.window.after_cancel(self._timer)
+            self._timer = None
+        self.window.destroy()
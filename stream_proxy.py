@@ -0,0 +1,411 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+from http_pool import pool
+from metrics import metrics
+
+CHUNK_SIZE = 64 * 1024
+PATH_PATTERN = re.compile(r"/stream/(\d+)/(\d+)")
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+class CacheEntry:
+    """单首歌曲（歌曲 ID + 码率）的稀疏缓存文件及其已缓存区间"""
+
+    def __init__(self, key, cache_dir):
+        self.key = key
+        self.data_path = os.path.join(cache_dir, f"{key}.bin")
+        self.meta_path = os.path.join(cache_dir, f"{key}.json")
+        self.size = None
+        self.content_type = "audio/mpeg"
+        self.spans = []  # 已缓存的 [start, end) 区间，按起点排序且互不重叠
+        self.readers = 0
+        self.lock = threading.Lock()
+
+    @property
+    def cached_bytes(self):
+        with self.lock:
+            return sum(end - start for start, end in self.spans)
+
+    @property
+    def is_complete(self):
+        with self.lock:
+            return self.size is not None and self.spans == [[0, self.size]]
+
+    def span_end(self, pos):
+        """若 pos 已缓存，返回所在区间的终点，否则返回 None"""
+        with self.lock:
+            for start, end in self.spans:
+                if start <= pos < end:
+                    return end
+                if start > pos:
+                    break
+        return None
+
+    def next_start(self, pos):
+        """返回 pos 之后第一个已缓存区间的起点"""
+        with self.lock:
+            for start, _ in self.spans:
+                if start > pos:
+                    return start
+        return None
+
+    def add_span(self, start, end):
+        """记录新缓存的区间并与相邻区间合并"""
+        with self.lock:
+            merged = []
+            for span_start, span_end in self.spans:
+                if span_end < start or span_start > end:
+                    merged.append([span_start, span_end])
+                else:
+                    start, end = min(start, span_start), max(end, span_end)
+            merged.append([start, end])
+            merged.sort()
+            self.spans = merged
+
+    def drop_from(self, pos):
+        """数据文件在 pos 处提前结束时，丢弃 pos 之后记录的缓存区间"""
+        with self.lock:
+            self.spans = [[start, min(end, pos)] for start, end in self.spans if start < pos]
+
+    def init_size(self, size, content_type):
+        """确定文件大小并创建稀疏数据文件"""
+        with self.lock:
+            self.size = size
+            self.content_type = content_type or self.content_type
+            if not os.path.exists(self.data_path) or os.path.getsize(self.data_path) != size:
+                with open(self.data_path, "wb") as f:
+                    f.truncate(size)
+                self.spans = []
+
+    def load(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        # 数据文件缺失或长度与记录不符（被截断或外部修改）时视为没有缓存
+        try:
+            if os.path.getsize(self.data_path) != meta.get("size"):
+                return False
+        except OSError:
+            return False
+        self.size = meta.get("size")
+        self.content_type = meta.get("content_type", self.content_type)
+        self.spans = meta.get("spans", [])
+        return True
+
+    def save(self):
+        with self.lock:
+            meta = {"size": self.size, "content_type": self.content_type, "spans": self.spans}
+        temp_path = self.meta_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temp_path, self.meta_path)
+
+    def remove(self):
+        for path in (self.data_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class SparseAudioCache:
+    """按歌曲 ID 和码率组织的稀疏磁盘缓存，超出容量预算时按 LRU 淘汰"""
+
+    def __init__(self, cache_dir="cache/audio", max_bytes=1024 * 1024 * 1024):
+        """
+        :param cache_dir: 缓存目录
+        :param max_bytes: 缓存容量预算（字节）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        """按最近访问时间恢复已有缓存"""
+        metas = [name for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        metas.sort(key=lambda name: os.path.getmtime(os.path.join(self.cache_dir, name)))
+        for name in metas:
+            entry = CacheEntry(name[:-len(".json")], self.cache_dir)
+            if entry.load():
+                self.entries[entry.key] = entry
+
+    @staticmethod
+    def make_key(song_id, bitrate):
+        return f"{int(song_id)}_{int(bitrate)}"
+
+    def peek(self, key):
+        with self._lock:
+            return self.entries.get(key)
+
+    def acquire(self, key):
+        """取得缓存项并标记为正在使用"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = CacheEntry(key, self.cache_dir)
+            self.entries.move_to_end(key)
+            entry.readers += 1
+            return entry
+
+    def release(self, entry):
+        """释放缓存项，保存元数据并按需淘汰"""
+        with self._lock:
+            entry.readers -= 1
+        if entry.size is not None:
+            entry.save()
+        self.evict()
+
+    def evict(self):
+        """淘汰最久未使用的缓存，直到总大小不超过预算"""
+        with self._lock:
+            total = sum(entry.cached_bytes for entry in self.entries.values())
+            for key in list(self.entries):
+                if total <= self.max_bytes:
+                    break
+                entry = self.entries[key]
+                if entry.readers > 0:
+                    continue
+                total -= entry.cached_bytes
+                del self.entries[key]
+                entry.remove()
+
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch(send_body=True)
+
+    def do_HEAD(self):
+        self._dispatch(send_body=False)
+
+    def _dispatch(self, send_body):
+        match = PATH_PATTERN.fullmatch(urlsplit(self.path).path)
+        if not match:
+            self.send_error(404)
+            return
+        self.server.proxy.serve(self, int(match.group(1)), int(match.group(2)), send_body)
+
+
+class StreamProxy:
+    """
+    VLC 与 CDN 之间的本地缓存代理。
+
+    VLC 通过本地 URL 播放，代理优先用磁盘缓存应答 Range 请求，只从网络补取缺失的区间，
+    因此重播不再消耗流量，在已播放部分内拖动进度也无需重新缓冲。
+    """
+
+    def __init__(self, cache_dir="cache/audio", max_bytes=1024 * 1024 * 1024, timeout=30,
+                 url_refresher=None):
+        """
+        :param cache_dir: 缓存目录
+        :param max_bytes: 缓存容量预算（字节）
+        :param timeout: 回源请求超时（秒）
+        :param url_refresher: 签名 URL 过期（CDN 返回 403）时调用，参数为 (song_id, bitrate)，返回新的 URL
+        """
+        self.cache = SparseAudioCache(cache_dir, max_bytes)
+        self.timeout = timeout
+        self.url_refresher = url_refresher
+        # 回源请求复用共享连接池，拖动进度时不必重新握手
+        self.session = pool.session
+        self._upstream = {}
+        self._server = None
+
+    def start(self):
+        """在后台线程中启动代理服务器"""
+        if self._server is None:
+            self._server = ThreadingHTTPServer(("127.0.0.1", 0), _ProxyHandler)
+            self._server.daemon_threads = True
+            self._server.proxy = self
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def is_cached(self, song_id, bitrate):
+        """歌曲是否已完整缓存"""
+        entry = self.cache.peek(self.cache.make_key(song_id, bitrate))
+        return entry is not None and entry.is_complete
+
+    def local_url(self, song_id, bitrate, upstream_url=None):
+        """
+        登记歌曲的远程地址并返回供 VLC 播放的本地 URL。
+
+        :param upstream_url: 远程音频 URL，歌曲已完整缓存时可省略
+        """
+        if upstream_url:
+            self._upstream[self.cache.make_key(song_id, bitrate)] = upstream_url
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/stream/{int(song_id)}/{int(bitrate)}"
+
+    def warm(self, song_id, bitrate, length=512 * 1024):
+        """预先缓存歌曲开头的 length 字节，切到这首歌时可立即开始播放"""
+        entry = self.cache.acquire(self.cache.make_key(song_id, bitrate))
+        try:
+            if entry.size is None:
+                self._probe(entry)
+            end = min(length, entry.size) - 1
+            if end >= 0:
+                self._stream(None, entry, 0, end)
+        finally:
+            self.cache.release(entry)
+
+    def serve(self, handler, song_id, bitrate, send_body):
+        """应答一次 VLC 的请求"""
+        entry = self.cache.acquire(self.cache.make_key(song_id, bitrate))
+        headers_sent = False
+        try:
+            if entry.size is None:
+                self._probe(entry)
+            start, end = self._parse_range(handler.headers.get("Range"), entry.size)
+            if start is None:
+                handler.send_response(416)
+                handler.send_header("Content-Range", f"bytes */{entry.size}")
+                handler.send_header("Content-Length", "0")
+                handler.end_headers()
+                return
+            ranged = handler.headers.get("Range") is not None
+            handler.send_response(206 if ranged else 200)
+            handler.send_header("Content-Type", entry.content_type)
+            handler.send_header("Accept-Ranges", "bytes")
+            handler.send_header("Content-Length", str(end - start + 1))
+            if ranged:
+                handler.send_header("Content-Range", f"bytes {start}-{end}/{entry.size}")
+            handler.end_headers()
+            headers_sent = True
+            if send_body:
+                self._stream(handler.wfile, entry, start, end)
+        except (BrokenPipeError, ConnectionResetError):
+            # VLC 拖动进度或切歌时会主动断开连接
+            pass
+        except (requests.RequestException, OSError) as e:
+            if not headers_sent:
+                handler.send_error(502, str(e))
+        finally:
+            self.cache.release(entry)
+
+    @staticmethod
+    def _parse_range(header, size):
+        """解析单区间 Range 头，返回闭区间 (start, end)，越界时返回 (None, None)"""
+        if not header:
+            return 0, size - 1
+        match = RANGE_PATTERN.fullmatch(header.strip())
+        if not match or not (match.group(1) or match.group(2)):
+            return 0, size - 1
+        if not match.group(1):
+            start = max(0, size - int(match.group(2)))
+            end = size - 1
+        else:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+        if start >= size or start > end:
+            return None, None
+        return start, end
+
+    def _upstream_url(self, entry):
+        url = self._upstream.get(entry.key)
+        if not url:
+            raise requests.RequestException(f"没有可用的远程地址: {entry.key}")
+        return url
+
+    def _open_upstream(self, entry, headers):
+        """回源请求；签名 URL 过期时刷新地址并重试一次"""
+        response = self.session.get(self._upstream_url(entry), headers=headers, stream=True,
+                                    timeout=self.timeout)
+        if response.status_code == 403 and self.url_refresher:
+            response.close()
+            song_id, bitrate = entry.key.split("_")
+            try:
+                url = self.url_refresher(int(song_id), int(bitrate))
+            except Exception:
+                url = None
+            if url:
+                self._upstream[entry.key] = url
+                response = self.session.get(url, headers=headers, stream=True, timeout=self.timeout)
+        if not response.ok:
+            response.close()
+        response.raise_for_status()
+        return response
+
+    def _probe(self, entry):
+        """向 CDN 请求首字节以获取文件大小"""
+        with self._open_upstream(entry, {"Range": "bytes=0-0"}) as response:
+            content_range = response.headers.get("Content-Range", "")
+            total = content_range.rsplit("/", 1)[-1]
+            if response.status_code == 206 and total.isdigit():
+                size = int(total)
+            else:
+                size = int(response.headers["Content-Length"])
+            entry.init_size(size, response.headers.get("Content-Type"))
+
+    def _stream(self, wfile, entry, start, end):
+        """按区间输出数据：命中缓存直接读盘，缺失部分回源并写入缓存；wfile 为 None 时只填充缓存"""
+        pos = start
+        with open(entry.data_path, "r+b") as f:
+            while pos <= end:
+                span_end = entry.span_end(pos)
+                if span_end is not None:
+                    stop = min(span_end, end + 1)
+                    if wfile is None:
+                        pos = stop
+                        continue
+                    f.seek(pos)
+                    served = pos
+                    while pos < stop:
+                        data = f.read(min(CHUNK_SIZE, stop - pos))
+                        if not data:
+                            # 数据文件比记录的区间短，丢弃失效的区间，剩余部分回源
+                            entry.drop_from(pos)
+                            break
+                        wfile.write(data)
+                        pos += len(data)
+                    metrics.incr("proxy_cached_bytes", pos - served)
+                else:
+                    next_start = entry.next_start(pos)
+                    stop = min(next_start if next_start is not None else entry.size, end + 1)
+                    pos = self._fetch_missing(f, wfile, entry, pos, stop)
+
+    def _fetch_missing(self, f, wfile, entry, pos, stop):
+        """回源获取 [pos, stop) 区间，边写缓存边转发给 VLC"""
+        start = pos
+        with self._open_upstream(entry, {"Range": f"bytes={pos}-{stop - 1}"}) as response:
+            # 服务器忽略 Range 时需要跳过前面的数据
+            skip = pos if response.status_code == 200 else 0
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if skip:
+                    if len(chunk) <= skip:
+                        skip -= len(chunk)
+                        continue
+                    chunk, skip = chunk[skip:], 0
+                chunk = chunk[:stop - pos]
+                f.seek(pos)
+                f.write(chunk)
+                f.flush()
+                entry.add_span(pos, pos + len(chunk))
+                if wfile is not None:
+                    wfile.write(chunk)
+                pos += len(chunk)
+                if pos >= stop:
+                    break
+        metrics.incr("proxy_upstream_bytes", pos - start)
+        if pos < stop:
+            raise requests.RequestException("回源数据不完整")
+        return pos
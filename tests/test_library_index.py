@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from library_index import LibraryIndex, match_expression, parse_filename, tokenize
+
+
+def write(path, content=b"\xff\xfb\x90\x64" + b"\0" * 64):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+@pytest.fixture
+def library(tmp_path):
+    index = LibraryIndex(str(tmp_path / "library.db"))
+    yield index
+    index.close()
+
+
+def test_tokenize_splits_cjk_into_unigrams_and_bigrams():
+    assert tokenize("晴天 Jay") == ["晴", "天", "晴天", "jay"]
+
+
+def test_match_expression():
+    assert match_expression("晴天 jay") == '"晴天" AND "jay"*'
+    assert match_expression("晴") == '"晴"'
+    assert match_expression("!!") == ""
+
+
+def test_parse_filename():
+    assert parse_filename("/music/晴天 - 周杰伦 (专辑: 叶惠美).mp3") == {
+        'title': "晴天", 'artist': "周杰伦", 'album': "叶惠美", 'duration': 0.0}
+
+
+def test_scan_is_incremental(tmp_path, library):
+    root = tmp_path / "music"
+    write(str(root / "晴天 - 周杰伦.mp3"))
+    write(str(root / "sub" / "Yesterday - The Beatles.flac"))
+    write(str(root / "notes.txt"))
+    roots = ((str(root), True),)
+
+    assert library.scan(roots) == {"added": 2, "updated": 0, "removed": 0, "unchanged": 0}
+    assert len(library) == 2
+    assert library.scan(roots) == {"added": 0, "updated": 0, "removed": 0, "unchanged": 2}
+
+    write(str(root / "晴天 - 周杰伦.mp3"), b"\xff\xfb\x90\x64" + b"\1" * 128)
+    os.remove(root / "sub" / "Yesterday - The Beatles.flac")
+    assert library.scan(roots) == {"added": 0, "updated": 1, "removed": 1, "unchanged": 0}
+    assert [track['title'] for track in library.search("yesterday")] == []
+
+
+def test_non_recursive_root_keeps_other_tracks(tmp_path, library):
+    root = tmp_path / "music"
+    write(str(root / "a - x.mp3"))
+    write(str(root / "sub" / "b - y.mp3"))
+    library.scan(((str(root), True),))
+    # 只扫描顶层时，不应删除子目录中的记录
+    assert library.scan(((str(root), False),))["removed"] == 0
+    assert len(library) == 2
+
+
+def test_search_matches_cjk_and_prefixes(tmp_path, library):
+    root = tmp_path / "music"
+    write(str(root / "晴天 - 周杰伦.mp3"))
+    write(str(root / "七里香 - 周杰伦.mp3"))
+    write(str(root / "Yesterday - The Beatles.mp3"))
+    library.scan(((str(root), False),))
+
+    assert [track['title'] for track in library.search("晴天")] == ["晴天"]
+    assert {track['title'] for track in library.search("周杰伦")} == {"晴天", "七里香"}
+    assert [track['title'] for track in library.search("里")] == ["七里香"]
+    assert [track['title'] for track in library.search("beat")] == ["Yesterday"]
+    assert library.search("天晴") == []
+    assert library.search("") == []
+
+
+def test_path_for_local_ids(tmp_path, library):
+    root = tmp_path / "music"
+    write(str(root / "晴天 - 周杰伦.mp3"))
+    library.scan(((str(root), False),))
+    track = library.search("晴天")[0]
+    assert track['id'] < 0
+    assert library.path_for(track['id']) == str(root / "晴天 - 周杰伦.mp3")
+    assert library.path_for(12345) is None
@@ -0,0 +1,75 @@
+from lyric_timeline import LyricCursor, LyricTimeline, parse_lrc, parse_lyrics
+
+
+def test_multiple_timestamps_on_one_line():
+    lines = sorted(parse_lrc("[ti:标题]\n[00:01.00][00:05.50]副歌\n[00:03.000]主歌"))
+    assert lines == [(1000, "副歌"), (3000, "主歌"), (5500, "副歌")]
+
+
+def test_offset_shifts_lines_earlier():
+    assert parse_lrc("[offset:500]\n[00:02.00]b") == [(1500, "b")]
+    assert parse_lrc("[offset:-250]\n[00:02.00]b") == [(2250, "b")]
+    assert parse_lrc("[offset:500]\n[00:00.20]a") == [(0, "a")]
+
+
+def test_translations_merged_by_start_time():
+    timeline = parse_lyrics("[00:01.00]a\n[00:02.00]b\n[00:03.00]c", "[00:01.02]A\n[00:03.00]C")
+    assert list(timeline) == [(1.0, "a"), (2.0, "b"), (3.0, "c")]
+    assert timeline.translations == ["A", "", "C"]
+
+
+def test_translations_survive_offset():
+    timeline = parse_lyrics("[offset:500]\n[00:02.00]b", "[00:02.00]B")
+    assert list(timeline) == [(1.5, "b")]
+    assert timeline.translations == ["B"]
+
+
+def test_yrc_words_replace_line_text():
+    yrc = '{"t":0,"c":[{"tx":"作词"}]}\n[1000,1500](1000,500,0)你(1500,500,0)好'
+    timeline = parse_lyrics("[00:01.00]你好", "", yrc)
+    assert timeline.texts == ["你好"]
+    assert timeline.sung_chars(0, 0.9) == 0
+    assert timeline.sung_chars(0, 1.2) == 1
+    assert timeline.sung_chars(0, 1.6) == 2
+
+
+def test_yrc_skips_empty_pause_lines():
+    yrc = "[10000,1000](10000,500,0)hello (10500,500,0)world\n[20500,1000](20500,500,0)second (21000,500,0)line"
+    timeline = parse_lyrics("[00:10.00]hello world\n[00:20.00]\n[00:20.50]second line", "", yrc)
+    assert list(timeline) == [(10.0, "hello world"), (20.0, ""), (20.5, "second line")]
+    assert timeline.words[1] is None
+    assert timeline.words[2] is not None
+
+
+def test_yrc_line_used_at_most_once():
+    # 同一行的两个时间标签相隔不到容差，逐字歌词只有一行，只能配给更近的那一个
+    yrc = "[10000,800](10000,400,0)la(10400,400,0)la"
+    timeline = parse_lyrics("[00:10.00][00:10.90]啦啦\n[00:11.50]下一句", "", yrc)
+    assert list(timeline) == [(10.0, "lala"), (10.9, "啦啦"), (11.5, "下一句")]
+    assert timeline.words[0] is not None
+    assert timeline.words[1] is None and timeline.words[2] is None
+
+
+def test_yrc_only_builds_timeline():
+    timeline = parse_lyrics("", "", "[2000,1000](2000,500,0)A(2500,500,0)B")
+    assert list(timeline) == [(2.0, "AB")]
+    assert timeline.words[0] is not None
+
+
+def test_round_trip_through_dict():
+    timeline = parse_lyrics("[00:01.00]a", "[00:01.00]A", "[1000,500](1000,500,0)a")
+    restored = LyricTimeline.from_dict(timeline.to_dict())
+    assert list(restored) == list(timeline)
+    assert restored.translations == timeline.translations
+    assert restored.sung_chars(0, 1.2) == timeline.sung_chars(0, 1.2)
+
+
+def test_cursor_follows_seeks():
+    timeline = LyricTimeline((second, str(second)) for second in range(0, 100, 2))
+    cursor = LyricCursor(timeline)
+    assert cursor.advance(0.5) == 0
+    assert cursor.advance(4.1) == 2
+    assert cursor.advance(80.0) == 40
+    assert cursor.advance(3.0) == 1
+    assert cursor.advance(1000) == len(timeline) - 1
+    assert LyricCursor(LyricTimeline()).advance(1.0) is None
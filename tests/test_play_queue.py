@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from play_queue import PlayQueue
+
+SONGS = [(song_id, f"song {song_id}") for song_id in range(1, 11)]
+
+
+def play_through(queue, limit=100):
+    """一直切到下一首，返回依次播放的歌曲 ID"""
+    played = []
+    track = queue.advance()
+    while track is not None and len(played) < limit:
+        played.append(track[1])
+        track = queue.advance()
+    return played
+
+
+def test_sequential_order_and_end():
+    queue = PlayQueue(SONGS)
+    assert queue.current() is None
+    assert play_through(queue) == [song_id for song_id, _ in SONGS]
+    assert queue.peek_next() is None
+
+
+def test_shuffle_plays_every_song_once():
+    random.seed(1)
+    queue = PlayQueue()
+    queue.set_shuffle(True)
+    queue.load(SONGS)
+    played = play_through(queue)
+    assert sorted(played) == [song_id for song_id, _ in SONGS]
+
+
+def test_peek_matches_advance():
+    random.seed(2)
+    queue = PlayQueue(SONGS)
+    queue.set_shuffle(True)
+    queue.set_repeat(PlayQueue.REPEAT_ALL)
+    for _ in range(35):
+        peeked = queue.peek_next()
+        assert queue.peek_next() == peeked
+        assert queue.advance() == peeked
+
+
+def test_repeat_one_only_moves_on_manual_skip():
+    queue = PlayQueue(SONGS)
+    queue.set_repeat(PlayQueue.REPEAT_ONE)
+    first = queue.advance()
+    assert queue.advance() == first
+    assert queue.advance(manual=True)[1] == SONGS[1][0]
+
+
+def test_repeat_all_wraps_around():
+    queue = PlayQueue(SONGS[:3])
+    queue.set_repeat(PlayQueue.REPEAT_ALL)
+    assert play_through(queue, limit=7) == [1, 2, 3, 1, 2, 3, 1]
+
+
+def test_repeat_all_shuffle_starts_new_round():
+    random.seed(3)
+    queue = PlayQueue(SONGS)
+    queue.set_shuffle(True)
+    queue.set_repeat(PlayQueue.REPEAT_ALL)
+    played = play_through(queue, limit=30)
+    for start in range(0, 30, 10):
+        assert sorted(played[start:start + 10]) == [song_id for song_id, _ in SONGS]
+
+
+def test_previous_follows_shuffled_history():
+    random.seed(4)
+    queue = PlayQueue(SONGS)
+    queue.set_shuffle(True)
+    history = [queue.advance() for _ in range(4)]
+    assert queue.previous() == history[2]
+    assert queue.previous() == history[1]
+    assert queue.advance() == history[2]
+
+
+def test_play_next_inserts_after_current():
+    for shuffle in (False, True):
+        queue = PlayQueue(SONGS)
+        queue.set_shuffle(shuffle)
+        queue.advance()
+        queue.play_next(99, "inserted")
+        assert queue.peek_next()[1:] == (99, "inserted")
+        assert queue.advance()[1] == 99
+
+
+def test_toggle_shuffle_keeps_current_song():
+    queue = PlayQueue(SONGS)
+    queue.jump(4)
+    queue.set_shuffle(True)
+    assert queue.current()[1] == SONGS[4][0]
+    queue.advance()
+    current = queue.current()
+    queue.set_shuffle(False)
+    assert queue.current() == current
+
+
+def test_unknown_repeat_mode():
+    with pytest.raises(ValueError):
+        PlayQueue().set_repeat("sometimes")
@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+
+from playback_clock import PlaybackClock
+
+
+class FakeRoot:
+    def after(self, interval, callback):
+        return "timer"
+
+    def after_cancel(self, timer):
+        pass
+
+
+class FakePlayer:
+    def event_manager(self):
+        return SimpleNamespace(event_attach=lambda event_type, callback, kind: None)
+
+
+def send(clock, kind, value=None):
+    """模拟 VLC 线程触发事件"""
+    clock._on_vlc_event(SimpleNamespace(u=SimpleNamespace(new_time=value, new_length=value)), kind)
+
+
+def make_clock(log):
+    clock = PlaybackClock(FakeRoot(), FakePlayer())
+    clock.subscribe("end", lambda: log.append("end"))
+    clock.subscribe("media", lambda: log.append("media"))
+    clock.subscribe("time", lambda seconds: log.append("time"))
+    return clock
+
+
+def test_end_then_media_in_one_tick_keeps_order():
+    log = []
+    clock = make_clock(log)
+    send(clock, "end")
+    send(clock, "media")
+    clock._tick()
+    assert log == ["end", "media"]
+
+
+def test_end_after_media_is_dispatched_after_time_update():
+    log = []
+    clock = make_clock(log)
+    send(clock, "media")
+    send(clock, "length", 3000)
+    send(clock, "time", 2900)
+    send(clock, "end")
+    clock._tick()
+    assert log == ["media", "time", "end"]
+
+
+def test_gapless_transition_does_not_skip_a_track():
+    """无缝切歌时结束与切换媒体在同一次 tick 中到达，结束回调不应再手动切到下一首"""
+    clock = make_clock([])
+    state = {"prefetched": {"queued": True}, "advanced": 0}
+
+    def on_media_changed():
+        if state["prefetched"] and state["prefetched"]["queued"]:
+            state["prefetched"] = None
+            state["advanced"] += 1
+
+    def on_end_reached():
+        if state["prefetched"] and state["prefetched"]["queued"]:
+            return
+        state["advanced"] += 1  # prepare_and_play_next
+
+    clock.subscribe("media", on_media_changed)
+    clock.subscribe("end", on_end_reached)
+    send(clock, "end")
+    send(clock, "media")
+    clock._tick()
+    assert state["advanced"] == 1
+
+
+def test_events_from_previous_media_are_dropped_after_reset():
+    log = []
+    clock = make_clock(log)
+    send(clock, "end")
+    clock.reset()
+    clock._tick()
+    assert log == []
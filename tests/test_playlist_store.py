@@ -0,0 +1,42 @@
+import json
+import sqlite3
+
+from playlist_store import PlaylistStore
+
+
+def test_legacy_json_imported_only_once(tmp_path):
+    legacy_json = tmp_path / "playlists.json"
+    legacy_json.write_text(json.dumps({"旧歌单": [{"id": 1, "name": "晴天"}]}), encoding="utf-8")
+    path = str(tmp_path / "playlists.db")
+
+    store = PlaylistStore(path, str(legacy_json))
+    assert store.names() == ["旧歌单"]
+    assert store.load("旧歌单") == [{"id": 1, "name": "晴天"}]
+    store.delete("旧歌单")
+    store.close()
+
+    store = PlaylistStore(path, str(legacy_json))
+    assert store.names() == []
+    store.close()
+
+
+def test_existing_database_not_reimported(tmp_path):
+    legacy_json = tmp_path / "playlists.json"
+    legacy_json.write_text(json.dumps({"旧歌单": []}), encoding="utf-8")
+    path = str(tmp_path / "playlists.db")
+
+    # 记录导入状态之前创建的数据库：已有歌单说明导入过
+    store = PlaylistStore(path, None)
+    store.create("新歌单")
+    store.close()
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone() == (0,)
+    conn.close()
+
+    store = PlaylistStore(path, str(legacy_json))
+    assert store.names() == ["新歌单"]
+    store.delete("新歌单")
+    store.close()
+    store = PlaylistStore(path, str(legacy_json))
+    assert store.names() == []
+    store.close()
@@ -0,0 +1,138 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from api_client import client
+from metrics import metrics
+
+DEFAULT_BITRATE = 320000
+
+
+class AudioUrlResolver:
+    """
+    批量解析并缓存歌曲音频 URL。
+
+    短时间内提交的歌曲 ID 会合并为一次 ``GetTrackAudio`` 调用；
+    解析结果按接口返回的 ``expi`` 缓存到签名 URL 过期之前。
+    """
+
+    def __init__(self, batch_size=200, batch_window=0.02, expiry_margin=60,
+                 default_ttl=1200, failure_ttl=60):
+        """
+        :param batch_size: 单次接口调用的最大歌曲数
+        :param batch_window: 合并请求的等待窗口（秒）
+        :param expiry_margin: 提前多少秒视为过期
+        :param default_ttl: 接口未返回 expi 时的缓存时长（秒）
+        :param failure_ttl: 无法获取 URL 时的缓存时长（秒）
+        """
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.expiry_margin = expiry_margin
+        self.default_ttl = default_ttl
+        self.failure_ttl = failure_ttl
+        self._cache = {}  # (song_id, bitrate) -> (info, expires_at)
+        self._inflight = {}  # (song_id, bitrate) -> Future
+        self._pending = {}  # bitrate -> [song_id, ...]
+        self._flush_scheduled = False
+        self._lock = threading.Lock()
+
+    def get_info(self, song_id, bitrate=DEFAULT_BITRATE, timeout=None):
+        """返回接口中该歌曲的完整音频信息（url、md5、size 等），不可用时返回 None"""
+        return self._submit([int(song_id)], bitrate)[int(song_id)].result(timeout)
+
+    def resolve(self, song_id, bitrate=DEFAULT_BITRATE, timeout=None):
+        """返回歌曲的音频 URL，不可用时返回 None"""
+        info = self.get_info(song_id, bitrate, timeout)
+        return info.get('url') if info else None
+
+    def resolve_many(self, song_ids, bitrate=DEFAULT_BITRATE, timeout=None):
+        """批量解析，返回 {歌曲 ID: URL}"""
+        futures = self._submit([int(song_id) for song_id in song_ids], bitrate, immediate=True)
+        results = {}
+        for song_id, future in futures.items():
+            info = future.result(timeout)
+            results[song_id] = info.get('url') if info else None
+        return results
+
+    def prefetch(self, song_ids, bitrate=DEFAULT_BITRATE):
+        """在后台预先解析一批歌曲，不等待结果"""
+        self._submit([int(song_id) for song_id in song_ids], bitrate, immediate=True)
+
+    def invalidate(self, song_id, bitrate=None):
+        """丢弃缓存的 URL，例如 CDN 返回 403 时"""
+        with self._lock:
+            for key in list(self._cache):
+                if key[0] == int(song_id) and (bitrate is None or key[1] == bitrate):
+                    del self._cache[key]
+
+    def refresh(self, song_id, bitrate=DEFAULT_BITRATE):
+        """强制重新获取歌曲的音频 URL"""
+        self.invalidate(song_id, bitrate)
+        return self.resolve(song_id, bitrate)
+
+    def _submit(self, song_ids, bitrate, immediate=False):
+        """登记待解析的歌曲，返回 {歌曲 ID: Future}"""
+        futures = {}
+        now = time.monotonic()
+        with self._lock:
+            for song_id in song_ids:
+                key = (song_id, bitrate)
+                cached = self._cache.get(key)
+                if cached and cached[1] > now:
+                    metrics.hit("url_cache", True)
+                    future = Future()
+                    future.set_result(cached[0])
+                    futures[song_id] = future
+                    continue
+                metrics.hit("url_cache", False)
+                future = self._inflight.get(key)
+                if future is None:
+                    future = self._inflight[key] = Future()
+                    self._pending.setdefault(bitrate, []).append(song_id)
+                futures[song_id] = future
+            if self._pending and not self._flush_scheduled:
+                self._flush_scheduled = True
+                delay = 0 if immediate else self.batch_window
+                timer = threading.Timer(delay, self._flush)
+                timer.daemon = True
+                timer.start()
+        return futures
+
+    def _flush(self):
+        """把等待中的歌曲按批次交给接口解析"""
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._flush_scheduled = False
+                    return
+                bitrate, song_ids = self._pending.popitem()
+            for start in range(0, len(song_ids), self.batch_size):
+                self._resolve_batch(song_ids[start:start + self.batch_size], bitrate)
+
+    def _resolve_batch(self, song_ids, bitrate):
+        try:
+            response = client.track_audio(song_ids, bitrate=bitrate)
+            infos = {item.get('id'): item for item in response.get('data') or []}
+            error = None
+        except Exception as e:
+            infos, error = {}, e
+
+        now = time.monotonic()
+        with self._lock:
+            for song_id in song_ids:
+                future = self._inflight.pop((song_id, bitrate), None)
+                if error is not None:
+                    if future:
+                        future.set_exception(error)
+                    continue
+                info = infos.get(song_id)
+                if info and info.get('url'):
+                    ttl = max((info.get('expi') or self.default_ttl) - self.expiry_margin, 0)
+                else:
+                    info, ttl = None, self.failure_ttl
+                self._cache[(song_id, bitrate)] = (info, now + ttl)
+                if future:
+                    future.set_result(info)
+
+
+resolver = AudioUrlResolver()
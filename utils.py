@@ -1,3 +1,8 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+
 def center_window(window, width, height):
     """
     将窗口居中显示。
@@ -11,3 +16,23 @@ def center_window(window, width, height):
     x_offset = (screen_width - width) // 2
     y_offset = (screen_height - height) // 2
     window.geometry(f"{width}x{height}+{x_offset}+{y_offset}")
+
+
+def sanitize_filename(filename: str) -> str:
+    """移除文件名中的非法字符"""
+    return re.sub(r'[<>:"/\\|?*]', '', filename)
+
+
+def normalize(text):
+    """统一全半角和大小写，去掉空白和标点，用于相似度比较"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(ch for ch in text if ch.isalnum())
+
+
+def similarity(a, b):
+    a, b = normalize(a), normalize(b)
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
@@ -0,0 +1,234 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualTable(ttk.Frame):
+    """
+    虚拟化的歌曲表格。
+
+    全部数据保存在 Python 列表中，内部的 Treeview 只保留可见窗口那么多行，
+    滚动时复用这些行并改写内容，因此几万首歌的歌单也能立即显示。
+    选中状态按数据下标记录，与当前滚动位置无关。
+    """
+
+    def __init__(self, master, columns, headings, widths=None, chunk_size=2000, width=450, height=250):
+        """
+        :param master: 父控件
+        :param columns: 列名
+        :param headings: 列标题
+        :param widths: 列宽
+        :param chunk_size: load() 每次空闲回调追加的行数
+        :param width: 默认宽度
+        :param height: 默认高度
+        """
+        super().__init__(master, width=width, height=height)
+        self.pack_propagate(False)
+        self.chunk_size = chunk_size
+        self.rows = []
+        self.first = 0  # 第一个可见行对应的数据下标
+        self.visible = 10  # 可见行数
+        self._slots = []  # Treeview 中实际存在的行
+        self._selected = set()  # 选中的数据下标
+        self._rendered_selection = ()
+        self._extend_selection = False  # 本次点击是否按住了 Shift/Ctrl
+        self._load_job = None
+
+        self.tree = ttk.Treeview(self, columns=columns, show="headings", height=self.visible)
+        for index, (column, heading) in enumerate(zip(columns, headings)):
+            self.tree.heading(column, text=heading)
+            if widths:
+                self.tree.column(column, width=widths[index])
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill="both", expand=True)
+
+        self.bind("<Configure>", self._on_configure)
+        self.tree.bind("<Button-1>", self._on_click, add="+")
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.tree.bind("<Button-5>", lambda event: self.scroll(3))
+        self.tree.bind("<Up>", lambda event: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda event: self._move_selection(1))
+        self.tree.bind("<Prior>", lambda event: self._move_selection(-self.visible))
+        self.tree.bind("<Next>", lambda event: self._move_selection(self.visible))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def set_rows(self, rows):
+        """替换全部数据"""
+        self._cancel_load()
+        self.rows = list(rows)
+        self.first = 0
+        self._selected.clear()
+        self._render()
+
+    def append_rows(self, rows):
+        """在末尾追加数据，保留当前的滚动位置和选中行"""
+        self.rows.extend(rows)
+        self._render()
+
+    def clear(self):
+        self.set_rows([])
+
+    def load(self, rows):
+        """
+        替换全部数据，数据来源较大时分批追加。
+
+        第一批同步加入并立即显示，其余在 after_idle 回调中逐批追加，界面不会卡住。
+        """
+        self._cancel_load()
+        iterator = iter(rows)
+        self.set_rows(self._take(iterator))
+        self._schedule_load(iterator)
+
+    def row(self, index):
+        return self.rows[index]
+
+    def selection(self):
+        """返回选中行的数据下标（升序）"""
+        return sorted(self._selected)
+
+    def selected_index(self):
+        """返回第一个选中行的数据下标，没有选中时返回 None"""
+        return min(self._selected) if self._selected else None
+
+    def selected_row(self):
+        index = self.selected_index()
+        return None if index is None else self.rows[index]
+
+    def select(self, index, see=True):
+        """只选中第 index 行，并按需滚动到可见位置"""
+        self._selected = {index}
+        if see:
+            self.see(index)
+        self._render()
+
+    def see(self, index):
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + self.visible:
+            self.first = index - self.visible + 1
+
+    def scroll(self, rows):
+        self.first += rows
+        self._render()
+        return "break"
+
+    def index_at(self, y):
+        """返回窗口坐标 y 处的数据下标"""
+        iid = self.tree.identify_row(y)
+        if iid in self._slots:
+            return self.first + self._slots.index(iid)
+        return None
+
+    def _take(self, iterator):
+        chunk = []
+        for row in iterator:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                break
+        return chunk
+
+    def _schedule_load(self, iterator):
+        def load_chunk():
+            chunk = self._take(iterator)
+            if not chunk:
+                self._load_job = None
+                return
+            self.rows.extend(chunk)
+            self._update_scrollbar()
+            if len(self._slots) < self.visible:
+                self._render()
+            self._load_job = self.after_idle(load_chunk)
+
+        self._load_job = self.after_idle(load_chunk)
+
+    def _cancel_load(self):
+        if self._load_job is not None:
+            self.after_cancel(self._load_job)
+            self._load_job = None
+
+    def _render(self):
+        """把可见窗口的数据写入 Treeview 的复用行"""
+        total = len(self.rows)
+        self.first = max(0, min(self.first, total - self.visible))
+        needed = min(self.visible, total - self.first)
+        while len(self._slots) < needed:
+            self._slots.append(self.tree.insert("", "end", values=()))
+        while len(self._slots) > needed:
+            self.tree.delete(self._slots.pop())
+        for offset, iid in enumerate(self._slots):
+            self.tree.item(iid, values=self.rows[self.first + offset])
+
+        selected_slots = tuple(self._slots[index - self.first] for index in sorted(self._selected)
+                               if self.first <= index < self.first + needed)
+        if selected_slots != tuple(self.tree.selection()):
+            self.tree.selection_set(selected_slots)
+        self._rendered_selection = selected_slots
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.rows)
+        if total <= self.visible:
+            self.scrollbar.set(0.0, 1.0)
+        else:
+            self.scrollbar.set(self.first / total, (self.first + self.visible) / total)
+
+    def _on_tree_select(self, event):
+        """用户点击改变了选中行，同步到数据下标"""
+        current = tuple(self.tree.selection())
+        if current == self._rendered_selection:
+            return  # 由 _render 设置的选中状态
+        if self._extend_selection:
+            # 多选时保留滚出窗口的选中行
+            window = range(self.first, self.first + len(self._slots))
+            self._selected = {index for index in self._selected if index not in window}
+        else:
+            self._selected = set()
+        self._selected.update(self.first + self._slots.index(iid) for iid in current if iid in self._slots)
+        self._rendered_selection = current
+
+    def _on_click(self, event):
+        self._extend_selection = bool(event.state & 0x0005)  # Shift 或 Control
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.first = int(float(args[1]) * len(self.rows))
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.first += int(args[1]) * step
+        self._render()
+
+    def _on_mousewheel(self, event):
+        # Windows 上 delta 为 120 的倍数，macOS 上为较小的整数
+        step = -(event.delta // 120) if abs(event.delta) >= 120 else -event.delta
+        return self.scroll(step * 3)
+
+    def _move_selection(self, step):
+        if not self.rows:
+            return "break"
+        index = self.selected_index()
+        index = 0 if index is None else max(0, min(index + step, len(self.rows) - 1))
+        self.select(index)
+        return "break"
+
+    def _on_configure(self, event):
+        """窗口尺寸变化时重新计算可见行数"""
+        header, row_height = self._row_metrics()
+        visible = max(1, (event.height - header) // row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.tree.configure(height=visible)
+            self._render()
+
+    def _row_metrics(self):
+        """返回 (表头高度, 行高)，优先按已显示的行测量"""
+        if self._slots:
+            bbox = self.tree.bbox(self._slots[0])
+            if bbox:
+                return bbox[1], bbox[3]
+        row_height = ttk.Style().lookup("Treeview", "rowheight")
+        row_height = int(row_height) if row_height else 20
+        return row_height + 4, row_height